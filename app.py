@@ -3,6 +3,8 @@ import streamlit as st
 import pandas as pd
 import sys
 import os
+import threading
+import weakref
 
 # Add src to the Python path to allow importing modules from the src directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
@@ -10,6 +12,14 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 # Import the main SicBoOracle class and data handling functions
 from sicbo_oracle import SicBoOracle, SicBoOutcome # SicBoOutcome is defined in sicbo_oracle
 from data_generator import load_data, save_data
+from event_stream import EventLog, Subscriber, JournalWriter, ROLL, UNDO, REDO, RESET
+from shared_oracle import SharedOracle
+from background_analytics import AnalyticsWorker
+from window_index import WindowIndex
+from prediction_ledger import prune_ledgers
+from section_timer import start_laps, lap, timed_section # No-ops unless SICBO_SECTION_TIMINGS=1
+
+start_laps()
 
 # --- Streamlit Page Configuration ---
 st.set_page_config(page_title="🎲 Sic Bo Oracle", layout="centered")
@@ -120,20 +130,117 @@ html, body, [class*="css"] {
 }
 </style>
 """, unsafe_allow_html=True)
+lap("css")
+
+# --- Shared Resources (loaded once per process, shared by every browser session) ---
+DATA_CSV = os.path.join("data", "sicbo_data.csv")
+LEDGER_DIR = os.path.join("data", "ledgers")
+LEDGER_RETENTION_DAYS = 30
+
+def data_csv_signature():
+    """(mtime, size) of 'data/sicbo_data.csv', or None if it does not exist; changes whenever a session saves it."""
+    try:
+        stat = os.stat(DATA_CSV)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+@st.cache_resource(max_entries=1)
+def load_shared_oracle(csv_signature):
+    """
+    Replays 'data/sicbo_data.csv' into one oracle shared by every session of the server process.
+    Cached per csv_signature: once a session saves new rolls, the next session replays the
+    file again (and the old oracle is dropped), so it starts from the same data the CSV holds.
+    Sessions never modify the oracle; each one works on a copy-on-write fork instead. fork()
+    freezes the parent's copy-on-write state, so forks are taken under the returned lock.
+    Returns the oracle, the number of rows loaded and the fork lock.
+    """
+    base_oracle = SicBoOracle()
+    initial_df = load_data()
+    for die1, die2, die3 in initial_df[['Die1', 'Die2', 'Die3']].itertuples(index=False) if not initial_df.empty else []:
+        base_oracle.add_roll(int(die1), int(die2), int(die3))
+    return base_oracle, len(initial_df), threading.Lock()
+
+@st.cache_resource
+def csv_save_lock():
+    """One lock per process for 'data/sicbo_data.csv': sessions save it from their own csv-saver threads."""
+    return threading.Lock()
+
+class SessionToken:
+    """Held only by one session's state; its finalizer runs when Streamlit drops the session."""
+
+def stop_session_workers(workers):
+    """
+    Stops a session's background threads. Streamlit has no session-end callback, so this runs
+    from a weakref.finalize on an object only that session's state holds: it fires once
+    Streamlit drops a closed session. It never blocks, since any thread may trigger it.
+    """
+    for worker in workers:
+        worker.stop(timeout=0)
+
+@st.cache_resource
+def prune_old_ledgers():
+    """Once per process: removes session ledgers in 'data/ledgers' not written for LEDGER_RETENTION_DAYS."""
+    return prune_ledgers(LEDGER_DIR, max_age_days=LEDGER_RETENTION_DAYS)
+
+@st.cache_resource
+def load_window_index():
+    """
+    The archive's window index ('data/window_index', built with `python src/window_index.py
+    --archive data/archive`). Memory-mapped and shared by every session; empty until it is built.
+    """
+    return WindowIndex(os.path.join("data", "window_index"))
 
 # --- Session State Initialization ---
 if 'oracle' not in st.session_state:
-    st.session_state.oracle = SicBoOracle()
-    initial_df = load_data()
-    if not initial_df.empty:
-        for _, row in initial_df.iterrows():
-            st.session_state.oracle.add_roll(row['Die1'], row['Die2'], row['Die3'])
+    shared_oracle, loaded_rows, fork_lock = load_shared_oracle(data_csv_signature())
+    with fork_lock:
+        st.session_state.oracle = shared_oracle.fork()
+    if loaded_rows:
         st.session_state.initial_data_loaded = True
-        st.sidebar.success(f"โหลดข้อมูล {len(initial_df)} แถวจาก 'data/sicbo_data.csv'")
+        st.sidebar.success(f"โหลดข้อมูล {loaded_rows} แถวจาก 'data/sicbo_data.csv'")
     else:
         st.session_state.initial_data_loaded = False
         st.sidebar.warning("ไม่พบไฟล์ข้อมูลเก่า หรือมีข้อผิดพลาดในการโหลด")
 
+# Rolls, undos and resets are published to an event stream. The oracle applies each event
+# synchronously (the prediction is shown immediately); the CSV save and the journal consume the
+# stream on background threads, so they never add latency to recording a roll.
+# Background consumers never touch the live oracle: they read the immutable snapshot the
+# SharedOracle publishes after every event. Expensive analytics (module accuracies, what-if
+# lookahead, best recent module) are recomputed the same way by an AnalyticsWorker; the UI shows
+# the last completed values with their age and picks up fresh ones as soon as they are ready.
+if 'event_log' not in st.session_state:
+    import uuid
+    stream_id = uuid.uuid4().hex
+    event_log = EventLog()
+    # Every settled prediction of this session is appended to its own ledger file. The file is
+    # only created once a roll is recorded, and ledgers left by old sessions are pruned.
+    prune_old_ledgers()
+    st.session_state.oracle.open_ledger(os.path.join(LEDGER_DIR, f"{stream_id}.ledger"))
+    shared = SharedOracle(st.session_state.oracle)
+    event_log.add_listener(shared)
+
+    def save_latest_history(event):
+        # Only the newest state matters: skip saves the subscriber has already fallen behind on.
+        if event.offset == len(event_log) - 1:
+            with csv_save_lock():
+                save_data(shared.snapshot().history)
+
+    st.session_state.event_log = event_log
+    st.session_state.shared_oracle = shared
+    st.session_state.analytics = AnalyticsWorker(shared).start()
+    st.session_state.event_subscribers = [
+        st.session_state.analytics,
+        Subscriber(event_log, save_latest_history, name="csv-saver").start(),
+        Subscriber(event_log, JournalWriter(os.path.join("data", "events.jsonl"), stream_id=stream_id),
+                   name="journal").start(),
+    ]
+    # Stop the analytics and subscriber threads once this session is gone (see stop_session_workers).
+    st.session_state.session_token = SessionToken()
+    weakref.finalize(st.session_state.session_token, stop_session_workers,
+                     list(st.session_state.event_subscribers))
+
 if 'sicbo_prediction' not in st.session_state:
     st.session_state.sicbo_prediction = None
 if 'sicbo_source' not in st.session_state:
@@ -142,47 +249,67 @@ if 'sicbo_confidence' not in st.session_state:
     st.session_state.sicbo_confidence = None
 if 'sicbo_pattern_name' not in st.session_state:
     st.session_state.sicbo_pattern_name = None
+if 'sicbo_markets' not in st.session_state:
+    st.session_state.sicbo_markets = {}
 if 'sicbo_miss_streak' not in st.session_state:
     st.session_state.sicbo_miss_streak = 0
 if 'initial_wait_message_shown' not in st.session_state:
     st.session_state.initial_wait_message_shown = True
 
 oracle = st.session_state.oracle
+event_log = st.session_state.event_log
+shared = st.session_state.shared_oracle
+analytics = st.session_state.analytics
+lap("session_init")
 
 # --- UI Logic Functions ---
 def update_prediction_state():
-    prediction, source, confidence, pattern_code, current_miss_streak = oracle.predict_next_outcome()
-    print(f"DEBUG: app.py - Received from oracle: prediction={prediction}, source={source}, confidence={confidence}, pattern_code={pattern_code}, miss_streak={current_miss_streak}")
+    snapshot = shared.snapshot()
+    prediction, source, confidence, pattern_code, current_miss_streak = snapshot.prediction
     st.session_state.sicbo_prediction = prediction
     st.session_state.sicbo_source = source
     st.session_state.sicbo_confidence = confidence
     st.session_state.sicbo_pattern_name = pattern_code
     st.session_state.sicbo_miss_streak = current_miss_streak
+    st.session_state.sicbo_markets = snapshot.markets
 
 def handle_add_roll(d1: int, d2: int, d3: int):
-    oracle.add_roll(d1, d2, d3)
-    save_data(oracle.history)
-    update_prediction_state()
+    with timed_section("callback"):
+        event_log.publish(ROLL, (d1, d2, d3))
+        update_prediction_state()
     st.session_state.initial_wait_message_shown = False
     # st.rerun() # Removed as per previous discussion
 
 def handle_remove_last_roll():
-    oracle.remove_last_roll()
-    save_data(oracle.history)
-    update_prediction_state()
+    with timed_section("callback"):
+        event_log.publish(UNDO)
+        update_prediction_state()
     # st.rerun() # Removed as per previous discussion
 
+def handle_redo_last_roll():
+    with timed_section("callback"):
+        event_log.publish(REDO)
+        update_prediction_state()
+
 def handle_reset_all():
-    oracle.reset_history()
-    save_data(oracle.history)
+    with timed_section("callback"):
+        event_log.publish(RESET)
     st.session_state.sicbo_prediction = None
     st.session_state.sicbo_source = None
     st.session_state.sicbo_confidence = None
     st.session_state.sicbo_pattern_name = None
     st.session_state.sicbo_miss_streak = 0
+    st.session_state.sicbo_markets = {}
     st.session_state.initial_wait_message_shown = True
     # st.rerun() # Removed as per previous discussion
 
+def analytics_caption(result) -> str:
+    """Which roll a background analytic describes, how old it is, and whether a fresher one is coming."""
+    caption = f"ข้อมูล ณ ตาที่ {result.rolls} (คำนวณเมื่อ {result.age():.0f} วินาทีที่แล้ว)"
+    if analytics.versions_behind(result) > 0:
+        caption += " · ⏳ กำลังคำนวณใหม่..."
+    return caption
+
 # Map for displaying user-friendly pattern names based on the short codes from scorer.py.
 pattern_name_map = {
     "HLHL": "ปิงปอง",         # High-Low-High-Low
@@ -256,6 +383,62 @@ else:
         st.info("⏳ กำลังวิเคราะห์ข้อมูล หรือยังไม่พบรูปแบบที่ชัดเจน")
 
 st.markdown("</div>", unsafe_allow_html=True)
+lap("prediction")
+
+# --- All Markets (one scoring pass over the module outputs) ---
+market_name_map = {
+    "highlow": "สูง/ต่ำ",
+    "hilo": "ไฮโล",
+    "triplet": "ตอง",
+    "oddeven": "คู่/คี่",
+    "total": "แต้มรวม",
+}
+market_lines = [
+    f"{market_name_map.get(market, market)}: <b>{pred}</b> ({conf}%)"
+    for market, (pred, _, conf) in st.session_state.sicbo_markets.items() if pred is not None
+]
+if market_lines:
+    st.markdown("<b>🎯 ทุกตลาด:</b> " + " | ".join(market_lines), unsafe_allow_html=True)
+
+# Modules that report their own confidence: a probability, or how long a repeated run they matched.
+signal_lines = [
+    f"{name}: {value * 100:.0f}%" if kind == "probability" else f"{name}: ซ้ำยาว {value:.0f} ตา"
+    for name, (kind, value) in shared.snapshot().module_signals.items()
+]
+if signal_lines:
+    st.caption("🧭 ความมั่นใจของโมดูล: " + " | ".join(signal_lines))
+
+# --- What followed the current window across the whole archive (one lookup per length) ---
+window_index = load_window_index()
+window_index.refresh() # Picks up a rebuilt index without restarting the server.
+if window_index.rolls:
+    recent = shared.snapshot().history["HighLow"].tolist()
+    longest = window_index.longest_match(recent)
+    if longest is not None:
+        shares = " | ".join(f"{outcome} {share * 100:.1f}%" for outcome, share in longest.probabilities().items())
+        st.markdown(f"<b>📚 ในคลังข้อมูล หลัง {len(longest.window)} ตาล่าสุดแบบนี้:</b> {shares} "
+                    f"(จาก {longest.total:,} ครั้ง)", unsafe_allow_html=True)
+        with st.expander("📚 สถิติผลถัดไปในคลังข้อมูล ตามจำนวนตาล่าสุด"):
+            st.caption(f"จากผลทอยในคลัง {window_index.rolls:,} ตา ทุกโต๊ะ")
+            st.dataframe(pd.DataFrame(
+                [{"จำนวนตา": len(stats.window), "ผลล่าสุด": "-".join(stats.window), "จำนวนครั้ง": stats.total,
+                  **{outcome: f"{share * 100:.1f}%" for outcome, share in stats.probabilities().items()}}
+                 for stats in window_index.next_outcomes(recent)]), hide_index=True)
+lap("window_index")
+
+# --- What-if: the prediction after each possible next roll ---
+# Computed in the background; the fragment re-renders on its own once the fresh value lands.
+@st.fragment(run_every=1)
+def show_lookahead():
+    result = analytics.get("lookahead")
+    if result is not None and result.value.get("children"):
+        with st.expander("🔮 ถ้าตาถัดไปออก..."):
+            st.caption(analytics_caption(result))
+            for label, branch in result.value["children"].items():
+                outcome_text = f"<b>{branch['prediction']}</b> ({branch['confidence']}%)" if branch["prediction"] else "ไม่ทำนาย"
+                st.markdown(f"{label} (โอกาส {branch['probability'] * 100:.1f}%) → {outcome_text}", unsafe_allow_html=True)
+
+show_lookahead()
 
 # --- Miss Streak Display ---
 miss = st.session_state.sicbo_miss_streak
@@ -265,6 +448,7 @@ if miss > 0:
         st.warning("🧪 เริ่มกระบวนการฟื้นฟู (อาจมีการปรับกลยุทธ์)")
     elif miss >= 6:
         st.error("🚫 หยุดระบบชั่วคราว (พลาด 6 ครั้งติด)")
+lap("markets_lookahead_streak")
 
 # --- Big Road (High/Low/ไฮโล) Visualization ---
 st.markdown("<hr>", unsafe_allow_html=True)
@@ -312,6 +496,7 @@ if history_for_big_road:
     st.markdown(html, unsafe_allow_html=True)
 else:
     st.info("🔄 ยังไม่มีข้อมูลสำหรับ Big Road (สูง/ต่ำ/ไฮโล)") # Updated message
+lap("big_road")
 
 # --- Input for Current Roll ---
 st.markdown("<hr>", unsafe_allow_html=True)
@@ -328,23 +513,39 @@ current_total_input = die1_input + die2_input + die3_input
 st.markdown(f"**แต้มรวม: {current_total_input}**")
 
 # --- Control Buttons (Add, Remove, Reset) ---
-col_ctrl1, col_ctrl2, col_ctrl3 = st.columns(3)
+col_ctrl1, col_ctrl2, col_ctrl_redo, col_ctrl3 = st.columns(4)
 with col_ctrl1:
     st.button("✅ บันทึกผลทอย", on_click=handle_add_roll, args=(die1_input, die2_input, die3_input,), use_container_width=True)
 with col_ctrl2:
     st.button("↩️ ลบรายการล่าสุด", on_click=handle_remove_last_roll, use_container_width=True)
+with col_ctrl_redo:
+    st.button("↪️ ทำซ้ำ", on_click=handle_redo_last_roll, disabled=oracle.tree.last_child(oracle.current_node) < 0,
+              use_container_width=True)
 with col_ctrl3:
     st.button("🔄 เริ่มใหม่ทั้งหมด", on_click=handle_reset_all, use_container_width=True)
+lap("controls")
 
 # --- Module Accuracy Display ---
 st.markdown("<hr>")
 st.markdown("### 📈 ความแม่นยำรายโมดูล (จากประวัติปัจจุบัน)")
-modules_accuracy = oracle.get_module_accuracies()
-if modules_accuracy:
-    for name, acc in modules_accuracy.items():
-        st.write(f"✅ {name}: {acc:.1f}%")
-else:
-    st.info("ยังไม่มีข้อมูลความแม่นยำ (ต้องการข้อมูลมากขึ้น)")
+@st.fragment(run_every=1)
+def show_module_accuracies():
+    result = analytics.get("module_accuracies")
+    if result is None:
+        st.info("⏳ กำลังคำนวณความแม่นยำ...")
+        return
+    if result.value:
+        for name, acc in result.value.items():
+            st.write(f"✅ {name}: {acc:.1f}%")
+        best = analytics.get("best_recent_module")
+        if best is not None and best.value:
+            st.write(f"🏅 แม่นที่สุดช่วงหลัง: {best.value}")
+    else:
+        st.info("ยังไม่มีข้อมูลความแม่นยำ (ต้องการข้อมูลมากขึ้น)")
+    st.caption(analytics_caption(result))
+
+show_module_accuracies()
+lap("accuracy")
 
 st.markdown("---")
 st.markdown("พัฒนาโดย: [ชื่อของคุณ/GitHub Profile]")
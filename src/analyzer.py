@@ -1,7 +1,16 @@
 # src/analyzer.py
+import math
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
+from itertools import product
+from typing import Iterable, Iterator, Optional, Union
+
+# Exact probability of every total (3-18) over the 216 equally likely outcomes of three fair dice.
+TOTAL_VALUES = np.arange(3, 19)
+TOTAL_PROBABILITIES = np.bincount([sum(roll) for roll in product(range(1, 7), repeat=3)], minlength=19)[3:] / 216
+DICE_COLUMNS = ['Die1', 'Die2', 'Die3']
 
 def get_basic_statistics(df: pd.DataFrame) -> dict:
     """
@@ -131,6 +140,307 @@ def get_frequent_patterns(df: pd.DataFrame, pattern_length: int = 3, top_n: int
         }
     return result
 
+def _chi2_sf(x, df: int):
+    """
+    Survival function (p-value) of the chi-square distribution for an integer df.
+    Uses the closed forms for even/odd df so no SciPy is needed; works on scalars and arrays.
+    """
+    x = np.asarray(x, dtype=float)
+    half = np.maximum(x, 0.0) / 2.0
+    if df % 2 == 0:
+        total = np.zeros_like(half)
+        term = np.ones_like(half)
+        for k in range(df // 2):
+            if k > 0:
+                term = term * half / k
+            total = total + term
+        return np.clip(np.exp(-half) * total, 0.0, 1.0)
+    total = np.asarray(np.frompyfunc(lambda v: math.erfc(math.sqrt(v)), 1, 1)(half), dtype=float)
+    with np.errstate(divide='ignore'):
+        log_half = np.log(half)
+    for k in range(1, (df - 1) // 2 + 1):
+        total = total + np.where(half > 0, np.exp(-half + (k - 0.5) * log_half - math.lgamma(k + 0.5)), 0.0)
+    return np.clip(total, 0.0, 1.0)
+
+def _normal_two_sided_p(z):
+    """Two-sided p-value of a standard normal z score (scalars and arrays)."""
+    z = np.abs(np.asarray(z, dtype=float))
+    return np.asarray(np.frompyfunc(lambda v: math.erfc(v / math.sqrt(2)), 1, 1)(z), dtype=float)
+
+def _as_dice_array(data: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
+    """Returns an (n, 3) int64 array of dice from a DataFrame with Die1-3 columns or an array."""
+    if isinstance(data, pd.DataFrame):
+        data = data[DICE_COLUMNS].to_numpy()
+    return np.asarray(data, dtype=np.int64).reshape(-1, 3)
+
+def _highlow_binary(dice: np.ndarray) -> np.ndarray:
+    """H/L sequence for the runs test: 1 for 'สูง', 0 for 'ต่ำ'; 'ตอง' and 'ไฮโล' rolls are dropped."""
+    totals = dice.sum(axis=1)
+    triplet = (dice[:, 0] == dice[:, 1]) & (dice[:, 1] == dice[:, 2])
+    keep = ~triplet & (totals != 11)
+    return (totals[keep] >= 12).astype(np.int8)
+
+class FairnessMonitor:
+    """
+    Streaming dice-fairness tests. Feed rolls in chunks of any size with update();
+    every chunk is processed with vectorized NumPy and only fixed-size counters are kept,
+    so arbitrarily long logs can be tested without holding them in memory.
+
+    Tests (see results()):
+    - chi-square of die faces against uniform (df=5)
+    - chi-square of totals against the exact 216-outcome distribution (df=15)
+    - Wald-Wolfowitz runs test on the สูง/ต่ำ sequence (ตอง/ไฮโล excluded)
+    - lag-1 serial correlation of totals
+    - chi-square independence test for every pair of dice (df=25)
+    """
+    _PAIRS = [(0, 1), (0, 2), (1, 2)]
+
+    def __init__(self):
+        self.n_rolls = 0
+        self.face_counts = np.zeros(6, dtype=np.int64)
+        self.total_counts = np.zeros(len(TOTAL_VALUES), dtype=np.int64)
+        self.pair_counts = np.zeros((len(self._PAIRS), 36), dtype=np.int64)
+        # Runs test state
+        self.n_high = 0
+        self.n_low = 0
+        self.runs = 0
+        self._last_highlow: Optional[int] = None
+        # Serial correlation state
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._sum_lag = 0.0
+        self._first_total: Optional[int] = None
+        self._last_total: Optional[int] = None
+
+    def update(self, data: Union[pd.DataFrame, np.ndarray]):
+        """Adds a chunk of rolls (DataFrame with Die1-3 columns or an (n, 3) array of dice)."""
+        dice = _as_dice_array(data)
+        if len(dice) == 0:
+            return
+        self.n_rolls += len(dice)
+        self.face_counts += np.bincount(dice.ravel() - 1, minlength=6)[:6]
+        totals = dice.sum(axis=1)
+        self.total_counts += np.bincount(totals - 3, minlength=len(TOTAL_VALUES))[:len(TOTAL_VALUES)]
+        for i, (a, b) in enumerate(self._PAIRS):
+            self.pair_counts[i] += np.bincount((dice[:, a] - 1) * 6 + (dice[:, b] - 1), minlength=36)[:36]
+
+        highlow = _highlow_binary(dice)
+        if len(highlow):
+            self.n_high += int(highlow.sum())
+            self.n_low += int(len(highlow) - highlow.sum())
+            chunk_runs = 1 + int(np.count_nonzero(highlow[1:] != highlow[:-1]))
+            if self._last_highlow is not None and self._last_highlow == highlow[0]:
+                chunk_runs -= 1 # The first run continues the previous chunk's last run.
+            self.runs += chunk_runs
+            self._last_highlow = int(highlow[-1])
+
+        totals_f = totals.astype(float)
+        self._sum += totals_f.sum()
+        self._sum_sq += (totals_f ** 2).sum()
+        self._sum_lag += (totals_f[1:] * totals_f[:-1]).sum()
+        if self._last_total is not None:
+            self._sum_lag += self._last_total * totals_f[0]
+        if self._first_total is None:
+            self._first_total = int(totals[0])
+        self._last_total = int(totals[-1])
+
+    def results(self) -> dict:
+        """
+        Returns the statistic and p-value of every test for the rolls seen so far.
+        Small p-values (e.g. < 0.001) point at biased or non-independent dice.
+        """
+        n = self.n_rolls
+        if n == 0:
+            return {"message": "No data to analyze."}
+        results = {"n_rolls": n}
+
+        expected_faces = np.full(6, 3 * n / 6)
+        face_chi2 = float(((self.face_counts - expected_faces) ** 2 / expected_faces).sum())
+        results["face_chi2"] = {"statistic": face_chi2, "df": 5, "p_value": float(_chi2_sf(face_chi2, 5))}
+
+        expected_totals = n * TOTAL_PROBABILITIES
+        total_chi2 = float(((self.total_counts - expected_totals) ** 2 / expected_totals).sum())
+        results["total_chi2"] = {"statistic": total_chi2, "df": 15, "p_value": float(_chi2_sf(total_chi2, 15))}
+
+        n1, n2 = self.n_high, self.n_low
+        m = n1 + n2
+        if n1 > 0 and n2 > 0 and m > 1:
+            mean_runs = 2 * n1 * n2 / m + 1
+            var_runs = 2 * n1 * n2 * (2 * n1 * n2 - m) / (m ** 2 * (m - 1))
+            z = (self.runs - mean_runs) / math.sqrt(var_runs) if var_runs > 0 else 0.0
+            results["highlow_runs"] = {"runs": self.runs, "expected_runs": mean_runs, "z": z,
+                                       "p_value": float(_normal_two_sided_p(z))}
+
+        if n > 2:
+            mean = self._sum / n
+            denominator = self._sum_sq - n * mean ** 2
+            numerator = (self._sum_lag - mean * (2 * self._sum - self._first_total - self._last_total)
+                         + (n - 1) * mean ** 2)
+            r = float(numerator / denominator) if denominator > 0 else 0.0
+            z = r * math.sqrt(n)
+            results["serial_correlation"] = {"lag1_r": r, "z": z, "p_value": float(_normal_two_sided_p(z))}
+
+        independence = {}
+        for (a, b), counts in zip(self._PAIRS, self.pair_counts):
+            table = counts.reshape(6, 6).astype(float)
+            expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / n
+            mask = expected > 0
+            chi2 = float(((table[mask] - expected[mask]) ** 2 / expected[mask]).sum())
+            independence[f"{DICE_COLUMNS[a]}-{DICE_COLUMNS[b]}"] = {"statistic": chi2, "df": 25,
+                                                                   "p_value": float(_chi2_sf(chi2, 25))}
+        results["die_independence"] = independence
+        return results
+
+def iter_dice_chunks(file_path: str, chunksize: int = 1_000_000) -> Iterator[np.ndarray]:
+    """
+    Reads only the dice columns of a roll CSV in chunks, as (n, 3) uint8 arrays.
+
+    Args:
+        file_path (str): Path to a CSV with Die1, Die2 and Die3 columns.
+        chunksize (int): Rows per chunk.
+    """
+    for chunk in pd.read_csv(file_path, usecols=DICE_COLUMNS, dtype='uint8', chunksize=chunksize):
+        yield chunk[DICE_COLUMNS].to_numpy()
+
+def fairness_tests(data: Union[pd.DataFrame, np.ndarray, Iterable[np.ndarray]]) -> dict:
+    """
+    Runs every FairnessMonitor test on a DataFrame, a dice array or an iterable of chunks
+    (e.g. iter_dice_chunks('data/sicbo_data.csv')).
+    """
+    monitor = FairnessMonitor()
+    if isinstance(data, (pd.DataFrame, np.ndarray)):
+        monitor.update(data)
+    else:
+        for chunk in data:
+            monitor.update(chunk)
+    return monitor.results()
+
+def sliding_window_fairness(data: Union[pd.DataFrame, np.ndarray], window: int = 1000, step: Optional[int] = None,
+                            offset: int = 0) -> pd.DataFrame:
+    """
+    Face, total, runs and serial-correlation tests over sliding windows of rolls,
+    computed for all windows at once from cumulative counts.
+
+    Args:
+        data: DataFrame with Die1-3 columns or an (n, 3) array of dice.
+        window (int): Rolls per window.
+        step (int): Distance between window starts (defaults to window, i.e. non-overlapping).
+        offset (int): Roll index of data[0], so windows from consecutive chunks keep global positions.
+
+    Returns:
+        pd.DataFrame: One row per window with statistics and p-values.
+    """
+    step = step or window
+    dice = _as_dice_array(data)
+    n = len(dice)
+    if n < window:
+        return pd.DataFrame()
+    starts = np.arange(0, n - window + 1, step)
+    ends = starts + window
+
+    totals = dice.sum(axis=1)
+    face_cum = np.zeros((n + 1, 6), dtype=np.int64)
+    face_cum[1:] = np.cumsum((dice[:, :, None] == np.arange(1, 7)).sum(axis=1), axis=0)
+    total_cum = np.zeros((n + 1, len(TOTAL_VALUES)), dtype=np.int64)
+    total_cum[1:] = np.cumsum(totals[:, None] == TOTAL_VALUES, axis=0)
+
+    face_counts = face_cum[ends] - face_cum[starts]
+    expected_faces = 3 * window / 6
+    face_chi2 = ((face_counts - expected_faces) ** 2 / expected_faces).sum(axis=1)
+    total_counts = total_cum[ends] - total_cum[starts]
+    expected_totals = window * TOTAL_PROBABILITIES
+    total_chi2 = ((total_counts - expected_totals) ** 2 / expected_totals).sum(axis=1)
+
+    # Runs test on the สูง/ต่ำ rolls inside each window.
+    triplet = (dice[:, 0] == dice[:, 1]) & (dice[:, 1] == dice[:, 2])
+    keep = ~triplet & (totals != 11)
+    high = (totals >= 12) & keep
+    keep_cum = np.concatenate([[0], np.cumsum(keep)])
+    high_cum = np.concatenate([[0], np.cumsum(high)])
+    highlow = high[keep].astype(np.int8)
+    change_cum = np.concatenate([[0, 0], np.cumsum(highlow[1:] != highlow[:-1])]).astype(np.int64)
+    first, last = keep_cum[starts], keep_cum[ends] # Range of H/L indices inside each window.
+    m = (last - first).astype(float)
+    n1 = (high_cum[ends] - high_cum[starts]).astype(float)
+    n2 = m - n1
+    # Windows without สูง/ต่ำ rolls (m == 0) may point past the last one; their runs are 0 anyway.
+    runs = np.where(m > 0, 1 + change_cum[np.maximum(last, 1)] - change_cum[np.clip(first + 1, 1, len(change_cum) - 1)], 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_runs = 2 * n1 * n2 / m + 1
+        var_runs = 2 * n1 * n2 * (2 * n1 * n2 - m) / (m ** 2 * (m - 1))
+        runs_z = np.where(var_runs > 0, (runs - mean_runs) / np.sqrt(var_runs), 0.0)
+
+    # Lag-1 serial correlation of totals inside each window.
+    x = totals.astype(float)
+    sum_cum = np.concatenate([[0.0], np.cumsum(x)])
+    sq_cum = np.concatenate([[0.0], np.cumsum(x ** 2)])
+    lag_cum = np.concatenate([[0.0, 0.0], np.cumsum(x[1:] * x[:-1])])
+    s = sum_cum[ends] - sum_cum[starts]
+    mean = s / window
+    denominator = sq_cum[ends] - sq_cum[starts] - window * mean ** 2
+    numerator = (lag_cum[ends] - lag_cum[starts + 1] - mean * (2 * s - x[starts] - x[ends - 1])
+                 + (window - 1) * mean ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        serial_r = np.where(denominator > 0, numerator / denominator, 0.0)
+
+    return pd.DataFrame({
+        'start': starts + offset,
+        'end': ends + offset,
+        'face_chi2': face_chi2,
+        'face_p': _chi2_sf(face_chi2, 5),
+        'total_chi2': total_chi2,
+        'total_p': _chi2_sf(total_chi2, 15),
+        'runs_z': runs_z,
+        'runs_p': _normal_two_sided_p(runs_z),
+        'serial_r': serial_r,
+        'serial_p': _normal_two_sided_p(serial_r * math.sqrt(window)),
+    })
+
+def sliding_window_fairness_stream(chunks: Iterable[np.ndarray], window: int = 1000,
+                                   step: Optional[int] = None) -> Iterator[pd.DataFrame]:
+    """
+    Sliding-window monitoring over a stream of dice chunks (e.g. iter_dice_chunks(...)).
+    Keeps only the rolls needed to complete the next window between chunks and yields
+    one DataFrame of window results per chunk.
+    """
+    step = step or window
+    carry = np.empty((0, 3), dtype=np.int64)
+    carry_offset = 0
+    for chunk in chunks:
+        dice = np.concatenate([carry, _as_dice_array(chunk)])
+        result = sliding_window_fairness(dice, window=window, step=step, offset=carry_offset)
+        if not result.empty:
+            yield result
+            next_start = int(result['start'].iloc[-1]) + step - carry_offset
+        else:
+            next_start = 0
+        carry = dice[next_start:]
+        carry_offset += next_start
+
+def get_archive_statistics(archive, tables: Optional[list] = None, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None) -> dict:
+    """
+    get_basic_statistics() over a RollArchive query. Only the partitions matching the
+    tables/date range are opened and only the columns the statistics need are read.
+
+    Args:
+        archive (RollArchive): The archive to query.
+        tables (list): Table ids to include (all if None).
+        start_date, end_date (str): Inclusive 'YYYY-MM-DD' bounds.
+    """
+    df = archive.scan(columns=DICE_COLUMNS + ['Total', 'HighLow', 'OddEven', 'Triplet'],
+                      tables=tables, start_date=start_date, end_date=end_date)
+    return get_basic_statistics(df)
+
+def archive_fairness_tests(archive, tables: Optional[list] = None, start_date: Optional[str] = None,
+                           end_date: Optional[str] = None, batch_size: int = 1_000_000) -> dict:
+    """Streams only the dice columns of a RollArchive query through FairnessMonitor."""
+    monitor = FairnessMonitor()
+    for batch in archive.iter_batches(columns=DICE_COLUMNS, tables=tables, start_date=start_date,
+                                      end_date=end_date, batch_size=batch_size):
+        monitor.update(batch[DICE_COLUMNS].to_numpy())
+    return monitor.results()
+
 # Example usage (for testing this module directly)
 if __name__ == "__main__":
     # Assuming you have a DataFrame 'df_sicbo'
@@ -151,6 +461,11 @@ if __name__ == "__main__":
     if fig_highlow:
         fig_highlow.savefig('highlow_dist.png')
 
+    fairness = fairness_tests(df_sicbo_test)
+    print("\n--- Dice Fairness Tests ---")
+    for k, v in fairness.items():
+        print(f"{k}: {v}")
+
     patterns = get_frequent_patterns(df_sicbo_test, pattern_length=3)
     print("\n--- Frequent High/Low Patterns (Length 3) ---")
     for p, details in patterns.items():
@@ -0,0 +1,159 @@
+# src/app_benchmark.py
+import os
+import time
+import random
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import Optional, Sequence
+
+from streamlit.testing.v1 import AppTest
+
+import section_timer
+from sicbo_oracle import SicBoOracle
+from data_generator import simulate_sicbo
+
+APP_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir, "app.py"))
+DEFAULT_HISTORY_SIZES = (0, 100, 1000, 5000)
+# Share of each click type in a scripted session (the rest are roll entries).
+UNDO_SHARE = 0.08
+REDO_SHARE = 0.04
+
+def _build_oracle(history_size: int, seed: int) -> SicBoOracle:
+    """An oracle that has already seen `history_size` simulated rolls (with predictions, as in the app)."""
+    oracle = SicBoOracle()
+    if history_size:
+        random.seed(seed)
+        rolls = simulate_sicbo(history_size)
+        for die1, die2, die3 in rolls[['Die1', 'Die2', 'Die3']].itertuples(index=False):
+            oracle.predict_next_outcome()
+            oracle.add_roll(int(die1), int(die2), int(die3))
+        oracle.predict_next_outcome()
+    return oracle
+
+def _button(app: AppTest, label: str):
+    return next(button for button in app.button if button.label == label)
+
+def run_session(history_size: int, clicks: int = 1000, seed: int = 0, timeout: float = 60) -> pd.DataFrame:
+    """
+    Drives one headless app session through `clicks` scripted clicks, starting from a history of
+    `history_size` rolls, and times every rerun.
+
+    Args:
+        history_size (int): Rolls already recorded when the session starts.
+        clicks (int): Number of clicks (each is one full script rerun).
+        seed (int): Seed for the simulated history and the click script.
+        timeout (float): Per-rerun timeout in seconds.
+
+    Returns:
+        pd.DataFrame: One row per click: "history_size", "click", "action", "rerun_ms" (wall time of
+        the rerun as seen by the user) and one "<section>_ms" column per timed app section.
+    """
+    rng = random.Random(seed)
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    app.session_state["oracle"] = _build_oracle(history_size, seed)
+    app.session_state["initial_data_loaded"] = True
+    app.run()
+    section_timer.drain()
+
+    rows = []
+    for click in range(clicks):
+        draw = rng.random()
+        if draw < UNDO_SHARE:
+            action, label = "undo", "↩️ ลบรายการล่าสุด"
+        elif draw < UNDO_SHARE + REDO_SHARE and not _button(app, "↪️ ทำซ้ำ").disabled:
+            action, label = "redo", "↪️ ทำซ้ำ"
+        else: # Also when there is nothing to redo.
+            action, label = "roll", "✅ บันทึกผลทอย"
+            for key in ("input_d1", "input_d2", "input_d3"):
+                app.number_input(key=key).set_value(rng.randint(1, 6))
+            # The roll button's on_click args are bound when it renders, so the new dice only reach
+            # it after the rerun the browser makes when an input changes; that rerun is not timed.
+            app.run()
+            section_timer.drain()
+        button = _button(app, label)
+        button.click()
+        start = time.perf_counter()
+        app.run()
+        rerun_ms = (time.perf_counter() - start) * 1000
+        if app.exception:
+            raise RuntimeError(f"app.py raised during click {click}: {app.exception[0].value}")
+        row = {"history_size": history_size, "click": click, "action": action, "rerun_ms": rerun_ms}
+        row.update({f"{name}_ms": seconds * 1000 for name, seconds in section_timer.drain().items()})
+        rows.append(row)
+
+    for subscriber in app.session_state["event_subscribers"]:
+        subscriber.stop(timeout=1)
+    return pd.DataFrame(rows)
+
+def run_benchmark(history_sizes: Sequence[int] = DEFAULT_HISTORY_SIZES, clicks: int = 1000,
+                  seed: int = 0, workdir: Optional[str] = None) -> pd.DataFrame:
+    """
+    Runs one scripted session per history size with section timing enabled.
+    The app writes its CSV, journal and ledger under the current directory, so sessions run
+    inside `workdir` (a fresh temporary directory by default) and never touch the real data/.
+    """
+    previous_env = os.environ.get(section_timer.ENV_VAR)
+    previous_cwd = os.getcwd()
+    os.environ[section_timer.ENV_VAR] = "1"
+    with tempfile.TemporaryDirectory(prefix="sicbo-bench-") as tmp:
+        os.chdir(workdir or tmp)
+        try:
+            return pd.concat([run_session(size, clicks, seed) for size in history_sizes], ignore_index=True)
+        finally:
+            os.chdir(previous_cwd)
+            if previous_env is None:
+                os.environ.pop(section_timer.ENV_VAR, None)
+            else:
+                os.environ[section_timer.ENV_VAR] = previous_env
+
+def latency_report(results: pd.DataFrame, percentiles: Sequence[float] = (50, 90, 99)) -> pd.DataFrame:
+    """Rerun latency percentiles (ms) per history size and click type."""
+    def summarize(group: pd.DataFrame) -> pd.Series:
+        values = group["rerun_ms"].to_numpy()
+        stats = {"clicks": len(values), "mean": values.mean()}
+        stats.update({f"p{p:g}": np.percentile(values, p) for p in percentiles})
+        stats["max"] = values.max()
+        return pd.Series(stats)
+    by_action = results.groupby(["history_size", "action"]).apply(summarize)
+    overall = results.groupby("history_size").apply(summarize)
+    overall.index = pd.MultiIndex.from_tuples([(size, "all") for size in overall.index], names=by_action.index.names)
+    return pd.concat([overall, by_action]).sort_index()
+
+def section_report(results: pd.DataFrame) -> pd.DataFrame:
+    """
+    Mean ms per app section and history size, the section's share of the rerun at the largest
+    size, and how it scales: the fitted ms per 1000 extra history rolls.
+    """
+    section_columns = [column for column in results.columns if column.endswith("_ms") and column != "rerun_ms"]
+    # A section missing from a click (e.g. no callback on the first run) took 0 ms on that click.
+    timings = results[section_columns + ["rerun_ms"]].fillna(0.0)
+    means = timings.groupby(results["history_size"]).mean().T
+    means.index = [name[:-3] for name in means.index]
+    sizes = means.columns.to_numpy(dtype=float)
+    if len(sizes) > 1:
+        means["ms_per_1000_rolls"] = [np.polyfit(sizes, row, 1)[0] * 1000 for row in means[list(sizes.astype(int))].to_numpy()]
+    largest = means[int(sizes.max())]
+    means["share_at_largest"] = largest / largest["rerun"] * 100
+    return means.sort_values(int(sizes.max()), ascending=False)
+
+# Example usage (for testing this module directly)
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Headless end-to-end latency benchmark of app.py.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_HISTORY_SIZES),
+                        help="history sizes (rolls recorded before the session starts)")
+    parser.add_argument("--clicks", type=int, default=1000, help="clicks per session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--csv", default=None, help="also write the raw per-click timings here")
+    args = parser.parse_args()
+
+    timings = run_benchmark(args.sizes, args.clicks, args.seed)
+    if args.csv:
+        timings.to_csv(args.csv, index=False)
+    with pd.option_context("display.max_columns", None, "display.width", 200, "display.float_format", "{:.2f}".format):
+        print("Rerun latency (ms)")
+        print(latency_report(timings).to_string())
+        print()
+        print("Per-section time (ms) and scaling with history length")
+        print(section_report(timings).to_string())
@@ -0,0 +1,148 @@
+# src/archive.py
+import os
+import re
+import uuid
+import datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+from typing import Iterator, List, Optional, Tuple
+
+# Columns stored in every part file. Dice and totals fit in uint8; the outcome columns are
+# dictionary-encoded, so they load as pandas categoricals instead of Python strings.
+ROLL_SCHEMA = pa.schema([
+    ('RoundId', pa.int64()),
+    ('Timestamp', pa.timestamp('ms')),
+    ('Die1', pa.uint8()),
+    ('Die2', pa.uint8()),
+    ('Die3', pa.uint8()),
+    ('Total', pa.uint8()),
+    ('HighLow', pa.dictionary(pa.int8(), pa.string())),
+    ('OddEven', pa.dictionary(pa.int8(), pa.string())),
+    ('Triplet', pa.bool_()),
+])
+# Hive-style directory partitioning: <root>/table=<id>/date=<YYYY-MM-DD>/part-*.parquet
+PARTITION_SCHEMA = pa.schema([('table', pa.string()), ('date', pa.string())])
+_TABLE_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+class RollArchive:
+    """
+    Long-term roll storage as Parquet files partitioned by table and date.
+    Reads go through pyarrow.dataset, so queries only open the partitions that match the
+    table/date filters (partition pruning), only decode the requested columns (projection),
+    push row filters down into the Parquet reader and memory-map the files.
+    """
+    def __init__(self, root: str = 'data/archive'):
+        self.root = root
+
+    def append(self, df: pd.DataFrame, table: str, date: Optional[str] = None) -> int:
+        """
+        Appends rolls to the archive as new part files.
+
+        Args:
+            df (pd.DataFrame): Rolls with Die1-3, Total, HighLow, OddEven, Triplet columns and
+                optionally RoundId and Timestamp.
+            table (str): Table id (letters, digits, '_' and '-').
+            date (str): Partition date 'YYYY-MM-DD'. If omitted, each row's Timestamp date is used,
+                or today's date when there is no Timestamp.
+
+        Returns:
+            int: Number of rows written.
+        """
+        if not _TABLE_ID_PATTERN.match(str(table)):
+            raise ValueError(f"Invalid table id: {table!r}")
+        if df.empty:
+            return 0
+        df = df.copy()
+        for column in ('RoundId', 'Timestamp'):
+            if column not in df.columns:
+                df[column] = None
+        df['Timestamp'] = pd.to_datetime(df['Timestamp'])
+
+        if date is not None:
+            dates = pd.Series(date, index=df.index)
+        elif df['Timestamp'].notna().any():
+            dates = df['Timestamp'].dt.strftime('%Y-%m-%d').fillna(datetime.date.today().isoformat())
+        else:
+            dates = pd.Series(datetime.date.today().isoformat(), index=df.index)
+
+        written = 0
+        for partition_date, part in df.groupby(dates, sort=True):
+            directory = os.path.join(self.root, f"table={table}", f"date={partition_date}")
+            os.makedirs(directory, exist_ok=True)
+            arrow_table = pa.Table.from_pandas(part[ROLL_SCHEMA.names], schema=ROLL_SCHEMA, preserve_index=False)
+            pq.write_table(arrow_table, os.path.join(directory, f"part-{uuid.uuid4().hex}.parquet"), compression='zstd')
+            written += len(part)
+        return written
+
+    def dataset(self) -> ds.Dataset:
+        """The archive as a pyarrow Dataset (memory-mapped local files, hive partitioning)."""
+        schema = pa.schema(list(ROLL_SCHEMA) + list(PARTITION_SCHEMA))
+        return ds.dataset(self.root, format='parquet', schema=schema,
+                          partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive'),
+                          filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+    @staticmethod
+    def build_filter(tables: Optional[List[str]] = None, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None, filter: Optional[pc.Expression] = None) -> Optional[pc.Expression]:
+        """Combines table/date partition filters (inclusive dates) and an optional row filter."""
+        expressions = []
+        if tables is not None:
+            expressions.append(ds.field('table').isin(list(tables)))
+        if start_date is not None:
+            expressions.append(ds.field('date') >= start_date)
+        if end_date is not None:
+            expressions.append(ds.field('date') <= end_date)
+        if filter is not None:
+            expressions.append(filter)
+        if not expressions:
+            return None
+        combined = expressions[0]
+        for expression in expressions[1:]:
+            combined = combined & expression
+        return combined
+
+    def scan(self, columns: Optional[List[str]] = None, tables: Optional[List[str]] = None,
+             start_date: Optional[str] = None, end_date: Optional[str] = None,
+             filter: Optional[pc.Expression] = None) -> pd.DataFrame:
+        """
+        Loads the matching rows into a DataFrame.
+
+        Args:
+            columns (List[str]): Columns to read (e.g. ['Die1', 'Die2', 'Die3']); all if None.
+                'table' and 'date' are available as columns too.
+            tables (List[str]): Only these tables.
+            start_date, end_date (str): Inclusive 'YYYY-MM-DD' bounds.
+            filter (pc.Expression): Extra row filter, e.g. ds.field('Total') == 11.
+        """
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=columns or ROLL_SCHEMA.names)
+        return self.dataset().to_table(columns=columns, filter=self.build_filter(tables, start_date, end_date, filter)).to_pandas()
+
+    def iter_batches(self, columns: Optional[List[str]] = None, tables: Optional[List[str]] = None,
+                     start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     filter: Optional[pc.Expression] = None, batch_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+        """Same query as scan(), streamed as DataFrames of at most batch_size rows."""
+        if not os.path.isdir(self.root):
+            return
+        scanner = self.dataset().scanner(columns=columns, filter=self.build_filter(tables, start_date, end_date, filter),
+                                         batch_size=batch_size)
+        for batch in scanner.to_batches():
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+    def partitions(self) -> List[Tuple[str, str]]:
+        """Lists the (table, date) partitions present in the archive."""
+        result = []
+        if not os.path.isdir(self.root):
+            return result
+        for table_dir in sorted(os.listdir(self.root)):
+            if not table_dir.startswith('table='):
+                continue
+            for date_dir in sorted(os.listdir(os.path.join(self.root, table_dir))):
+                if date_dir.startswith('date='):
+                    result.append((table_dir[len('table='):], date_dir[len('date='):]))
+        return result
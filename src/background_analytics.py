@@ -0,0 +1,146 @@
+# src/background_analytics.py
+import time
+import threading
+from typing import Callable, Dict, NamedTuple, Optional
+
+from shared_oracle import SharedOracle, OracleSnapshot
+
+
+class AnalyticsResult(NamedTuple):
+    """One computed analytic, tagged with the oracle version it describes."""
+    value: object
+    version: int          # SharedOracle snapshot version it was computed from.
+    history_version: int  # Oracle history_version of that snapshot.
+    rolls: int            # Rolls recorded at that version.
+    computed_at: float    # time.time() when it finished.
+
+    def age(self) -> float:
+        """Seconds since the value was computed."""
+        return time.time() - self.computed_at
+
+
+def module_accuracies(snapshot: OracleSnapshot) -> Dict[str, float]:
+    return snapshot.module_accuracies()
+
+def lookahead(snapshot: OracleSnapshot) -> dict:
+    return snapshot.lookahead(depth=1)
+
+def best_recent_module(snapshot: OracleSnapshot) -> Optional[str]:
+    return snapshot.derive("best_recent_module", lambda oracle: oracle.get_best_recent_module())
+
+# Analytics the app shows; each maps a snapshot to a value and may take as long as it needs.
+DEFAULT_ANALYTICS: Dict[str, Callable[[OracleSnapshot], object]] = {
+    "module_accuracies": module_accuracies,
+    "lookahead": lookahead,
+    "best_recent_module": best_recent_module,
+}
+
+
+class AnalyticsWorker:
+    """
+    Recomputes expensive derived analytics (module accuracies, what-if lookahead, best recent
+    module, ...) on a background thread, stale-while-revalidate style.
+
+    The worker waits for SharedOracle to publish a new snapshot and then computes every
+    analytic from it, so the writer never waits for analytics: recording a roll costs the same
+    whatever is registered here. Readers call get(), which returns the last completed value
+    immediately, tagged with its version and age; versions_behind() tells whether a fresher one
+    is on its way, and wait() blocks until it arrives. If several rolls come in while a pass is
+    running, the next pass jumps straight to the newest snapshot.
+
+    Values are computed through the snapshot (OracleSnapshot.module_accuracies, lookahead,
+    derive), so a reader asking the snapshot directly shares the same computation.
+    """
+    def __init__(self, shared: SharedOracle, analytics: Optional[Dict[str, Callable[[OracleSnapshot], object]]] = None,
+                 name: str = "analytics", poll_interval: float = 0.1):
+        self.shared = shared
+        self.analytics = dict(DEFAULT_ANALYTICS if analytics is None else analytics)
+        self.name = name
+        self.poll_interval = poll_interval
+        self.error: Optional[BaseException] = None
+        self.computed_version = -1 # Newest snapshot version every analytic has been computed for.
+        self._results: Dict[str, AnalyticsResult] = {}
+        self._updated = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "AnalyticsWorker":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.shared.wait_for_version(self.computed_version + 1, self.poll_interval) is None:
+                continue
+            snapshot = self.shared.snapshot() # The newest one: skip versions published meanwhile.
+            for name, compute in self.analytics.items():
+                try:
+                    value = compute(snapshot)
+                except BaseException as exc: # A failing analytic stops the worker, like Subscriber.
+                    with self._updated:
+                        self.error = exc
+                        self._updated.notify_all()
+                    return
+                result = AnalyticsResult(value, snapshot.version, snapshot.history_version,
+                                         snapshot.rolls, time.time())
+                with self._updated:
+                    self._results[name] = result
+                    self._updated.notify_all()
+                if self._stop.is_set():
+                    return
+            with self._updated:
+                self.computed_version = snapshot.version
+                self._updated.notify_all()
+
+    def get(self, name: str) -> Optional[AnalyticsResult]:
+        """The last completed value of an analytic (None before its first computation). Never blocks."""
+        return self._results.get(name)
+
+    def versions_behind(self, result: Optional[AnalyticsResult]) -> int:
+        """How many published versions a result lags the live oracle (0 = fresh)."""
+        if result is None:
+            return self.shared.version + 1
+        return self.shared.version - result.version
+
+    def wait(self, name: str, version: Optional[int] = None, timeout: Optional[float] = None) -> Optional[AnalyticsResult]:
+        """
+        Blocks until `name` has been computed for `version` (default: the latest published
+        version) or newer. Returns the result, or None on timeout or if the worker failed.
+        """
+        version = self.shared.version if version is None else version
+        with self._updated:
+            done = self._updated.wait_for(
+                lambda: self.error is not None or (name in self._results and self._results[name].version >= version),
+                timeout)
+            if not done or self.error is not None:
+                return None
+            return self._results[name]
+
+
+# Example usage (for testing this module directly)
+if __name__ == "__main__":
+    import random
+
+    shared = SharedOracle()
+    worker = AnalyticsWorker(shared).start()
+    add_times = []
+    for _ in range(200):
+        start = time.perf_counter()
+        shared.add_roll(*(random.randint(1, 6) for _ in range(3)))
+        add_times.append(time.perf_counter() - start)
+        stale = worker.get("module_accuracies")
+    fresh = worker.wait("module_accuracies", timeout=30)
+    worker.stop()
+
+    print(f"add_roll: mean {sum(add_times) / len(add_times) * 1000:.2f} ms, max {max(add_times) * 1000:.2f} ms")
+    if stale is not None:
+        print(f"last read while rolling: version {stale.version}, {worker.versions_behind(stale)} behind, age {stale.age():.2f}s")
+    print(f"fresh: version {fresh.version} ({fresh.rolls} rolls) -> {fresh.value}")
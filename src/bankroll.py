@@ -0,0 +1,392 @@
+# src/bankroll.py
+import itertools
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Sequence
+
+from prediction_modules.base_predictor import BasePredictor, HIGHLOW_CODES, PREDICTION_OUTCOMES, PREDICTION_CODES
+from roll_tree import PREDICTION_TYPES
+from pattern_mining import highlow_codes
+
+# Profit per unit staked when the bet wins (Sic Bo table): สูง (Big, 11-17) / ต่ำ (Small, 4-10) and
+# คู่/คี่ pay 1:1 and lose on any triple, ไฮโล is the single-total 11 bet (6:1) and ตอง is "any triple"
+# (30:1). The oracle's history files total 11 as ไฮโล rather than สูง, so a ไฮโล roll also wins สูง bets.
+PAYOUTS: Dict[str, float] = {"สูง": 1.0, "ต่ำ": 1.0, "ไฮโล": 6.0, "ตอง": 30.0, "คู่": 1.0, "คี่": 1.0}
+_ODDEVEN_CODES = {"คู่": 0, "คี่": 1} # OddEven codes as in BatchOracleEngine: 0 คู่, 1 คี่, 2 ตอง.
+_N_CODES = len(PREDICTION_OUTCOMES)
+
+def _fair_win_probabilities() -> Dict[str, float]:
+    """Chance each PAYOUTS bet wins on fair dice, from the 216 dice combinations."""
+    wins = dict.fromkeys(PAYOUTS, 0)
+    for dice in itertools.product(range(1, 7), repeat=3):
+        total, triplet = sum(dice), dice[0] == dice[1] == dice[2]
+        if triplet:
+            wins["ตอง"] += 1
+            continue
+        wins["ต่ำ" if total <= 10 else "สูง"] += 1
+        if total == 11:
+            wins["ไฮโล"] += 1
+        wins["คู่" if total % 2 == 0 else "คี่"] += 1
+    return {bet: count / 216 for bet, count in wins.items()}
+
+FAIR_WIN_PROBABILITY = _fair_win_probabilities()
+
+# Per PREDICTION_CODES lookups (0 for outcomes there is no bet on).
+_RATIO_BY_CODE = np.zeros(_N_CODES)
+_FAIR_BY_CODE = np.zeros(_N_CODES)
+for _bet, _ratio in PAYOUTS.items():
+    _RATIO_BY_CODE[PREDICTION_CODES[_bet]] = _ratio
+    _FAIR_BY_CODE[PREDICTION_CODES[_bet]] = FAIR_WIN_PROBABILITY[_bet]
+
+class BetStream:
+    """
+    The oracle's call before every roll of many sessions, and what each roll came out as.
+    Everything is a (sessions x rolls) array, so every staking policy can be run over all
+    sessions at once.
+
+    Attributes:
+        predictions (np.ndarray): int8 PREDICTION_CODES of the call before each roll, -1 for none.
+        types (np.ndarray): int8 index into PREDICTION_TYPES.
+        confidence (np.ndarray): int16 confidence of the call (-1 for none).
+        miss_streak (np.ndarray): int16 oracle miss streak when the call was made.
+        highlow (np.ndarray): int8 HIGHLOW_CODES of each roll.
+        oddeven (np.ndarray): int8 OddEven codes (0 คู่, 1 คี่, 2 ตอง), or None when unknown (คู่/คี่
+            calls are then not bet on).
+    """
+    def __init__(self, predictions: np.ndarray, types: np.ndarray, confidence: np.ndarray, miss_streak: np.ndarray,
+                 highlow: np.ndarray, oddeven: Optional[np.ndarray] = None):
+        self.predictions = predictions
+        self.types = types
+        self.confidence = confidence
+        self.miss_streak = miss_streak
+        self.highlow = highlow
+        self.oddeven = oddeven
+
+    @property
+    def shape(self):
+        """(sessions, rolls)."""
+        return self.predictions.shape
+
+    def wins(self) -> np.ndarray:
+        """Whether a bet on each call would have won (False where there is no call)."""
+        wins = np.zeros(self.shape, dtype=bool)
+        for bet in ("สูง", "ต่ำ", "ไฮโล", "ตอง"):
+            wins |= (self.predictions == PREDICTION_CODES[bet]) & (self.highlow == HIGHLOW_CODES[bet])
+        # Big covers 11-17: a ไฮโล roll (total 11) wins สูง too.
+        wins |= (self.predictions == PREDICTION_CODES["สูง"]) & (self.highlow == HIGHLOW_CODES["ไฮโล"])
+        if self.oddeven is not None:
+            for bet, code in _ODDEVEN_CODES.items():
+                wins |= (self.predictions == PREDICTION_CODES[bet]) & (self.oddeven == code)
+        return wins
+
+    def bettable(self) -> np.ndarray:
+        """Calls there is a bet for (a PAYOUTS market whose result is known)."""
+        codes = [PREDICTION_CODES[bet] for bet in ("สูง", "ต่ำ", "ไฮโล", "ตอง")]
+        if self.oddeven is not None:
+            codes += [PREDICTION_CODES[bet] for bet in _ODDEVEN_CODES]
+        return np.isin(self.predictions, codes)
+
+def simulate_oracle_sessions(n_sessions: int, n_rolls: int, warmup: int = 0, seed: int = 0,
+                             modules: Optional[Dict[str, BasePredictor]] = None, weight_decay: float = 0.9) -> BetStream:
+    """
+    Plays n_sessions independent fair-dice sessions through a BatchOracleEngine (one engine table per
+    session) and records the oracle's call before every roll.
+
+    Args:
+        n_sessions (int): Sessions to simulate, all advanced together one roll per tick.
+        n_rolls (int): Rolls per session that can be bet on.
+        warmup (int): Rolls each table sees first without being bet on (the oracle needs some
+            history before it predicts).
+        seed (int): Seed of the dice.
+        modules, weight_decay: Passed to BatchOracleEngine (default: batch_modules()).
+
+    Returns:
+        BetStream: n_sessions x n_rolls.
+    """
+    from batch_engine import BatchOracleEngine
+    engine = BatchOracleEngine(n_sessions, modules, weight_decay)
+    rng = np.random.default_rng(seed)
+    tables = np.arange(n_sessions)
+    shape = (n_sessions, n_rolls)
+    stream = BetStream(np.full(shape, -1, dtype=np.int8), np.zeros(shape, dtype=np.int8),
+                       np.full(shape, -1, dtype=np.int16), np.zeros(shape, dtype=np.int16),
+                       np.zeros(shape, dtype=np.int8), np.zeros(shape, dtype=np.int8))
+    call = None # The engine's output after the previous roll: the call for this one.
+    for roll in range(warmup + n_rolls):
+        dice = rng.integers(1, 7, size=(n_sessions, 3))
+        column = roll - warmup
+        if column >= 0:
+            total = dice.sum(axis=1)
+            triplet = (dice[:, 0] == dice[:, 1]) & (dice[:, 1] == dice[:, 2])
+            stream.highlow[:, column] = highlow_codes(dice[:, 0], dice[:, 1], dice[:, 2])
+            stream.oddeven[:, column] = np.where(triplet, 2, total % 2)
+            if call is not None:
+                stream.predictions[:, column] = call["prediction"]
+                stream.types[:, column] = call["type"]
+                stream.confidence[:, column] = call["confidence"]
+                stream.miss_streak[:, column] = call["miss_streak"]
+        call = engine.tick(tables, dice)
+    return stream
+
+def stream_from_matrix(matrix, session_rolls: int, config: Optional[Dict] = None, weight_decay: float = 0.9) -> BetStream:
+    """
+    Turns one long history into consecutive sessions of session_rolls rolls, with the oracle's
+    calls replayed from a PredictionMatrix (param_sweep.replay_decisions) for one config. A
+    matrix only records HighLow outcomes, so its คู่/คี่ calls are not bet on.
+    """
+    from param_sweep import replay_decisions
+    decisions = replay_decisions(matrix, config, weight_decay)
+    n_sessions = len(decisions) // session_rolls
+    if n_sessions == 0:
+        raise ValueError(f"The matrix has {len(decisions)} rolls, fewer than one session of {session_rolls}")
+    decisions = decisions.iloc[:n_sessions * session_rolls]
+    shape = (n_sessions, session_rolls)
+    predictions = decisions["prediction"].map(PREDICTION_CODES).fillna(-1).to_numpy(dtype=np.int8)
+    types = decisions["type"].map(PREDICTION_TYPES.index).to_numpy(dtype=np.int8)
+    confidence = decisions["confidence"].fillna(-1).to_numpy(dtype=np.int16)
+    return BetStream(predictions.reshape(shape), types.reshape(shape), confidence.reshape(shape),
+                     decisions["miss_streak"].to_numpy(dtype=np.int16).reshape(shape),
+                     decisions["actual"].map(HIGHLOW_CODES).to_numpy(dtype=np.int8).reshape(shape))
+
+class StakingPolicy(ABC):
+    """
+    Decides the stake of every session's next bet at once. stake() gets the sessions' bankrolls
+    and the calls being bet on, and returns the amount to put on each (0 = sit out); settle()
+    then learns which of the placed bets won.
+    """
+    def reset(self, n_sessions: int):
+        pass
+
+    @abstractmethod
+    def stake(self, bankroll: np.ndarray, bets: np.ndarray, confidence: np.ndarray, miss_streak: np.ndarray) -> np.ndarray:
+        """
+        Returns the stake of every session's next bet (0 = sit out).
+
+        Args:
+            bankroll (np.ndarray): Each session's current bankroll.
+            bets (np.ndarray): PREDICTION_CODES of the calls being bet on (-1 for none).
+            confidence (np.ndarray): The oracle's confidence in each call (-1 for none).
+            miss_streak (np.ndarray): The oracle's miss streak when each call was made.
+        """
+        pass
+
+    def settle(self, placed: np.ndarray, won: np.ndarray, bets: np.ndarray):
+        pass
+
+class FlatStake(StakingPolicy):
+    """The same stake on every call."""
+    def __init__(self, unit: float = 1.0):
+        self.unit = unit
+
+    def stake(self, bankroll, bets, confidence, miss_streak):
+        return np.full(len(bankroll), self.unit)
+
+class MartingaleStake(StakingPolicy):
+    """
+    unit * multiplier ** streak. With on="miss_streak" the streak is the oracle's own miss streak
+    (reset by a normal hit, ไฮโล/ตอง rolls do not count, and the oracle stops calling at its stop
+    streak); with on="losses" it is the session's run of lost bets.
+    """
+    def __init__(self, unit: float = 1.0, multiplier: float = 2.0, max_steps: Optional[int] = None,
+                 on: str = "miss_streak"):
+        if on not in ("miss_streak", "losses"):
+            raise ValueError(f"on must be 'miss_streak' or 'losses', got {on!r}")
+        self.unit = unit
+        self.multiplier = multiplier
+        self.max_steps = max_steps
+        self.on = on
+        self._losses = np.zeros(0, dtype=np.int64)
+
+    def reset(self, n_sessions):
+        self._losses = np.zeros(n_sessions, dtype=np.int64)
+
+    def stake(self, bankroll, bets, confidence, miss_streak):
+        steps = miss_streak.astype(np.int64) if self.on == "miss_streak" else self._losses
+        if self.max_steps is not None:
+            steps = np.minimum(steps, self.max_steps)
+        return self.unit * self.multiplier ** steps
+
+    def settle(self, placed, won, bets):
+        self._losses = np.where(placed, np.where(won, 0, self._losses + 1), self._losses)
+
+class KellyStake(StakingPolicy):
+    """
+    fraction * the Kelly stake (p * (b + 1) - 1) / b of the bankroll, skipping calls with no edge.
+    p is the session's own win rate on that bet so far, starting from prior_bets imaginary bets at
+    the fair-dice rate (probability="hit_rate"), or the call's confidence (probability="confidence").
+    """
+    def __init__(self, fraction: float = 0.5, prior_bets: float = 50.0, max_fraction: float = 0.25,
+                 probability: str = "hit_rate"):
+        if probability not in ("hit_rate", "confidence"):
+            raise ValueError(f"probability must be 'hit_rate' or 'confidence', got {probability!r}")
+        self.fraction = fraction
+        self.prior_bets = prior_bets
+        self.max_fraction = max_fraction
+        self.probability = probability
+        self._bets = self._wins = np.zeros((0, _N_CODES))
+
+    def reset(self, n_sessions):
+        self._bets = np.full((n_sessions, _N_CODES), float(self.prior_bets))
+        self._wins = self._bets * _FAIR_BY_CODE
+
+    def stake(self, bankroll, bets, confidence, miss_streak):
+        codes = np.maximum(bets, 0)
+        rows = np.arange(len(bets))
+        if self.probability == "confidence":
+            p = np.clip(confidence, 0, 100) / 100.0
+        else:
+            p = self._wins[rows, codes] / self._bets[rows, codes]
+        ratio = _RATIO_BY_CODE[codes]
+        kelly = np.divide(p * (ratio + 1) - 1, ratio, out=np.zeros(len(bets)), where=ratio > 0)
+        return bankroll * np.clip(self.fraction * kelly, 0.0, self.max_fraction)
+
+    def settle(self, placed, won, bets):
+        rows = np.flatnonzero(placed)
+        np.add.at(self._bets, (rows, bets[rows]), 1.0)
+        np.add.at(self._wins, (rows, bets[rows]), won[rows].astype(float))
+
+# Why a session ended early.
+_PLAYING, _RUINED, _STOP_LOSS, _TAKE_PROFIT = 0, 1, 2, 3
+END_REASONS = ("played out", "ruined", "stop-loss", "take-profit")
+
+def simulate_bankroll(stream: BetStream, policy: StakingPolicy, bankroll: float = 100.0, min_stake: float = 1.0,
+                      max_stake: Optional[float] = None, stop_loss: Optional[float] = None,
+                      take_profit: Optional[float] = None, bet_types: Sequence[str] = ("normal", "recovery"),
+                      keep_paths: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Bets every session of a BetStream with one staking policy, vectorized across sessions.
+
+    Stakes are capped at max_stake and the session's bankroll; a stake below min_stake (the table
+    minimum) is not placed. A session is ruined once its bankroll drops below min_stake, and stops
+    early when it has lost stop_loss or won take_profit (fractions of the starting bankroll).
+
+    Args:
+        stream (BetStream): Calls and outcomes (see simulate_oracle_sessions, stream_from_matrix).
+        policy (StakingPolicy): FlatStake, MartingaleStake, KellyStake, ...
+        bankroll (float): Starting bankroll of every session.
+        min_stake, max_stake (float): Table limits.
+        stop_loss, take_profit (float): e.g. 0.5 = stop after losing / winning half the bankroll.
+        bet_types (Sequence[str]): Which prediction types are bet on.
+        keep_paths (bool): Also return every session's bankroll after each roll.
+
+    Returns:
+        Dict[str, np.ndarray]: Per session: "final", "profit", "peak", "max_drawdown" (largest
+        drop from a peak), "bets", "wagered", "expected_profit" (what the placed bets were worth on
+        fair dice), "end_reason" (index into END_REASONS), "rolls_played"; and "path"
+        (sessions x rolls + 1) if keep_paths.
+    """
+    n_sessions, n_rolls = stream.shape
+    wins = stream.wins()
+    eligible = stream.bettable() & np.isin(stream.types, [PREDICTION_TYPES.index(t) for t in bet_types])
+    money = np.full(n_sessions, float(bankroll))
+    peak = money.copy()
+    max_drawdown = np.zeros(n_sessions)
+    bets = np.zeros(n_sessions, dtype=np.int64)
+    wagered = np.zeros(n_sessions)
+    expected = np.zeros(n_sessions)
+    end_reason = np.full(n_sessions, _PLAYING, dtype=np.int8)
+    rolls_played = np.full(n_sessions, n_rolls, dtype=np.int64)
+    path = np.empty((n_sessions, n_rolls + 1)) if keep_paths else None
+    if keep_paths:
+        path[:, 0] = money
+    floor = bankroll * (1 - stop_loss) if stop_loss is not None else -np.inf
+    target = bankroll * (1 + take_profit) if take_profit is not None else np.inf
+    policy.reset(n_sessions)
+
+    for roll in range(n_rolls):
+        playing = end_reason == _PLAYING
+        codes = stream.predictions[:, roll].astype(np.int64)
+        stake = np.where(eligible[:, roll] & playing,
+                         policy.stake(money, codes, stream.confidence[:, roll], stream.miss_streak[:, roll]), 0.0)
+        if max_stake is not None:
+            stake = np.minimum(stake, max_stake)
+        stake = np.minimum(stake, money)
+        stake[stake < min_stake] = 0.0
+        placed = stake > 0
+        won = wins[:, roll] & placed
+        ratio = _RATIO_BY_CODE[np.maximum(codes, 0)]
+        money += np.where(won, stake * ratio, -stake)
+        policy.settle(placed, won, np.maximum(codes, 0))
+
+        bets += placed
+        wagered += stake
+        expected += stake * (_FAIR_BY_CODE[np.maximum(codes, 0)] * (ratio + 1) - 1)
+        np.maximum(peak, money, out=peak)
+        np.maximum(max_drawdown, peak - money, out=max_drawdown)
+        for reason, ended in ((_RUINED, money < min_stake), (_STOP_LOSS, money <= floor), (_TAKE_PROFIT, money >= target)):
+            ended &= playing & (end_reason == _PLAYING)
+            end_reason[ended] = reason
+            rolls_played[ended] = roll + 1
+        if keep_paths:
+            path[:, roll + 1] = money
+
+    result = {"final": money, "profit": money - bankroll, "peak": peak, "max_drawdown": max_drawdown,
+              "bets": bets, "wagered": wagered, "expected_profit": expected, "end_reason": end_reason,
+              "rolls_played": rolls_played}
+    if keep_paths:
+        result["path"] = path
+    return result
+
+def bankroll_report(result: Dict[str, np.ndarray], bankroll: float = 100.0,
+                    percentiles: Sequence[float] = (50, 90, 99)) -> Dict[str, float]:
+    """
+    Summary of one simulate_bankroll() run: risk of ruin, how often the stops fired, EV (mean
+    profit per session and per unit wagered, next to what the same bets are worth on fair dice)
+    and the distribution of the worst drawdown as % of the starting bankroll.
+    """
+    wagered = result["wagered"].sum()
+    drawdown = result["max_drawdown"] / bankroll * 100
+    report = {
+        "sessions": len(result["final"]),
+        "risk_of_ruin": np.mean(result["end_reason"] == _RUINED) * 100,
+        "stop_loss_hit": np.mean(result["end_reason"] == _STOP_LOSS) * 100,
+        "take_profit_hit": np.mean(result["end_reason"] == _TAKE_PROFIT) * 100,
+        "mean_profit": result["profit"].mean(),
+        "median_profit": np.median(result["profit"]),
+        "profit_per_unit": result["profit"].sum() / wagered if wagered else 0.0,
+        "fair_dice_edge": result["expected_profit"].sum() / wagered if wagered else 0.0,
+        "bets_per_session": result["bets"].mean(),
+        "mean_stake": wagered / result["bets"].sum() if result["bets"].sum() else 0.0,
+    }
+    report.update({f"drawdown_p{p:g}": np.percentile(drawdown, p) for p in percentiles})
+    report["drawdown_max"] = drawdown.max()
+    return {name: float(value) for name, value in report.items()}
+
+def compare_policies(stream: BetStream, policies: Dict[str, StakingPolicy], bankroll: float = 100.0,
+                     **simulate_kwargs) -> pd.DataFrame:
+    """Runs every named policy over the same stream; one bankroll_report() row per policy."""
+    rows = {name: bankroll_report(simulate_bankroll(stream, policy, bankroll, **simulate_kwargs), bankroll)
+            for name, policy in policies.items()}
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+# Example usage (for testing this module directly)
+if __name__ == "__main__":
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description="Money outcome of staking policies on the oracle's calls.")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--rolls", type=int, default=300, help="rolls bet on per session")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bankroll", type=float, default=100.0)
+    parser.add_argument("--stop-loss", type=float, default=None)
+    parser.add_argument("--take-profit", type=float, default=None)
+    parser.add_argument("--max-stake", type=float, default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    bet_stream = simulate_oracle_sessions(args.sessions, args.rolls, args.warmup, args.seed)
+    print(f"Simulated {args.sessions:,} sessions x {args.rolls} rolls in {time.perf_counter() - started:.1f}s")
+    print("Fair-dice win probability:", {bet: f"{p * 100:.1f}%" for bet, p in FAIR_WIN_PROBABILITY.items()})
+    started = time.perf_counter()
+    table = compare_policies(bet_stream, {
+        "flat": FlatStake(1.0),
+        "martingale (oracle streak)": MartingaleStake(1.0, 2.0),
+        "martingale (losses, max 5)": MartingaleStake(1.0, 2.0, max_steps=5, on="losses"),
+        "half Kelly (hit rate)": KellyStake(0.5),
+        "half Kelly (confidence)": KellyStake(0.5, probability="confidence"),
+    }, args.bankroll, max_stake=args.max_stake, stop_loss=args.stop_loss, take_profit=args.take_profit)
+    print(f"Policies evaluated in {time.perf_counter() - started:.2f}s")
+    with pd.option_context("display.max_columns", None, "display.width", 200, "display.float_format", "{:.3f}".format):
+        print(table.to_string())
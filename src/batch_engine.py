@@ -0,0 +1,482 @@
+# src/batch_engine.py
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from prediction_modules.base_predictor import BasePredictor, HIGHLOW_CODES, PREDICTION_OUTCOMES, PREDICTION_CODES
+from prediction_modules.rule_based_predictor import RuleBasedPredictor
+from prediction_modules.pattern_predictor import PatternPredictor
+from prediction_modules.trend_predictor import TrendPredictor
+from prediction_modules.two_two_pattern_predictor import TwoTwoPatternPredictor
+from prediction_modules.sniper_pattern_predictor import SniperPatternPredictor
+from prediction_modules.smart_predictor import SmartPredictor
+from prediction_modules.hilo_predictor import HiLoPredictor
+from sicbo_oracle import SicBoOracle, SicBoOutcome, RECOVERY_MODULES_ORDER
+from scorer import ConfidenceScorer, PATTERN_NAMES, _dominant_pattern_table
+from roll_tree import PREDICTION_TYPES
+
+_HIGH, _LOW, _HILO, _TRIPLET = (HIGHLOW_CODES[outcome] for outcome in ("สูง", "ต่ำ", "ไฮโล", "ตอง"))
+_EVEN, _ODD = PREDICTION_CODES["คู่"], PREDICTION_CODES["คี่"]
+_OE_TRIPLET = 2 # OddEven codes: 0 คู่, 1 คี่, 2 ตอง.
+_NONE, _NORMAL, _RECOVERY = (PREDICTION_TYPES.index(t) for t in ("none", "normal", "recovery"))
+# Miss-streak class of a settled roll (see SicBoOracle._calculate_miss_streak).
+_NEUTRAL, _MISS, _NORMAL_HIT = 0, 1, 2
+_HISTORY_LIMIT = SicBoOracle.HISTORY_LIMIT
+_BEST_RECENT_LOOKBACK = 10 # Same lookback as SicBoOracle.get_best_recent_module().
+_WINDOW = 15 # Longest tail any supported module reads (HiLoPredictor).
+_PATTERN_WORDS = ("สูง", "ต่ำ", "ไฮโล") # Symbol codes 0-2, as in HIGHLOW_CODES.
+_NOT_TRIED = np.iinfo(np.int64).max
+
+def batch_modules() -> Dict[str, BasePredictor]:
+    """
+    The modules BatchOracleEngine runs, in the oracle's order. They only read the last few
+    HighLow/OddEven values, so they vectorize across tables; the learning modules (Markov,
+    suffix automaton, stacking) keep per-table Python state and are left out.
+    SicBoOracle(modules=batch_modules()) is the single-table reference of the engine.
+    """
+    return {
+        "กฎพื้นฐาน": RuleBasedPredictor(),
+        "รูปแบบ H/L": PatternPredictor(),
+        "เทรนด์ H/L": TrendPredictor(),
+        "รูปแบบ 2-2": TwoTwoPatternPredictor(),
+        "สไนเปอร์": SniperPatternPredictor(),
+        "Smart": SmartPredictor(),
+        "ทำนายไฮโล": HiLoPredictor(),
+    }
+
+def _split_words(pattern: str) -> Optional[List[int]]:
+    """Symbol codes of a pattern key ("สูงต่ำ..."), or None if it has a ตอง (it can never match)."""
+    symbols = []
+    position = 0
+    while position < len(pattern):
+        for code, word in enumerate(_PATTERN_WORDS):
+            if pattern.startswith(word, position):
+                symbols.append(code)
+                position += len(word)
+                break
+        else:
+            if pattern.startswith("ตอง", position):
+                return None
+            raise ValueError(f"Pattern {pattern!r} is not a sequence of สูง/ต่ำ/ไฮโล")
+    return symbols
+
+def _pattern_tables(patterns: Dict[str, SicBoOutcome], window: int) -> List[Optional[np.ndarray]]:
+    """
+    Dense lookup per pattern length k (in outcomes): tables[k][key] is the PREDICTION_CODES of the
+    pattern whose symbols, read as a base-3 number (oldest first), equal key; -1 for none.
+    Patterns longer than the module's window can never match and are dropped.
+    """
+    tables: List[Optional[np.ndarray]] = [None] * (window + 1)
+    for pattern, prediction in patterns.items():
+        symbols = _split_words(pattern)
+        if symbols is None or not 0 < len(symbols) <= window:
+            continue
+        k = len(symbols)
+        if tables[k] is None:
+            tables[k] = np.full(len(_PATTERN_WORDS) ** k, -1, dtype=np.int8)
+        key = 0
+        for symbol in symbols:
+            key = key * len(_PATTERN_WORDS) + symbol
+        tables[k][key] = PREDICTION_CODES[prediction]
+    return tables
+
+def _tail(hl: np.ndarray, length: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The last `length` rolls of each row with ตอง filtered out, without compacting them:
+    (codes, valid, rank from the end among the valid ones (1 = newest, 0 = filtered), valid count).
+    Rolls a table has not had yet are stored as ตอง, so they are filtered the same way.
+    """
+    codes = hl[:, -length:]
+    valid = codes != _TRIPLET
+    rank = np.cumsum(valid[:, ::-1], axis=1)[:, ::-1] * valid
+    return codes, valid, rank, valid.sum(axis=1)
+
+def _match_patterns(hl: np.ndarray, window: int, tables: List[Optional[np.ndarray]]) -> np.ndarray:
+    """Longest pattern matching the end of the last `window` non-ตอง outcomes, as the pattern modules do."""
+    codes, valid, rank, count = _tail(hl, window)
+    prediction = np.full(len(hl), -1, dtype=np.int8)
+    for k in range(len(tables) - 1, 0, -1):
+        if tables[k] is None:
+            continue
+        in_key = rank > 0
+        in_key &= rank <= k
+        key = np.where(in_key, codes.astype(np.int64) * np.power(len(_PATTERN_WORDS), np.maximum(rank - 1, 0)), 0).sum(axis=1)
+        open_rows = (prediction < 0) & (count >= k)
+        prediction[open_rows] = tables[k][key[open_rows]]
+    return prediction
+
+def _rule_based(n: np.ndarray, hl: np.ndarray, oe: np.ndarray) -> np.ndarray:
+    h0, h1, h2 = hl[:, -3], hl[:, -2], hl[:, -1]
+    o0, o1, o2 = oe[:, -3], oe[:, -2], oe[:, -1]
+    same_hl = (h0 != _TRIPLET) & (h0 == h1) & (h1 == h2)
+    same_oe = (o0 != _OE_TRIPLET) & (o0 == o1) & (o1 == o2)
+    alternating = (h0 != _TRIPLET) & (h0 != h1) & (h1 != h2)
+    prediction = np.select([same_hl, same_oe, alternating],
+                           [np.where(h2 == _HIGH, _LOW, _HIGH), np.where(o2 == 0, _ODD, _EVEN), h2], default=-1)
+    return np.where(n >= 3, prediction, -1)
+
+def _trend(n: np.ndarray, hl: np.ndarray) -> np.ndarray:
+    codes, valid, _, count = _tail(hl, 10)
+    high, low = (codes == _HIGH).sum(axis=1), (codes == _LOW).sum(axis=1)
+    prediction = np.select([high > 6, low > 6], [_HIGH, _LOW], default=-1)
+    return np.where((n >= 10) & (count >= 5), prediction, -1)
+
+def _two_two(n: np.ndarray, hl: np.ndarray) -> np.ndarray:
+    a, b, c, d = hl[:, -4], hl[:, -3], hl[:, -2], hl[:, -1]
+    all_valid = (hl[:, -4:] != _TRIPLET).all(axis=1)
+    return np.where((n >= 4) & all_valid & (a == b) & (c == d) & (a != c), a, -1)
+
+def _smart(n: np.ndarray, hl: np.ndarray, tables: List[Optional[np.ndarray]]) -> np.ndarray:
+    prediction = _match_patterns(hl, 8, tables).astype(np.int64)
+    codes, valid, rank, count = _tail(hl, 10)
+    high, low = (codes == _HIGH).sum(axis=1), (codes == _LOW).sum(axis=1)
+    trend = (count >= 5) & (np.abs(high - low) >= 3)
+    last = np.where(rank == 1, codes, 0).sum(axis=1)
+    prediction = np.select([prediction >= 0, trend, count > 0],
+                           [prediction, np.where(high > low, _HIGH, _LOW), last], default=-1)
+    return np.where(n >= 4, prediction, -1)
+
+def _hilo(n: np.ndarray, hl: np.ndarray) -> np.ndarray:
+    codes, valid, rank, count = _tail(hl, 15)
+    recent_hilo = ((codes == _HILO) & (rank > 0) & (rank <= 10)).any(axis=1)
+    return np.where((n >= 10) & (count >= 10) & ~recent_hilo, _HILO, -1)
+
+
+class BatchOracleEngine:
+    """
+    Struct-of-arrays SicBoOracle for many tables at once.
+
+    Every table's last 100 rolls, pending prediction, module predictions, online weights,
+    best-recent-module scoreboard and miss-streak log live in NumPy arrays indexed by table,
+    so one tick() settles and re-predicts every table that received a roll with a handful of
+    vectorized operations instead of one Python oracle (and its loops) per table.
+
+    It runs the modules of batch_modules() (rule, pattern, trend, 2-2, sniper, Smart and HiLo
+    logic), the ConfidenceScorer, the HiLo override, recovery mode and the miss streak with the
+    same rules and the same 100-roll window as SicBoOracle, so each table's predictions match
+    SicBoOracle(modules=batch_modules()) fed the same rolls with predict_next_outcome() after
+    every roll. Undo/redo and the what-if tree stay with the single-table oracle.
+    """
+    def __init__(self, n_tables: int, modules: Optional[Dict[str, BasePredictor]] = None, weight_decay: float = 0.9):
+        """
+        Args:
+            n_tables (int): Number of tables (ids 0..n_tables-1).
+            modules (Dict[str, BasePredictor]): Module set, default batch_modules(). Pattern
+                modules may carry their own `patterns`; only the module types of batch_modules()
+                are supported.
+            weight_decay (float): Decay of the online module weights (as in SicBoOracle).
+        """
+        modules = batch_modules() if modules is None else modules
+        self.module_names = list(modules.keys())
+        self._predictors = [self._vectorize(name, module) for name, module in modules.items()]
+        self.weight_decay = weight_decay
+        self.n_tables = n_tables
+
+        # The oracle's decision settings, with the same names and defaults (see param_sweep.SWEEP_PARAMETERS).
+        reference = SicBoOracle(modules=modules)
+        self.min_history_for_prediction = reference.min_history_for_prediction
+        self.min_non_special_outcome_history_for_prediction = reference.min_non_special_outcome_history_for_prediction
+        self.recovery_miss_streaks = reference.recovery_miss_streaks
+        self.stop_miss_streak = reference.stop_miss_streak
+        self.hilo_weight_threshold = reference.hilo_weight_threshold
+        self.recovery_confidence_multiplier = reference.recovery_confidence_multiplier
+
+        names = self.module_names
+        self._hilo_column = names.index("ทำนายไฮโล") if "ทำนายไฮโล" in names else None
+        # Recovery tries the best recent module, then RECOVERY_MODULES_ORDER; other modules never.
+        self._recovery_rank = np.array([RECOVERY_MODULES_ORDER.index(name) if name in RECOVERY_MODULES_ORDER
+                                        else _NOT_TRIED for name in names], dtype=np.int64)
+        self._scorer = ConfidenceScorer()
+        self.reset()
+
+    @staticmethod
+    def _vectorize(name: str, module: BasePredictor):
+        """The vectorized equivalent of one module: f(history lengths, HighLow window, OddEven window)."""
+        kind = type(module)
+        if kind is RuleBasedPredictor:
+            return _rule_based
+        if kind is TrendPredictor:
+            return lambda n, hl, oe: _trend(n, hl)
+        if kind is TwoTwoPatternPredictor:
+            return lambda n, hl, oe: _two_two(n, hl)
+        if kind is HiLoPredictor:
+            return lambda n, hl, oe: _hilo(n, hl)
+        if kind is PatternPredictor:
+            tables = _pattern_tables(module.known_highlow_patterns, 6)
+            return lambda n, hl, oe: np.where(n >= 4, _match_patterns(hl, 6, tables), -1)
+        if kind is SniperPatternPredictor:
+            tables = _pattern_tables(module.known_patterns, 6)
+            return lambda n, hl, oe: np.where(n >= 4, _match_patterns(hl, 6, tables), -1)
+        if kind is SmartPredictor:
+            tables = _pattern_tables(module.patterns, 8)
+            return lambda n, hl, oe: _smart(n, hl, tables)
+        raise ValueError(f"Module {name!r} ({kind.__name__}) has no vectorized version")
+
+    def reset(self, tables: Optional[np.ndarray] = None):
+        """Clears the history of the given tables (all tables if None), like SicBoOracle.reset_history()."""
+        if tables is None:
+            n_modules = len(self.module_names)
+            self.n_rolls = np.zeros(self.n_tables, dtype=np.int64)
+            # Ring buffers of the last 100 rolls; roll r of a table sits in column r % 100.
+            # Rolls a table has not had yet read as ตอง, which every module filters out.
+            self._highlow = np.full((self.n_tables, _HISTORY_LIMIT), _TRIPLET, dtype=np.int8)
+            self._oddeven = np.full((self.n_tables, _HISTORY_LIMIT), _OE_TRIPLET, dtype=np.int8)
+            self._streak_log = np.full((self.n_tables, _HISTORY_LIMIT), _NEUTRAL, dtype=np.int8)
+            # Per-roll module results (-1 did not count, 0 miss, 1 hit) for the best recent module.
+            self._recent_hits = np.full((self.n_tables, _BEST_RECENT_LOOKBACK, n_modules), -1, dtype=np.int8)
+            self._weight_hits = np.zeros((self.n_tables, n_modules))
+            self._weight_trials = np.zeros((self.n_tables, n_modules))
+            self.module_predictions = np.full((self.n_tables, n_modules), -1, dtype=np.int8)
+            # The pending prediction of every table (what the oracle keeps in last_prediction_*).
+            self.prediction = np.full(self.n_tables, -1, dtype=np.int8)
+            self.prediction_type = np.full(self.n_tables, _NONE, dtype=np.int8)
+            self.confidence = np.full(self.n_tables, -1, dtype=np.int16)
+            self.source_mask = np.zeros(self.n_tables, dtype=np.int64)
+            self.recovery_module = np.full(self.n_tables, -1, dtype=np.int8)
+            self.pattern = np.full(self.n_tables, -1, dtype=np.int8)
+            self.miss_streak = np.zeros(self.n_tables, dtype=np.int16)
+            return
+        tables = np.asarray(tables, dtype=np.int64)
+        self.n_rolls[tables] = 0
+        self._highlow[tables] = _TRIPLET
+        self._oddeven[tables] = _OE_TRIPLET
+        self._streak_log[tables] = _NEUTRAL
+        self._recent_hits[tables] = -1
+        self._weight_hits[tables] = 0.0
+        self._weight_trials[tables] = 0.0
+        self.module_predictions[tables] = -1
+        self.prediction[tables] = -1
+        self.prediction_type[tables] = _NONE
+        self.confidence[tables] = -1
+        self.source_mask[tables] = 0
+        self.recovery_module[tables] = -1
+        self.pattern[tables] = -1
+        self.miss_streak[tables] = 0
+
+    def tick(self, tables: np.ndarray, dice: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Records one roll for each listed table and predicts the next one.
+
+        Args:
+            tables (np.ndarray): Table ids that received a roll this tick (each at most once).
+            dice (np.ndarray): len(tables) x 3 dice values.
+
+        Returns:
+            Dict[str, np.ndarray]: For the listed tables, in order: "table", "prediction"
+            (PREDICTION_CODES, -1 for none), "type" (index into PREDICTION_TYPES), "confidence"
+            (-1 for none), "source_mask" (bit j = module j backs the prediction), "recovery_module"
+            (module index of a recovery prediction, else -1), "pattern" (index into PATTERN_NAMES,
+            -1 for none) and "miss_streak". Decode one table with describe().
+        """
+        tables = np.asarray(tables, dtype=np.int64)
+        dice = np.asarray(dice, dtype=np.int64).reshape(len(tables), 3)
+        if len(np.unique(tables)) != len(tables):
+            raise ValueError("A table can receive at most one roll per tick")
+        total = dice.sum(axis=1)
+        triplet = (dice[:, 0] == dice[:, 1]) & (dice[:, 1] == dice[:, 2])
+        highlow = np.select([triplet, total == 11, total <= 10], [_TRIPLET, _HILO, _LOW], default=_HIGH)
+        oddeven = np.where(triplet, _OE_TRIPLET, total % 2)
+
+        self._settle(tables, highlow)
+        column = self.n_rolls[tables] % _HISTORY_LIMIT
+        self._highlow[tables, column] = highlow
+        self._oddeven[tables, column] = oddeven
+        self.n_rolls[tables] += 1
+        self._predict(tables)
+        return {"table": tables, "prediction": self.prediction[tables], "type": self.prediction_type[tables],
+                "confidence": self.confidence[tables], "source_mask": self.source_mask[tables],
+                "recovery_module": self.recovery_module[tables], "pattern": self.pattern[tables],
+                "miss_streak": self.miss_streak[tables]}
+
+    def _settle(self, tables: np.ndarray, actual: np.ndarray):
+        """Scores the pending module and oracle predictions against the new rolls (SicBoOracle.add_roll)."""
+        n_before = self.n_rolls[tables]
+        # Module results, as SicBoOracle._module_hit; nothing counts before min_history_for_prediction.
+        predictions = self.module_predictions[tables]
+        actual_column = actual[:, None]
+        counts = (predictions >= 0) & ~np.isin(actual_column, (_TRIPLET, _HILO))
+        hit = predictions == actual_column
+        if self._hilo_column is not None:
+            counts[:, self._hilo_column] = predictions[:, self._hilo_column] >= 0
+            hit[:, self._hilo_column] = (predictions[:, self._hilo_column] == _HILO) & (actual == _HILO)
+        counts &= (np.minimum(n_before, _HISTORY_LIMIT) >= self.min_history_for_prediction)[:, None]
+        results = np.where(counts, hit, -1).astype(np.int8)
+
+        # Online weights (OnlineModuleWeights.update) and the scoreboard.
+        decay = self.weight_decay
+        self._weight_hits[tables] = np.where(counts, decay * self._weight_hits[tables] + hit, self._weight_hits[tables])
+        self._weight_trials[tables] = np.where(counts, decay * self._weight_trials[tables] + 1.0, self._weight_trials[tables])
+        self._recent_hits[tables, n_before % _BEST_RECENT_LOOKBACK] = results
+
+        # Miss-streak class of the oracle's own pending prediction.
+        prediction, prediction_type = self.prediction[tables], self.prediction_type[tables]
+        decided = (prediction_type != _NONE) & np.isin(prediction, (_HIGH, _LOW, _HILO))
+        decided &= ~(np.isin(prediction, (_HIGH, _LOW)) & np.isin(actual, (_TRIPLET, _HILO)))
+        streak_class = np.select([decided & (prediction != actual), decided & (prediction_type == _NORMAL)],
+                                 [_MISS, _NORMAL_HIT], default=_NEUTRAL)
+        self._streak_log[tables, n_before % _HISTORY_LIMIT] = streak_class
+
+    def _miss_streaks(self, tables: np.ndarray) -> np.ndarray:
+        """Misses after the last normal hit among the last 100 rolls (SicBoOracle._calculate_miss_streak)."""
+        n = self.n_rolls[tables]
+        columns = (n[:, None] + np.arange(_HISTORY_LIMIT)) % _HISTORY_LIMIT # Oldest roll first.
+        log = self._streak_log[tables[:, None], columns]
+        normal_hit = log == _NORMAL_HIT
+        last_hit = np.where(normal_hit.any(axis=1), _HISTORY_LIMIT - 1 - np.argmax(normal_hit[:, ::-1], axis=1), -1)
+        return ((log == _MISS) & (np.arange(_HISTORY_LIMIT) > last_hit[:, None])).sum(axis=1)
+
+    def _weights(self, tables: np.ndarray) -> np.ndarray:
+        """Normalized online weights (SicBoOracle.get_normalized_module_weights in "online" mode)."""
+        hits, trials = self._weight_hits[tables], self._weight_trials[tables]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(trials > 1e-12, hits / trials * 100, 0.0)
+        max_rate = rates.max(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(max_rate == 0, 1.0, rates / max_rate)
+
+    def _best_recent_modules(self, tables: np.ndarray) -> np.ndarray:
+        """ModuleScoreboard.best_module(10) per table (-1 for none)."""
+        results = self._recent_hits[tables]
+        hits, trials = (results == 1).sum(axis=1), (results >= 0).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(trials > 0, hits / trials, -1.0)
+        return np.where(rates.max(axis=1) >= 0, np.argmax(rates, axis=1), -1)
+
+    def _predict(self, tables: np.ndarray):
+        """predict_next_outcome() for every listed table."""
+        n = self.n_rolls[tables]
+        history_length = np.minimum(n, _HISTORY_LIMIT)
+        columns = (n[:, None] - _WINDOW + np.arange(_WINDOW)) % _HISTORY_LIMIT
+        hl = self._highlow[tables[:, None], columns].astype(np.int64)
+        oe = self._oddeven[tables[:, None], columns[:, -3:]].astype(np.int64)
+        module_predictions = np.stack([predictor(n, hl, oe) for predictor in self._predictors], axis=1).astype(np.int8)
+        self.module_predictions[tables] = module_predictions
+
+        streak = self._miss_streaks(tables)
+        non_special = np.isin(self._highlow[tables], (_HIGH, _LOW)).sum(axis=1)
+        ready = ((history_length >= self.min_history_for_prediction)
+                 & (non_special >= self.min_non_special_outcome_history_for_prediction)
+                 & (streak < self.stop_miss_streak))
+
+        k = len(tables)
+        prediction = np.full(k, -1, dtype=np.int64)
+        confidence = np.full(k, -1, dtype=np.int64)
+        source_mask = np.zeros(k, dtype=np.int64)
+        recovery_module = np.full(k, -1, dtype=np.int64)
+        pattern = np.full(k, -1, dtype=np.int64)
+        prediction_type = np.where(ready, _NORMAL, _NONE)
+
+        rows = np.flatnonzero(ready)
+        if len(rows):
+            weights = self._weights(tables[rows])
+            predictions = module_predictions[rows]
+            scored = self._scorer.score_batch(predictions, weights)
+            row_prediction = scored["prediction"].astype(np.int64)
+            row_confidence = scored["confidence"].astype(np.int64)
+            row_mask = scored["source_mask"]
+            key = np.zeros(len(rows), dtype=np.int64)
+            for column in range(_WINDOW - 6, _WINDOW):
+                key = key * len(HIGHLOW_CODES) + hl[rows, column]
+            row_pattern = np.where(history_length[rows] >= 6, _dominant_pattern_table()[key], -1).astype(np.int64)
+            row_recovery = np.full(len(rows), -1, dtype=np.int64)
+
+            if self._hilo_column is not None:
+                hilo_weight = weights[:, self._hilo_column]
+                hilo = (predictions[:, self._hilo_column] == _HILO) & (hilo_weight > self.hilo_weight_threshold)
+                row_prediction[hilo] = _HILO
+                row_confidence[hilo] = np.minimum(np.trunc(hilo_weight[hilo] * 100), 95)
+                row_mask[hilo] = 1 << self._hilo_column
+                row_pattern[hilo] = -1
+
+            in_recovery = np.isin(streak[rows], self.recovery_miss_streaks)
+            if in_recovery.any():
+                recovering = np.flatnonzero(in_recovery)
+                rank = np.broadcast_to(self._recovery_rank, (len(recovering), len(self.module_names))).copy()
+                too_short = history_length[rows[recovering]] < _BEST_RECENT_LOOKBACK + self.min_history_for_prediction
+                best = np.where(too_short, -1, self._best_recent_modules(tables[rows[recovering]]))
+                has_best = best >= 0
+                rank[has_best, best[has_best]] = -1
+                candidates = np.isin(predictions[recovering], (_HIGH, _LOW, _HILO)) & (rank != _NOT_TRIED)
+                rank = np.where(candidates, rank, _NOT_TRIED)
+                chosen = np.argmin(rank, axis=1)
+                found = candidates[np.arange(len(recovering)), chosen]
+                chosen_rows, chosen_modules = recovering[found], chosen[found]
+                chosen_prediction = predictions[chosen_rows, chosen_modules].astype(np.int64)
+                row_prediction[chosen_rows] = chosen_prediction
+                row_confidence[chosen_rows] = np.minimum(
+                    np.trunc(weights[chosen_rows, chosen_modules] * 100 * self.recovery_confidence_multiplier), 95)
+                row_mask[chosen_rows] = np.left_shift(1, chosen_modules)
+                row_recovery[chosen_rows] = chosen_modules
+                row_pattern[chosen_rows] = np.where(chosen_prediction == _HILO, -1, row_pattern[chosen_rows])
+                prediction_type[rows[recovering]] = _RECOVERY
+
+            prediction[rows] = row_prediction
+            confidence[rows] = row_confidence
+            source_mask[rows] = row_mask
+            recovery_module[rows] = row_recovery
+            pattern[rows] = row_pattern
+
+        self.prediction[tables] = prediction
+        self.prediction_type[tables] = prediction_type
+        self.confidence[tables] = confidence
+        self.source_mask[tables] = source_mask
+        self.recovery_module[tables] = recovery_module
+        self.pattern[tables] = pattern
+        self.miss_streak[tables] = streak
+
+    def describe(self, table: int) -> Tuple[Optional[SicBoOutcome], Optional[str], Optional[int], Optional[str], int, str]:
+        """
+        The pending prediction of one table as SicBoOracle reports it:
+        (prediction, source, confidence, pattern, miss_streak, prediction type).
+        While the oracle waits, its pattern slot holds a message instead; here it is None.
+        """
+        code = int(self.prediction[table])
+        prediction = PREDICTION_OUTCOMES[code] if code >= 0 else None
+        if self.recovery_module[table] >= 0:
+            source = f"{self.module_names[self.recovery_module[table]]}-Recovery"
+        elif prediction is not None:
+            source = ", ".join(name for j, name in enumerate(self.module_names) if self.source_mask[table] >> j & 1)
+        else:
+            source = None
+        confidence = int(self.confidence[table]) if self.confidence[table] >= 0 else None
+        pattern = PATTERN_NAMES[self.pattern[table]] if self.pattern[table] >= 0 else None
+        streak = int(self.miss_streak[table]) if self.n_rolls[table] >= self.min_history_for_prediction else 0
+        return prediction, source, confidence, pattern, streak, PREDICTION_TYPES[self.prediction_type[table]]
+
+
+# Example usage (for testing this module directly)
+if __name__ == "__main__":
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description="Batched multi-table oracle: speed and agreement with SicBoOracle.")
+    parser.add_argument("--tables", type=int, default=5000)
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--activity", type=float, default=0.5, help="share of tables rolling on each tick")
+    parser.add_argument("--check", type=int, default=20, help="tables replayed through SicBoOracle to compare")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    engine = BatchOracleEngine(args.tables)
+    checked = range(min(args.check, args.tables))
+    oracles = {table: SicBoOracle(modules=batch_modules()) for table in checked}
+    mismatches, elapsed, rolls = 0, 0.0, 0
+    for _ in range(args.ticks):
+        active = np.flatnonzero(rng.random(args.tables) < args.activity)
+        dice = rng.integers(1, 7, size=(len(active), 3))
+        start = time.perf_counter()
+        engine.tick(active, dice)
+        elapsed += time.perf_counter() - start
+        rolls += len(active)
+        for table, roll in zip(active.tolist(), dice.tolist()):
+            if table in oracles:
+                oracle = oracles[table]
+                oracle.add_roll(*roll)
+                prediction, source, confidence, pattern, streak = oracle.predict_next_outcome()
+                if oracle.last_prediction_type == "none":
+                    pattern = None # The oracle's waiting message.
+                expected = (prediction, source, confidence, pattern, streak, oracle.last_prediction_type)
+                mismatches += expected != engine.describe(table)
+
+    print(f"{rolls:,} rolls over {args.tables:,} tables in {elapsed:.2f}s "
+          f"({rolls / elapsed:,.0f} rolls/s, {elapsed / args.ticks * 1000:.1f} ms per tick)")
+    print(f"{mismatches} mismatches against SicBoOracle over {len(oracles)} tables")
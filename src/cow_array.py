@@ -0,0 +1,106 @@
+# src/cow_array.py
+from array import array
+from typing import Iterable, List
+
+# Elements per chunk: fork() copies one reference per chunk, a write into a shared chunk copies that chunk.
+_CHUNK_BITS = 10
+_CHUNK_SIZE = 1 << _CHUNK_BITS
+_CHUNK_MASK = _CHUNK_SIZE - 1
+
+
+class CowArray:
+    """
+    Growable typed array (like array.array) that can be forked copy-on-write.
+    Elements live in fixed-size chunks. fork() freezes every chunk: parent and child keep the
+    same chunk list, and the first write or append into a frozen chunk copies that chunk
+    first. A fork therefore costs one reference per 1024 elements, and memory per fork grows
+    with the chunks it changes, not with the array size.
+    Only non-negative indices are supported.
+    """
+    def __init__(self, typecode: str, initial: Iterable[int] = ()):
+        self.typecode = typecode
+        self._chunks: List[array] = []
+        self._owned: List[bool] = [] # False while a chunk may be referenced by another fork.
+        self._length = 0
+        self.extend(initial)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> int:
+        if index >= self._length:
+            raise IndexError("CowArray index out of range")
+        return self._chunks[index >> _CHUNK_BITS][index & _CHUNK_MASK]
+
+    def _writable(self, chunk: int) -> array:
+        if not self._owned[chunk]:
+            self._chunks[chunk] = array(self.typecode, self._chunks[chunk])
+            self._owned[chunk] = True
+        return self._chunks[chunk]
+
+    def __setitem__(self, index: int, value: int):
+        if index >= self._length:
+            raise IndexError("CowArray assignment index out of range")
+        self._writable(index >> _CHUNK_BITS)[index & _CHUNK_MASK] = value
+
+    def append(self, value: int):
+        if self._length & _CHUNK_MASK == 0:
+            self._chunks.append(array(self.typecode, (value,)))
+            self._owned.append(True)
+        else:
+            self._writable(len(self._chunks) - 1).append(value)
+        self._length += 1
+
+    def extend(self, values: Iterable[int]):
+        values = array(self.typecode, values)
+        start = 0
+        while start < len(values):
+            if self._length & _CHUNK_MASK == 0:
+                self._chunks.append(array(self.typecode))
+                self._owned.append(True)
+            chunk = self._writable(len(self._chunks) - 1)
+            take = min(_CHUNK_SIZE - len(chunk), len(values) - start)
+            chunk.extend(values[start:start + take])
+            self._length += take
+            start += take
+
+    def pop(self) -> int:
+        value = self[len(self) - 1]
+        self.truncate(len(self) - 1)
+        return value
+
+    def truncate(self, length: int):
+        """Drops every element from `length` on."""
+        if length >= self._length:
+            return
+        n_chunks = (length + _CHUNK_MASK) >> _CHUNK_BITS
+        del self._chunks[n_chunks:]
+        del self._owned[n_chunks:]
+        keep = length & _CHUNK_MASK
+        if keep:
+            if self._owned[-1]:
+                del self._chunks[-1][keep:]
+            else: # Copy only what is kept of a frozen chunk.
+                self._chunks[-1] = self._chunks[-1][:keep]
+                self._owned[-1] = True
+        self._length = length
+
+    def tolist(self, start: int = 0, stop: int = None) -> List[int]:
+        stop = self._length if stop is None else min(stop, self._length)
+        values: List[int] = []
+        while start < stop:
+            offset = start & _CHUNK_MASK
+            take = min(_CHUNK_SIZE - offset, stop - start)
+            values.extend(self._chunks[start >> _CHUNK_BITS][offset:offset + take].tolist())
+            start += take
+        return values
+
+    def fork(self) -> "CowArray":
+        """Returns a copy-on-write copy; every chunk becomes frozen in both arrays."""
+        self._owned = [False] * len(self._chunks)
+        child = CowArray.__new__(CowArray)
+        child.typecode = self.typecode
+        child._chunks = list(self._chunks)
+        child._owned = [False] * len(self._chunks)
+        child._length = self._length
+        return child
@@ -64,7 +64,10 @@ def save_data(df: pd.DataFrame, filename: str = 'sicbo_data.csv', path: str = 'd
     if not os.path.exists(path):
         os.makedirs(path)
     file_path = os.path.join(path, filename)
-    df.to_csv(file_path, index=False)
+    # Write a temporary file and rename it over the old one, so readers never see a half-written CSV.
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, file_path)
     print(f"Data saved to {file_path}")
 
 def load_data(filename: str = 'sicbo_data.csv', path: str = 'data/') -> pd.DataFrame:
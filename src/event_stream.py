@@ -0,0 +1,260 @@
+# src/event_stream.py
+import os
+import json
+import time
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sicbo_oracle import classify_rolls
+
+# Event types recorded on the stream.
+ROLL = "roll"
+UNDO = "undo"
+REDO = "redo"
+RESET = "reset"
+EVENT_TYPES = (ROLL, UNDO, REDO, RESET)
+
+class StreamEvent(NamedTuple):
+    """One state change: its position in the log, type, dice (for 'roll') and time recorded."""
+    offset: int
+    type: str
+    dice: Optional[tuple]
+    timestamp: float
+
+class EventLog:
+    """
+    Ordered, append-only, in-process log of roll events (a local stand-in for a broker topic).
+    Publishing only appends under a lock and wakes waiting consumers, so it costs the same no
+    matter how many consumers there are or how slow they are. Every consumer keeps its own
+    offset and can re-read the log from any offset.
+    """
+    def __init__(self, events: Optional[List[StreamEvent]] = None):
+        self._events: List[StreamEvent] = list(events or [])
+        self._condition = threading.Condition()
+        self._listeners: List[Callable[[StreamEvent], None]] = []
+
+    def add_listener(self, handler: Callable[[StreamEvent], None]):
+        """
+        Registers a synchronous consumer (e.g. the oracle behind the UI). It runs inside
+        publish(), before the event is appended, so background subscribers only ever see
+        events it has already applied, and an event it rejects is never recorded.
+        """
+        self._listeners.append(handler)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def publish(self, event_type: str, dice: Optional[tuple] = None) -> StreamEvent:
+        """
+        Appends an event and returns it (with its offset).
+
+        Args:
+            event_type (str): ROLL, UNDO, REDO or RESET.
+            dice (tuple): (die1, die2, die3) for ROLL events.
+        """
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"Unknown event type: {event_type!r}")
+        if event_type == ROLL and (dice is None or len(dice) != 3):
+            raise ValueError("ROLL events need three dice")
+        with self._condition:
+            event = StreamEvent(len(self._events), event_type, tuple(int(d) for d in dice) if dice else None, time.time())
+            for listener in self._listeners:
+                listener(event)
+            self._events.append(event)
+            self._condition.notify_all()
+        return event
+
+    def read(self, offset: int, max_events: Optional[int] = None) -> List[StreamEvent]:
+        """Returns the events from `offset` on (at most max_events of them)."""
+        end = len(self._events) if max_events is None else min(len(self._events), offset + max_events)
+        return self._events[offset:end]
+
+    def wait(self, offset: int, timeout: Optional[float] = None) -> bool:
+        """Blocks until an event at `offset` exists; returns False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self._events) > offset, timeout)
+
+    def wake(self):
+        """Wakes every waiting consumer (used when stopping one)."""
+        with self._condition:
+            self._condition.notify_all()
+
+    @classmethod
+    def load_journal(cls, file_path: str, stream_id: Optional[str] = None) -> "EventLog":
+        """Rebuilds a log from a journal written by JournalWriter (optionally one stream only)."""
+        events: List[StreamEvent] = []
+        if os.path.exists(file_path):
+            with open(file_path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if stream_id is not None and record.get("stream") != stream_id:
+                        continue
+                    dice = tuple(record["dice"]) if record.get("dice") else None
+                    events.append(StreamEvent(len(events), record["type"], dice, record["timestamp"]))
+        return cls(events)
+
+class Subscriber:
+    """
+    Consumes an EventLog on its own background thread, at its own pace.
+    The handler is called once per event, in log order. A handler that raises stops the
+    subscriber at that event (see `error`) instead of silently skipping it.
+    """
+    def __init__(self, log: EventLog, handler: Callable[[StreamEvent], None], name: str = "subscriber",
+                 start_offset: int = 0, batch_size: int = 256):
+        self.log = log
+        self.handler = handler
+        self.name = name
+        self.offset = start_offset # Next event to process.
+        self.batch_size = batch_size
+        self.error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "Subscriber":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self.log.wake()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def lag(self) -> int:
+        """Number of published events this subscriber has not processed yet."""
+        return len(self.log) - self.offset
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the subscriber has caught up with the log; returns False on timeout or error."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.lag() > 0 and self.error is None:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return self.error is None
+
+    def replay(self, from_offset: int = 0, reset: Optional[Callable[[], None]] = None):
+        """
+        Rewinds the subscriber so it processes the log again from `from_offset`.
+
+        Args:
+            from_offset (int): First event to process again.
+            reset (Callable): Clears the state the handler rebuilds; called while the
+                subscriber is stopped, before the replay starts.
+        """
+        running = self._thread is not None and self._thread.is_alive()
+        if running:
+            self.stop()
+        if reset is not None:
+            reset()
+        self.offset = from_offset
+        self.error = None
+        if running:
+            self.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if not self.log.wait(self.offset, timeout=0.5):
+                continue
+            for event in self.log.read(self.offset, self.batch_size):
+                if self._stop.is_set():
+                    return
+                try:
+                    self.handler(event)
+                except BaseException as e: # Keep the offset at the failed event.
+                    self.error = e
+                    return
+                self.offset = event.offset + 1
+
+class JournalWriter:
+    """Subscriber handler that appends every event to a JSON-lines journal file."""
+    def __init__(self, file_path: str, stream_id: Optional[str] = None):
+        self.file_path = file_path
+        self.stream_id = stream_id
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def __call__(self, event: StreamEvent):
+        record = {"stream": self.stream_id, "offset": event.offset, "type": event.type,
+                  "dice": list(event.dice) if event.dice else None, "timestamp": event.timestamp}
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+class RollStatistics:
+    """
+    Subscriber handler that keeps running outcome counts of a stream (undo-, redo- and reset-aware).
+    Rolls are classified with sicbo_oracle.classify_rolls, like the oracle's own history.
+    """
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self.totals: Dict[int, int] = {}
+        self._stack: List[tuple] = [] # (total, high_low, odd_even) of every roll still counted.
+        self._undone: List[tuple] = [] # Rolls removed by undo that a redo can bring back.
+        self._lock = threading.Lock()
+
+    def __call__(self, event: StreamEvent):
+        with self._lock:
+            if event.type == ROLL:
+                roll = classify_rolls(*([die] for die in event.dice)).iloc[0]
+                self._stack.append((int(roll['Total']), roll['HighLow'], roll['OddEven']))
+                self._undone.clear()
+                self._count(*self._stack[-1], 1)
+            elif event.type == UNDO and self._stack:
+                self._undone.append(self._stack.pop())
+                self._count(*self._undone[-1], -1)
+            elif event.type == REDO and self._undone:
+                self._stack.append(self._undone.pop())
+                self._count(*self._stack[-1], 1)
+            elif event.type == RESET:
+                self.reset()
+
+    def _count(self, total: int, high_low: str, odd_even: str, amount: int):
+        self.totals[total] = self.totals.get(total, 0) + amount
+        for outcome in {high_low, odd_even}:
+            self.counts[outcome] = self.counts.get(outcome, 0) + amount
+
+    def reset(self):
+        self.counts.clear()
+        self.totals.clear()
+        self._stack.clear()
+        self._undone.clear()
+
+    def snapshot(self) -> Dict[str, object]:
+        """A consistent copy of the current statistics."""
+        with self._lock:
+            return {"rolls": len(self._stack), "counts": dict(self.counts), "totals": dict(self.totals)}
+
+def apply_event(oracle, event: StreamEvent):
+    """Applies one event to a SicBoOracle (the oracle consumer of the stream)."""
+    if event.type == ROLL:
+        oracle.add_roll(*event.dice)
+    elif event.type == UNDO:
+        oracle.remove_last_roll()
+    elif event.type == REDO:
+        oracle.redo_last_roll()
+    elif event.type == RESET:
+        oracle.reset_history()
+
+# Example usage (for testing this module directly)
+if __name__ == "__main__":
+    import random
+    log = EventLog()
+    stats = RollStatistics()
+    subscriber = Subscriber(log, stats, name="stats").start()
+    for _ in range(1000):
+        log.publish(ROLL, tuple(random.randint(1, 6) for _ in range(3)))
+    log.publish(UNDO)
+    subscriber.drain()
+    print(stats.snapshot())
+
+    # Rebuild the statistics from scratch by replaying the stream.
+    subscriber.replay(0, reset=stats.reset)
+    subscriber.drain()
+    print(stats.snapshot())
+    subscriber.stop()
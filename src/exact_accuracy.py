@@ -0,0 +1,335 @@
+# src/exact_accuracy.py
+import time
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from prediction_modules.base_predictor import BasePredictor, HIGHLOW_OUTCOMES, HIGHLOW_CODES, PREDICTION_OUTCOMES
+from prediction_modules.rule_based_predictor import RuleBasedPredictor
+from prediction_modules.pattern_predictor import PatternPredictor
+from prediction_modules.trend_predictor import TrendPredictor
+from prediction_modules.two_two_pattern_predictor import TwoTwoPatternPredictor
+from prediction_modules.sniper_pattern_predictor import SniperPatternPredictor
+from prediction_modules.smart_predictor import SmartPredictor
+from prediction_modules.hilo_predictor import HiLoPredictor
+from sicbo_oracle import SicBoOracle
+
+_ODDEVEN_OUTCOMES = ("คู่", "คี่", "ตอง") # OddEven codes as in BatchOracleEngine.
+
+def _roll_classes() -> List[Tuple[int, int, float]]:
+    """Every roll as one of the (HighLow code, OddEven code) pairs dice can produce, with its fair-dice probability."""
+    counts: Dict[Tuple[int, int], int] = {}
+    for dice in itertools.product(range(1, 7), repeat=3):
+        total, triplet = sum(dice), dice[0] == dice[1] == dice[2]
+        highlow = "ตอง" if triplet else "ไฮโล" if total == 11 else "ต่ำ" if total <= 10 else "สูง"
+        oddeven = 2 if triplet else total % 2
+        counts[(HIGHLOW_CODES[highlow], oddeven)] = counts.get((HIGHLOW_CODES[highlow], oddeven), 0) + 1
+    return [(highlow, oddeven, count / 216) for (highlow, oddeven), count in sorted(counts.items())]
+
+# The six roll classes: สูง/ต่ำ x คู่/คี่, ไฮโล (always คี่) and ตอง.
+ROLL_CLASSES = _roll_classes()
+_CLASS_HIGHLOW = np.array([highlow for highlow, _, _ in ROLL_CLASSES])
+_CLASS_ODDEVEN = np.array([oddeven for _, oddeven, _ in ROLL_CLASSES])
+_CLASS_PROBABILITY = np.array([probability for _, _, probability in ROLL_CLASSES])
+
+# How many past rolls each bounded module reads, and the symbol each roll class becomes in its
+# window state. A symbol only merges classes the module cannot tell apart, so the state stays exact.
+_BY_HIGHLOW = tuple(int(code) for code in _CLASS_HIGHLOW)
+_MODULE_WINDOWS = {
+    RuleBasedPredictor: (3, tuple(range(len(ROLL_CLASSES)))), # Reads HighLow and OddEven.
+    TwoTwoPatternPredictor: (4, _BY_HIGHLOW),
+    PatternPredictor: (6, _BY_HIGHLOW),
+    SniperPatternPredictor: (6, _BY_HIGHLOW),
+    TrendPredictor: (10, _BY_HIGHLOW),
+    SmartPredictor: (10, _BY_HIGHLOW),
+    # Only tells ไฮโล and ตอง from the rest.
+    HiLoPredictor: (15, tuple({"ไฮโล": 1, "ตอง": 2}.get(HIGHLOW_OUTCOMES[code], 0) for code in _CLASS_HIGHLOW)),
+}
+_HISTORY_LENGTH = SicBoOracle.HISTORY_LIMIT # Long-run behaviour: every minimum-history check passes.
+_SKIP, _MISS, _HIT = -1, 0, 1
+
+def _vectorized(name: str, module: BasePredictor):
+    from batch_engine import BatchOracleEngine
+    try:
+        return BatchOracleEngine._vectorize(name, module)
+    except ValueError:
+        return None
+
+def _window_predictions(name: str, module: BasePredictor, window: int, symbols: Tuple[int, ...],
+                        chunk_size: int = 1 << 20, max_calls: int = 100_000) -> np.ndarray:
+    """
+    The module's prediction (PREDICTION_CODES, -1 none) for every window state, state index =
+    the window's symbols read as a base-A number, oldest first.
+    """
+    n_symbols = max(symbols) + 1
+    first_class = [symbols.index(symbol) for symbol in range(n_symbols)] # Class standing in for each symbol.
+    n_states = n_symbols ** window
+    function = _vectorized(name, module)
+    if function is None and n_states > max_calls:
+        raise ValueError(f"{name!r} has no vectorized version and {n_states:,} window states is too many to call predict() on")
+    predictions = np.empty(n_states, dtype=np.int8)
+    powers = n_symbols ** np.arange(window - 1, -1, -1)
+    for start in range(0, n_states, chunk_size):
+        states = np.arange(start, min(start + chunk_size, n_states))
+        classes = np.array(first_class)[(states[:, None] // powers) % n_symbols]
+        highlow, oddeven = _CLASS_HIGHLOW[classes], _CLASS_ODDEVEN[classes]
+        if function is not None:
+            predictions[states] = function(np.full(len(states), _HISTORY_LENGTH), highlow, oddeven)
+            continue
+        for row, state in enumerate(states.tolist()):
+            history = pd.DataFrame({"HighLow": [HIGHLOW_OUTCOMES[code] for code in highlow[row]],
+                                    "OddEven": [_ODDEVEN_OUTCOMES[code] for code in oddeven[row]],
+                                    "Triplet": highlow[row] == HIGHLOW_CODES["ตอง"]})
+            prediction = module.predict(history)
+            predictions[state] = PREDICTION_OUTCOMES.index(prediction) if prediction is not None else -1
+    return predictions
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: scrambles uint64 hashes."""
+    values = (values ^ (values >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    values = (values ^ (values >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return values ^ (values >> np.uint64(31))
+
+def _successor_labels(labels: np.ndarray, n_symbols: int) -> np.ndarray:
+    """labels[successor of state s on symbol a] as an (n_states, n_symbols) array (dropping the oldest symbol)."""
+    return np.tile(labels.reshape(-1, n_symbols), (n_symbols, 1))
+
+def _is_lumping(labels: np.ndarray, predictions: np.ndarray, n_symbols: int) -> bool:
+    """Whether every state agrees with its class representative on its prediction and on where each symbol leads."""
+    _, representative = np.unique(labels, return_index=True)
+    rep = representative[labels]
+    successors = _successor_labels(labels, n_symbols)
+    return bool((predictions == predictions[rep]).all() and (successors == successors[rep]).all())
+
+def _refine(predictions: np.ndarray, n_symbols: int) -> np.ndarray:
+    """Moore partition refinement with exact (sorted) class ids: slower, no hashing."""
+    labels = np.unique(predictions, return_inverse=True)[1].astype(np.int64)
+    n_classes = labels.max() + 1
+    while True:
+        refined = labels
+        successors = _successor_labels(labels, n_symbols)
+        for symbol in range(n_symbols):
+            refined = np.unique(refined * n_classes + successors[:, symbol], return_inverse=True)[1].astype(np.int64)
+        if refined.max() + 1 == n_classes:
+            return labels
+        labels, n_classes = refined, refined.max() + 1
+
+def _minimize(predictions: np.ndarray, window: int, n_symbols: int) -> np.ndarray:
+    """
+    Merges window states that can never be told apart: same prediction now and after every
+    possible continuation. Returns each state's class id.
+
+    After `window` rolls the state no longer depends on where it started, so two states are
+    equivalent iff they agree on every continuation of at most window - 1 rolls. Each state's
+    hash folds in its successors' hashes window - 1 times; the resulting partition is checked to
+    be an exact lumping of the chain, and recomputed by sorted refinement in the unlikely case
+    a hash collision merged states that differ.
+    """
+    hashes = _mix(predictions.astype(np.int64).astype(np.uint64) + np.uint64(1))
+    for _ in range(window - 1):
+        successors = hashes.reshape(-1, n_symbols)
+        combined = np.zeros(len(successors), dtype=np.uint64)
+        for symbol in range(n_symbols):
+            combined = _mix(combined + successors[:, symbol] + np.uint64(symbol + 1))
+        hashes = _mix(hashes ^ np.tile(combined, n_symbols) * np.uint64(0x9E3779B97F4A7C15))
+    labels = np.unique(hashes, return_inverse=True)[1].astype(np.int64)
+    if _is_lumping(labels, predictions, n_symbols):
+        return labels
+    return _refine(predictions, n_symbols)
+
+class _Chain:
+    """The lumped window chain: per class state, its prediction and where each roll class leads."""
+    def __init__(self, name: str, predictions: np.ndarray, labels: np.ndarray, window: int, symbols: Tuple[int, ...]):
+        n_symbols = max(symbols) + 1
+        symbol_probability = np.bincount(symbols, weights=_CLASS_PROBABILITY, minlength=n_symbols)
+        n_classes = labels.max() + 1
+        _, representative = np.unique(labels, return_index=True)
+        base = (representative % n_symbols ** (window - 1)) * n_symbols
+        self.size = n_classes
+        self.prediction = predictions[representative]
+        self.next = labels[base[:, None] + np.array(symbols)[None, :]]
+        # Rolls are independent, so a window's long-run probability is the product of its symbols'.
+        stationary = np.zeros(n_classes)
+        powers = n_symbols ** np.arange(window - 1, -1, -1)
+        for start in range(0, len(labels), 1 << 20):
+            states = np.arange(start, min(start + (1 << 20), len(labels)))
+            weights = symbol_probability[(states[:, None] // powers) % n_symbols].prod(axis=1)
+            stationary += np.bincount(labels[states], weights=weights, minlength=n_classes)
+        self.stationary = stationary
+        # Whether the call counts and hits, per (class state, roll class), with the oracle's rules.
+        table = np.array([[_SKIP if code < 0 else {None: _SKIP, False: _MISS, True: _HIT}[
+                              SicBoOracle._module_hit(name, PREDICTION_OUTCOMES[code], HIGHLOW_OUTCOMES[highlow])]
+                           for highlow in _CLASS_HIGHLOW] for code in range(-1, len(PREDICTION_OUTCOMES))])
+        self.event = table[self.prediction.astype(np.int64) + 1]
+        self._targets = ((self.event - _SKIP) * n_classes + self.next).ravel() # One bincount bin per (event, state).
+
+    def flow(self, mass: np.ndarray) -> Dict[int, np.ndarray]:
+        """Distributes state mass over one roll: the mass arriving in each state, per event."""
+        arrived = np.bincount(self._targets, weights=(mass[:, None] * _CLASS_PROBABILITY[None, :]).ravel(),
+                              minlength=3 * self.size).reshape(3, self.size)
+        return {event: arrived[event - _SKIP] for event in (_SKIP, _MISS, _HIT)}
+
+    def next_decided(self, mass: np.ndarray, tolerance: float = 1e-15, max_rolls: int = 100_000) -> Tuple[np.ndarray, np.ndarray]:
+        """Follows mass through uncounted rolls to the next counted call: (mass after a hit, mass after a miss)."""
+        hit, miss = np.zeros(self.size), np.zeros(self.size)
+        for _ in range(max_rolls):
+            flows = self.flow(mass)
+            hit += flows[_HIT]
+            miss += flows[_MISS]
+            mass = flows[_SKIP]
+            if mass.sum() < tolerance:
+                break
+        return hit, miss
+
+    def run_lengths(self, run_event: int, max_run: int) -> Tuple[np.ndarray, float]:
+        """
+        Long-run distribution of the lengths of runs of consecutive counted hits (run_event=_HIT)
+        or misses: P(length = 1..max_run) and P(length > max_run).
+        """
+        other = _MISS if run_event == _HIT else _HIT
+        after_other = self.flow(self.stationary)[other] # Where the chain is just after the event that ends a run.
+        run = self.next_decided(after_other)[1 if run_event == _MISS else 0]
+        starts = run.sum()
+        lengths = np.zeros(max_run)
+        if starts == 0:
+            return lengths, 0.0
+        for length in range(max_run):
+            after_hit, after_miss = self.next_decided(run)
+            lengths[length] = (after_miss if run_event == _HIT else after_hit).sum() / starts
+            run = after_hit if run_event == _HIT else after_miss
+        return lengths, run.sum() / starts
+
+def exact_module_accuracy(name: str, module: BasePredictor, window: Optional[int] = None,
+                          max_run: int = 20, max_states: int = 1 << 24) -> Dict[str, object]:
+    """
+    Exact long-run accuracy of one bounded-window module on fair dice.
+
+    The module's prediction only depends on the last `window` rolls, so the window is a finite
+    Markov chain whose transitions are the roll probabilities of the 216 dice combinations. Its
+    states are enumerated (HighLow or, where the module reads it, HighLow + OddEven symbols),
+    the module's vectorized form (BatchOracleEngine) predicts for all of them at once, states
+    with identical futures are merged, and hit rate, coverage and streak lengths are read off
+    the lumped chain with the oracle's hit rules (SicBoOracle._module_hit).
+
+    Args:
+        name (str): Module name as in the oracle (decides the hit rule of 'ทำนายไฮโล').
+        module (BasePredictor): The module. Modules that learn from history (Markov, suffix
+            automaton, stacking) have no bounded window and are rejected.
+        window (int): Rolls the module reads; required for module types not in the built-in table.
+            Their predict() is then called on every window (HighLow, OddEven and Triplet columns),
+            so keep it small.
+        max_run (int): Longest run length reported separately.
+        max_states (int): Largest window chain to enumerate.
+
+    Returns:
+        Dict[str, object]: "module", "window", "states", "lumped_states", "coverage" (% of rolls
+        with a call), "counted" (% of rolls whose call counted), "hit_rate" (% of counted calls),
+        "calls" (share of calls per predicted outcome, %), "hit_runs"/"miss_runs" (P(run length
+        = 1..max_run) of consecutive counted hits/misses), "hit_run_tail"/"miss_run_tail"
+        (P(length > max_run)), "mean_hit_run", "mean_miss_run" and "seconds".
+    """
+    started = time.perf_counter()
+    if module.uses_module_predictions:
+        raise ValueError(f"{name!r} combines other modules' predictions; it has no window of its own")
+    if type(module) in _MODULE_WINDOWS:
+        default_window, symbols = _MODULE_WINDOWS[type(module)]
+        window = default_window if window is None else window
+    elif window is None:
+        raise ValueError(f"{name!r} ({type(module).__name__}) needs an explicit window")
+    else:
+        symbols = tuple(range(len(ROLL_CLASSES)))
+    n_symbols = max(symbols) + 1
+    if n_symbols ** window > max_states:
+        raise ValueError(f"{name!r}: {n_symbols ** window:,} window states exceeds max_states={max_states:,}")
+
+    predictions = _window_predictions(name, module, window, symbols)
+    chain = _Chain(name, predictions, _minimize(predictions, window, n_symbols), window, symbols)
+    flows = chain.flow(chain.stationary)
+    hit_rate_per_roll, miss_rate_per_roll = flows[_HIT].sum(), flows[_MISS].sum()
+    counted = hit_rate_per_roll + miss_rate_per_roll
+    called = chain.prediction >= 0
+    calls = pd.Series(chain.stationary[called]).groupby(chain.prediction[called]).sum()
+    hit_runs, hit_tail = chain.run_lengths(_HIT, max_run)
+    miss_runs, miss_tail = chain.run_lengths(_MISS, max_run)
+    # Runs per roll = rate of the events that can start them; mean length = events / runs.
+    hit_run_starts = chain.next_decided(flows[_MISS])[0].sum()
+    miss_run_starts = chain.next_decided(flows[_HIT])[1].sum()
+    return {
+        "module": name,
+        "window": window,
+        "states": len(predictions),
+        "lumped_states": chain.size,
+        "coverage": chain.stationary[called].sum() * 100,
+        "counted": counted * 100,
+        "hit_rate": hit_rate_per_roll / counted * 100 if counted else 0.0,
+        "calls": {PREDICTION_OUTCOMES[code]: share / calls.sum() * 100 for code, share in calls.items()},
+        "hit_runs": hit_runs,
+        "hit_run_tail": hit_tail,
+        "miss_runs": miss_runs,
+        "miss_run_tail": miss_tail,
+        "mean_hit_run": hit_rate_per_roll / hit_run_starts if hit_run_starts else float("nan"),
+        "mean_miss_run": miss_rate_per_roll / miss_run_starts if miss_run_starts else float("nan"),
+        "seconds": time.perf_counter() - started,
+    }
+
+def exact_accuracy_table(modules: Optional[Dict[str, BasePredictor]] = None, max_run: int = 20) -> pd.DataFrame:
+    """
+    exact_module_accuracy() for every module (default: batch_modules(), the oracle's bounded-window
+    modules), one row each with the scalar results and the chance of a run of 3+ / 6+ misses.
+    """
+    if modules is None:
+        from batch_engine import batch_modules
+        modules = batch_modules()
+    rows = []
+    for name, module in modules.items():
+        result = exact_module_accuracy(name, module, max_run=max_run)
+        row = {key: value for key, value in result.items() if np.isscalar(value)}
+        for length in (3, 6):
+            row[f"miss_run_{length}+"] = (result["miss_runs"][length - 1:].sum() + result["miss_run_tail"]) * 100
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("module")
+
+def compare_with_backtest(exact: pd.DataFrame, backtest: pd.DataFrame) -> pd.DataFrame:
+    """
+    Puts backtested hit rates next to the exact ones. `backtest` has "module", "predictions"
+    (counted calls) and "hits" columns, e.g. PredictionLedger.hit_rate_by_module(). The z-score
+    treats calls as independent, so only read large |z| (say > 4) as a real difference.
+    """
+    merged = backtest.set_index("module")[["predictions", "hits"]].join(exact[["hit_rate"]], how="inner")
+    p = merged["hit_rate"] / 100
+    merged["backtest_hit_rate"] = merged["hits"] / merged["predictions"].where(merged["predictions"] > 0) * 100
+    merged["z"] = (merged["hits"] - merged["predictions"] * p) / np.sqrt(merged["predictions"] * p * (1 - p))
+    return merged.rename(columns={"hit_rate": "exact_hit_rate"})
+
+# Example usage (for testing this module directly)
+if __name__ == "__main__":
+    import argparse
+    from numpy.lib.stride_tricks import sliding_window_view
+    parser = argparse.ArgumentParser(description="Exact long-run hit rates of the bounded-window modules on fair dice.")
+    parser.add_argument("--check", type=int, default=1_000_000, help="simulated rolls to compare against (0 = skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    exact = exact_accuracy_table()
+    with pd.option_context("display.max_columns", None, "display.width", 200, "display.float_format", "{:.3f}".format):
+        print(exact.to_string())
+
+    if args.check:
+        from batch_engine import batch_modules
+        rng = np.random.default_rng(args.seed)
+        classes = rng.choice(len(ROLL_CLASSES), size=args.check, p=_CLASS_PROBABILITY)
+        rows = []
+        for name, module in batch_modules().items():
+            window = _MODULE_WINDOWS[type(module)][0]
+            highlow = sliding_window_view(_CLASS_HIGHLOW[classes[:-1]], window)
+            oddeven = sliding_window_view(_CLASS_ODDEVEN[classes[:-1]], window)
+            predictions = _vectorized(name, module)(np.full(len(highlow), _HISTORY_LENGTH), highlow, oddeven)
+            actual = classes[window:]
+            events = np.array([_SKIP if code < 0 else {None: _SKIP, False: _MISS, True: _HIT}[
+                SicBoOracle._module_hit(name, PREDICTION_OUTCOMES[code], HIGHLOW_OUTCOMES[_CLASS_HIGHLOW[c]])]
+                for code, c in itertools.product(range(-1, len(PREDICTION_OUTCOMES)), range(len(ROLL_CLASSES)))])
+            event = events[(predictions.astype(np.int64) + 1) * len(ROLL_CLASSES) + actual]
+            rows.append({"module": name, "predictions": int((event >= 0).sum()), "hits": int((event == _HIT).sum())})
+        print(f"\nAgainst {args.check:,} simulated rolls:")
+        print(compare_with_backtest(exact, pd.DataFrame(rows)).to_string(float_format="{:.3f}".format))
@@ -0,0 +1,145 @@
+# src/ingest.py
+import os
+import queue
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set
+
+from archive import RollArchive
+from sicbo_oracle import classify_rolls
+
+_DONE = object() # Marks the end of one file on the chunk queue.
+
+def _parse_file(file_path: str, column_map: Dict[str, str], default_table: Optional[str], chunksize: int,
+                out_queue: "queue.Queue"):
+    """
+    Worker: reads one log in chunks, validates it and recomputes the derived columns.
+    Puts (file_path, valid DataFrame, rows read, rejected-by-reason) tuples on out_queue,
+    then (file_path, _DONE, error or None).
+    """
+    try:
+        for raw in pd.read_csv(file_path, chunksize=chunksize, dtype=str):
+            raw = raw.rename(columns=column_map)
+            rejected: Dict[str, int] = {}
+            n_read = len(raw)
+
+            if 'table' not in raw.columns:
+                if default_table is None:
+                    raise ValueError("no 'table' column and no default_table given")
+                raw['table'] = default_table
+            missing = [c for c in ('Die1', 'Die2', 'Die3', 'RoundId') if c not in raw.columns]
+            if missing:
+                raise ValueError(f"missing columns: {', '.join(missing)}")
+
+            dice = raw[['Die1', 'Die2', 'Die3']].apply(pd.to_numeric, errors='coerce')
+            round_id = pd.to_numeric(raw['RoundId'], errors='coerce')
+            table = raw['table'].astype(str).str.strip()
+
+            bad_number = dice.isna().any(axis=1) | (dice % 1 != 0).any(axis=1)
+            bad_range = ~bad_number & ((dice < 1) | (dice > 6)).any(axis=1)
+            bad_round = ~bad_number & ~bad_range & (round_id.isna() | (round_id % 1 != 0))
+            bad_table = ~bad_number & ~bad_range & ~bad_round & ~table.str.fullmatch(r'[A-Za-z0-9_-]+')
+            for reason, mask in (('not_a_number', bad_number), ('die_out_of_range', bad_range),
+                                 ('bad_round_id', bad_round), ('bad_table_id', bad_table)):
+                if mask.any():
+                    rejected[reason] = int(mask.sum())
+            valid = ~(bad_number | bad_range | bad_round | bad_table)
+
+            dice = dice[valid].astype(np.uint8)
+            # Derived columns are always recomputed with the oracle's rules, never trusted from the log.
+            rolls = classify_rolls(dice['Die1'].to_numpy(), dice['Die2'].to_numpy(), dice['Die3'].to_numpy())
+            rolls['RoundId'] = round_id[valid].astype(np.int64).to_numpy()
+            rolls['table'] = table[valid].to_numpy()
+            if 'Timestamp' in raw.columns:
+                rolls['Timestamp'] = pd.to_datetime(raw.loc[valid, 'Timestamp'], errors='coerce').to_numpy()
+            out_queue.put((file_path, rolls, n_read, rejected))
+        out_queue.put((file_path, _DONE, None))
+    except Exception as e: # Report the failure and let the other files go on.
+        out_queue.put((file_path, _DONE, f"{type(e).__name__}: {e}"))
+
+def ingest_logs(file_paths: List[str], archive: RollArchive, column_map: Optional[Dict[str, str]] = None,
+                default_table: Optional[str] = None, chunksize: int = 200_000, workers: int = 4) -> dict:
+    """
+    Imports exported roll logs (CSV) into the RollArchive.
+
+    Files are parsed in parallel worker threads, chunk by chunk, and handed over through a
+    bounded queue, so memory stays at roughly (workers * 2) chunks no matter how large the
+    logs are. Every row is validated (dice must be integers 1-6, RoundId an integer, table an
+    id), Total/HighLow/OddEven/Triplet are recomputed with the oracle's rules, and rows are
+    deduplicated by (table, RoundId) against each other and against what the archive already holds.
+
+    Args:
+        file_paths (List[str]): CSV files to import.
+        archive (RollArchive): Destination archive.
+        column_map (Dict[str, str]): Renames source columns to Die1/Die2/Die3/RoundId/table/Timestamp.
+        default_table (str): Table id for files without a table column.
+        chunksize (int): Rows per parsed chunk.
+        workers (int): Files parsed in parallel.
+
+    Returns:
+        dict: Counts of rows read/written/duplicate/rejected (by reason), per-file errors, and throughput.
+    """
+    column_map = column_map or {}
+    started = time.perf_counter()
+    report = {"files": len(file_paths), "rows_read": 0, "rows_written": 0, "duplicates": 0,
+              "rejected": {}, "errors": {}}
+    seen: Dict[str, Set[int]] = {}
+    chunk_queue: "queue.Queue" = queue.Queue(maxsize=max(2, workers * 2))
+
+    def known_round_ids(table: str) -> Set[int]:
+        if table not in seen:
+            existing = archive.scan(columns=['RoundId'], tables=[table])
+            seen[table] = set(existing['RoundId'].dropna().astype(np.int64).tolist())
+        return seen[table]
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for file_path in file_paths:
+            executor.submit(_parse_file, file_path, column_map, default_table, chunksize, chunk_queue)
+
+        remaining = len(file_paths)
+        while remaining:
+            item = chunk_queue.get()
+            file_path, rolls = item[0], item[1]
+            if rolls is _DONE:
+                remaining -= 1
+                if item[2] is not None:
+                    report["errors"][file_path] = item[2]
+                continue
+            n_read, rejected = item[2], item[3]
+            report["rows_read"] += n_read
+            for reason, count in rejected.items():
+                report["rejected"][reason] = report["rejected"].get(reason, 0) + count
+
+            rolls = rolls.drop_duplicates(subset=['table', 'RoundId'])
+            for table, part in rolls.groupby('table', sort=False):
+                known = known_round_ids(table)
+                part = part[~part['RoundId'].isin(known)]
+                if part.empty:
+                    continue
+                known.update(part['RoundId'].tolist())
+                report["rows_written"] += archive.append(part.drop(columns=['table']), table=table)
+
+    elapsed = time.perf_counter() - started
+    report["rows_rejected"] = sum(report["rejected"].values())
+    report["duplicates"] = report["rows_read"] - report["rows_rejected"] - report["rows_written"]
+    report["seconds"] = elapsed
+    report["rows_per_second"] = report["rows_read"] / elapsed if elapsed > 0 else 0.0
+    return report
+
+# Example usage (for importing logs from the command line)
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Import roll logs into the Parquet archive.")
+    parser.add_argument("files", nargs="+", help="CSV roll logs")
+    parser.add_argument("--archive", default=os.path.join("data", "archive"), help="archive root directory")
+    parser.add_argument("--table", default=None, help="table id for files without a 'table' column")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    args = parser.parse_args()
+
+    result = ingest_logs(args.files, RollArchive(args.archive), default_table=args.table,
+                         chunksize=args.chunksize, workers=args.workers)
+    for k, v in result.items():
+        print(f"{k}: {v}")
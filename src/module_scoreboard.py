@@ -0,0 +1,78 @@
+# src/module_scoreboard.py
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+
+class ModuleScoreboard:
+    """
+    Ring buffer of cumulative hit/trial counts per module, one row per recorded roll.
+    The counts over the last k rolls are the difference of two prefix sums, so
+    "best module over the last k rolls" costs O(modules) for any k up to the window.
+    """
+    def __init__(self, module_names: List[str], window: int = 100):
+        self.module_names = list(module_names)
+        self.window = window
+        # Row (n % (window + 1)) holds the totals after n recorded rolls.
+        self._cum_hits = np.zeros((window + 1, len(self.module_names)), dtype=np.int64)
+        self._cum_trials = np.zeros((window + 1, len(self.module_names)), dtype=np.int64)
+        self._count = 0
+        self._available = 0 # How many of the most recent rolls can still be queried.
+
+    def record(self, module_hits: Dict[str, Optional[bool]]):
+        """
+        Records the real hit/miss of every module for one roll.
+
+        Args:
+            module_hits (Dict[str, Optional[bool]]): module_name: True (hit), False (miss),
+                or None/missing when the module's prediction did not count for this roll.
+        """
+        hits = np.zeros(len(self.module_names), dtype=np.int64)
+        trials = np.zeros(len(self.module_names), dtype=np.int64)
+        for i, name in enumerate(self.module_names):
+            hit = module_hits.get(name)
+            if hit is not None:
+                trials[i] = 1
+                hits[i] = 1 if hit else 0
+
+        prev_row = self._count % (self.window + 1)
+        next_row = (self._count + 1) % (self.window + 1)
+        self._cum_hits[next_row] = self._cum_hits[prev_row] + hits
+        self._cum_trials[next_row] = self._cum_trials[prev_row] + trials
+        self._count += 1
+        self._available = min(self._available + 1, self.window)
+
+    @property
+    def available(self) -> int:
+        """How many of the most recent rolls can still be queried."""
+        return self._available
+
+    def pop(self):
+        """Forgets the most recently recorded roll (used when the last roll is removed)."""
+        if self._count == 0:
+            return
+        self._count -= 1
+        # The row that fell out of the ring when this roll was recorded is gone for good.
+        self._available = max(self._available - 1, 0)
+
+    def recent_counts(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns (hits, trials) per module over the last k recorded rolls (clamped to what is available)."""
+        k = max(0, min(k, self._available))
+        end_row = self._count % (self.window + 1)
+        start_row = (self._count - k) % (self.window + 1)
+        return self._cum_hits[end_row] - self._cum_hits[start_row], self._cum_trials[end_row] - self._cum_trials[start_row]
+
+    def best_module(self, k: int) -> Optional[str]:
+        """Returns the module with the highest hit rate over the last k rolls, or None if no module counted."""
+        hits, trials = self.recent_counts(k)
+        best_name, best_rate = None, -1.0
+        for i, name in enumerate(self.module_names):
+            if trials[i] > 0 and hits[i] / trials[i] > best_rate:
+                best_name, best_rate = name, hits[i] / trials[i]
+        return best_name
+
+    def reset(self):
+        """Clears the scoreboard."""
+        self._cum_hits[:] = 0
+        self._cum_trials[:] = 0
+        self._count = 0
+        self._available = 0
@@ -0,0 +1,54 @@
+# src/module_weights.py
+from typing import Dict, List, Optional
+
+
+class OnlineModuleWeights:
+    """
+    Tracks an exponentially decayed hit rate for every prediction module.
+    Each update costs O(modules), so the oracle can refresh module weights on every roll
+    instead of replaying the whole history through every module.
+    """
+    def __init__(self, module_names: List[str], decay: float = 0.9):
+        if not 0.0 < decay <= 1.0:
+            raise ValueError("decay must be in the range (0, 1]")
+        self.module_names = list(module_names)
+        # decay=1.0 weights every past roll equally (plain running accuracy);
+        # smaller values forget old rolls faster and react quicker to regime changes.
+        self.decay = decay
+        self.hits: Dict[str, float] = {name: 0.0 for name in self.module_names}
+        self.trials: Dict[str, float] = {name: 0.0 for name in self.module_names}
+
+    def update(self, module_hits: Dict[str, Optional[bool]]):
+        """
+        Applies the result of one roll.
+
+        Args:
+            module_hits (Dict[str, Optional[bool]]): module_name: True (hit), False (miss),
+                or None when the module's prediction does not count for this roll.
+        """
+        for name, hit in module_hits.items():
+            if hit is None or name not in self.hits:
+                continue
+            self.hits[name] = self.decay * self.hits[name] + (1.0 if hit else 0.0)
+            self.trials[name] = self.decay * self.trials[name] + 1.0
+
+    def get_state(self) -> tuple:
+        """Returns a copy of the decayed counts, for set_state()."""
+        return dict(self.hits), dict(self.trials)
+
+    def set_state(self, state: tuple):
+        """Restores counts saved with get_state()."""
+        self.hits, self.trials = dict(state[0]), dict(state[1])
+
+    def hit_rates(self) -> Dict[str, float]:
+        """Returns the decayed hit rate (0-100) of every module, 0 for modules that never counted."""
+        return {
+            name: (self.hits[name] / self.trials[name] * 100) if self.trials[name] > 1e-12 else 0
+            for name in self.module_names
+        }
+
+    def reset(self):
+        """Forgets all recorded results."""
+        for name in self.module_names:
+            self.hits[name] = 0.0
+            self.trials[name] = 0.0
@@ -0,0 +1,382 @@
+# src/param_sweep.py
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from prediction_modules.base_predictor import HIGHLOW_OUTCOMES, HIGHLOW_CODES, PREDICTION_OUTCOMES, PREDICTION_CODES
+from sicbo_oracle import SicBoOracle, classify_rolls, decide_prediction
+from scorer import ConfidenceScorer
+from module_weights import OnlineModuleWeights
+from module_scoreboard import ModuleScoreboard
+
+# Oracle settings the sweep can vary. None of them changes what the modules predict.
+SWEEP_PARAMETERS = (
+    "min_history_for_prediction",
+    "min_non_special_outcome_history_for_prediction",
+    "recovery_miss_streaks",
+    "stop_miss_streak",
+    "hilo_weight_threshold",
+    "recovery_confidence_multiplier",
+)
+
+# A small grid around the oracle's defaults.
+DEFAULT_GRID = {
+    "min_history_for_prediction": [5, 10],
+    "min_non_special_outcome_history_for_prediction": [5, 10, 20],
+    "recovery_miss_streaks": [(3, 4, 5), (2, 3), (4, 5)],
+    "stop_miss_streak": [4, 6, 8],
+    "hilo_weight_threshold": [0.6, 0.7, 0.8],
+    "recovery_confidence_multiplier": [1.0, 1.2],
+}
+
+_HISTORY_LIMIT = 100 # The oracle keeps (and scans miss streaks over) the last 100 rolls.
+_BEST_RECENT_LOOKBACK = 10 # Same lookback as SicBoOracle.get_best_recent_module().
+_NO_PREDICTION = -1
+
+class PredictionMatrix:
+    """
+    What every module predicted for every roll of a history, computed once and reused for
+    all settings in a sweep.
+
+    Attributes:
+        module_names (List[str]): Column order of `predictions`.
+        predictions (np.ndarray): int8 array (rolls x modules) of PREDICTION_CODES; row i holds the
+            predictions made just before roll i, -1 where a module made none.
+        outcomes (np.ndarray): int8 array of the HIGHLOW_CODES of every roll.
+    """
+    def __init__(self, module_names: List[str], predictions: np.ndarray, outcomes: np.ndarray):
+        self.module_names = list(module_names)
+        self.predictions = predictions
+        self.outcomes = outcomes
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def save(self, file_path: str):
+        """Saves the matrix as a compressed .npz file."""
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        np.savez_compressed(file_path, module_names=np.array(self.module_names), predictions=self.predictions,
+                            outcomes=self.outcomes)
+
+    @classmethod
+    def load(cls, file_path: str) -> "PredictionMatrix":
+        with np.load(file_path) as data:
+            return cls(data["module_names"].tolist(), data["predictions"], data["outcomes"])
+
+def build_prediction_matrix(rolls: pd.DataFrame, oracle: Optional[SicBoOracle] = None) -> PredictionMatrix:
+    """
+    Replays rolls through an oracle's modules once and records every module's prediction.
+    This is the expensive part of a sweep (one add_roll per roll); the result can be saved
+    and reused.
+
+    Args:
+        rolls (pd.DataFrame): Rolls with 'Die1', 'Die2', 'Die3' columns, oldest first.
+        oracle (SicBoOracle): Empty oracle whose modules are used (a new SicBoOracle() if None).
+
+    Returns:
+        PredictionMatrix: The module predictions and the outcome of every roll.
+    """
+    oracle = oracle if oracle is not None else SicBoOracle()
+    if not oracle.history.empty:
+        raise ValueError("build_prediction_matrix needs an oracle with an empty history")
+    module_names = list(oracle.modules.keys())
+    dice = rolls[['Die1', 'Die2', 'Die3']].to_numpy(dtype=np.int64)
+    predictions = np.full((len(dice), len(module_names)), _NO_PREDICTION, dtype=np.int8)
+
+    for i, (die1, die2, die3) in enumerate(dice):
+        if not oracle.history.empty:
+            module_predictions = oracle._current_module_predictions()
+            for j, name in enumerate(module_names):
+                pred = module_predictions.get(name)
+                if pred is not None:
+                    predictions[i, j] = PREDICTION_CODES[pred]
+        oracle.add_roll(int(die1), int(die2), int(die3))
+
+    high_low = classify_rolls(dice[:, 0], dice[:, 1], dice[:, 2])['HighLow']
+    outcomes = high_low.map(HIGHLOW_CODES).to_numpy(dtype=np.int8)
+    return PredictionMatrix(module_names, predictions, outcomes)
+
+def param_grid(**values: List[Any]) -> List[Dict[str, Any]]:
+    """
+    Expands lists of values into every combination, e.g.
+    param_grid(stop_miss_streak=[4, 6], hilo_weight_threshold=[0.6, 0.7]) gives 4 configs.
+    """
+    unknown = set(values) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    names = list(values.keys())
+    return [dict(zip(names, combo)) for combo in itertools.product(*(values[name] for name in names))]
+
+def oracle_settings(oracle: SicBoOracle) -> Dict[str, Any]:
+    """Reads the current values of the sweepable settings from an oracle."""
+    return {name: getattr(oracle, name) for name in SWEEP_PARAMETERS}
+
+def _decode_predictions(matrix: PredictionMatrix) -> List[Dict[str, Optional[str]]]:
+    """Turns the prediction matrix back into the per-roll dicts the decision layer expects."""
+    decoded = []
+    for row in matrix.predictions.tolist():
+        decoded.append({name: (PREDICTION_OUTCOMES[code] if code != _NO_PREDICTION else None)
+                        for name, code in zip(matrix.module_names, row)})
+    return decoded
+
+def _weight_context(matrix: PredictionMatrix, module_predictions: List[Dict[str, Optional[str]]],
+                    min_history: int, weight_decay: float) -> Tuple[list, list, list]:
+    """
+    Replays the online module weights and the scoreboard from the prediction matrix.
+    Both only depend on which module predictions were scored, i.e. on min_history_for_prediction,
+    so this runs once per distinct min_history and is shared by every config that uses it.
+
+    Returns:
+        Tuple of per-roll lists: normalized weights, scorer results and best recent module
+        (None for rolls where the oracle would not predict at all).
+    """
+    names = matrix.module_names
+    online_weights = OnlineModuleWeights(names, decay=weight_decay)
+    scoreboard = ModuleScoreboard(names, window=_HISTORY_LIMIT)
+    weights_per_roll, best_recent = [], []
+
+    for i, actual_code in enumerate(matrix.outcomes.tolist()):
+        history_length = min(i, _HISTORY_LIMIT)
+        predictions = module_predictions[i]
+        if history_length < min_history:
+            weights_per_roll.append(None)
+            best_recent.append(None)
+            scoreboard.record({})
+            continue
+
+        # Same normalization as SicBoOracle.get_normalized_module_weights() in "online" mode.
+        accuracies = online_weights.hit_rates()
+        max_acc = max(accuracies.values()) if accuracies else 0
+        if max_acc == 0:
+            weights = {name: 1.0 for name in names}
+        else:
+            weights = {name: acc / max_acc for name, acc in accuracies.items()}
+        weights_per_roll.append(weights)
+        if history_length < _BEST_RECENT_LOOKBACK + min_history:
+            best_recent.append(None)
+        else:
+            best_recent.append(scoreboard.best_module(_BEST_RECENT_LOOKBACK))
+
+        actual = HIGHLOW_OUTCOMES[actual_code]
+        module_hits = {name: SicBoOracle._module_hit(name, pred, actual) for name, pred in predictions.items()}
+        online_weights.update(module_hits)
+        scoreboard.record(module_hits)
+
+    # Score every roll at once; rolls without weights are scored with zero weights and dropped.
+    weight_matrix = np.array([[row[name] for name in names] if row is not None else [0.0] * len(names)
+                              for row in weights_per_roll], dtype=np.float64).reshape(len(weights_per_roll), len(names))
+    batch = ConfidenceScorer().score_batch(matrix.predictions, weight_matrix)
+    source_names: Dict[int, str] = {}
+    scorer_results = []
+    for weights, code, conf, mask in zip(weights_per_roll, batch["prediction"].tolist(),
+                                         batch["confidence"].tolist(), batch["source_mask"].tolist()):
+        if weights is None:
+            scorer_results.append(None)
+        elif code < 0:
+            scorer_results.append((None, None, None, None))
+        else:
+            if mask not in source_names:
+                source_names[mask] = ", ".join(name for j, name in enumerate(names) if mask >> j & 1)
+            scorer_results.append((PREDICTION_OUTCOMES[code], source_names[mask], conf, None))
+
+    return weights_per_roll, scorer_results, best_recent
+
+def _evaluate(config: Dict[str, Any], matrix: PredictionMatrix, module_predictions: List[Dict[str, Optional[str]]],
+              context: Tuple[list, list, list], non_special_counts: np.ndarray,
+              return_predictions: bool = False) -> Dict[str, Any]:
+    """
+    Runs the decision layer of the oracle for one config over the whole history.
+    The miss streak is kept incrementally with the same rules (and the same 100-roll window)
+    as SicBoOracle._calculate_miss_streak.
+    """
+    weights_per_roll, scorer_results, best_recent = context
+    min_history = config["min_history_for_prediction"]
+    min_non_special = config["min_non_special_outcome_history_for_prediction"]
+    recovery_streaks = tuple(config["recovery_miss_streaks"])
+    stop_streak = config["stop_miss_streak"]
+
+    misses = deque() # Positions of the misses since the last normal hit.
+    stats = {"predictions": 0, "hits": 0, "misses": 0, "recovery_predictions": 0, "recovery_hits": 0,
+             "hilo_predictions": 0, "stopped_rolls": 0, "max_miss_streak": 0, "confidence_sum": 0}
+    predictions = []
+
+    for i, actual_code in enumerate(matrix.outcomes.tolist()):
+        while misses and misses[0] < i - _HISTORY_LIMIT:
+            misses.popleft()
+        streak = len(misses)
+        stats["max_miss_streak"] = max(stats["max_miss_streak"], streak)
+
+        pred, prediction_type, confidence = None, "none", None
+        if min(i, _HISTORY_LIMIT) >= min_history and non_special_counts[i] >= min_non_special:
+            if streak >= stop_streak:
+                stats["stopped_rolls"] += 1
+            else:
+                pred, _, confidence, _, prediction_type = decide_prediction(
+                    module_predictions[i], weights_per_roll[i], scorer_results[i], streak,
+                    best_recent[i] if streak in recovery_streaks else None,
+                    hilo_weight_threshold=config["hilo_weight_threshold"],
+                    recovery_miss_streaks=recovery_streaks,
+                    recovery_confidence_multiplier=config["recovery_confidence_multiplier"],
+                )
+        if return_predictions:
+            predictions.append((pred, prediction_type, confidence, streak))
+        if prediction_type == "none" or pred not in ("สูง", "ต่ำ", "ไฮโล"):
+            continue
+
+        stats["predictions"] += 1
+        stats["confidence_sum"] += confidence or 0
+        if pred == "ไฮโล":
+            stats["hilo_predictions"] += 1
+        if prediction_type == "recovery":
+            stats["recovery_predictions"] += 1
+        actual = HIGHLOW_OUTCOMES[actual_code]
+        if pred in ("สูง", "ต่ำ") and actual in ("ตอง", "ไฮโล"):
+            continue # Neither a hit nor a miss, as in the miss streak.
+        if pred != actual:
+            stats["misses"] += 1
+            misses.append(i)
+        else:
+            stats["hits"] += 1
+            if prediction_type == "recovery":
+                stats["recovery_hits"] += 1
+            else:
+                misses.clear()
+
+    decided = stats["hits"] + stats["misses"]
+    result = dict(config)
+    result.update({
+        "predictions": stats["predictions"],
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "accuracy": stats["hits"] / decided * 100 if decided else 0.0,
+        "coverage": stats["predictions"] / len(matrix) * 100 if len(matrix) else 0.0,
+        "recovery_predictions": stats["recovery_predictions"],
+        "recovery_accuracy": stats["recovery_hits"] / stats["recovery_predictions"] * 100 if stats["recovery_predictions"] else 0.0,
+        "hilo_predictions": stats["hilo_predictions"],
+        "mean_confidence": stats["confidence_sum"] / stats["predictions"] if stats["predictions"] else 0.0,
+        "max_miss_streak": stats["max_miss_streak"],
+        "stopped_rolls": stats["stopped_rolls"],
+    })
+    if return_predictions:
+        result["per_roll"] = predictions
+    return result
+
+def replay_decisions(matrix: PredictionMatrix, config: Optional[Dict[str, Any]] = None,
+                     weight_decay: float = 0.9) -> pd.DataFrame:
+    """
+    The oracle's final call before every roll of the matrix for one config (what run_sweep scores).
+
+    Returns:
+        pd.DataFrame: One row per roll: "prediction" (None when the oracle made no call),
+        "type" ("none", "normal" or "recovery"), "confidence" and "miss_streak" (the streak the
+        call was made at), and "actual" (the roll's HighLow).
+    """
+    config = {**oracle_settings(SicBoOracle()), **(config or {})}
+    _init_worker(matrix, weight_decay)
+    context = _weight_context(matrix, _worker_state["module_predictions"], config["min_history_for_prediction"], weight_decay)
+    result = _evaluate(config, matrix, _worker_state["module_predictions"], context,
+                       _worker_state["non_special_counts"], return_predictions=True)
+    decisions = pd.DataFrame(result["per_roll"], columns=["prediction", "type", "confidence", "miss_streak"])
+    decisions["actual"] = [HIGHLOW_OUTCOMES[code] for code in matrix.outcomes.tolist()]
+    return decisions
+
+# Per-process state for worker processes: the matrix is sent once, contexts are built on demand.
+_worker_state: Dict[str, Any] = {}
+
+def _init_worker(matrix: PredictionMatrix, weight_decay: float):
+    _worker_state.clear()
+    _worker_state["matrix"] = matrix
+    _worker_state["weight_decay"] = weight_decay
+    _worker_state["module_predictions"] = _decode_predictions(matrix)
+    is_hl = np.isin(matrix.outcomes, [HIGHLOW_CODES["สูง"], HIGHLOW_CODES["ต่ำ"]]).astype(np.int64)
+    prefix = np.concatenate(([0], np.cumsum(is_hl)))
+    index = np.arange(len(matrix))
+    # สูง/ต่ำ rolls among the (at most 100) rolls in the oracle's history before roll i.
+    _worker_state["non_special_counts"] = prefix[index] - prefix[np.maximum(index - _HISTORY_LIMIT, 0)]
+    _worker_state["contexts"] = {}
+
+def _run_configs(configs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    matrix = _worker_state["matrix"]
+    results = []
+    for config in configs:
+        min_history = config["min_history_for_prediction"]
+        if min_history not in _worker_state["contexts"]:
+            _worker_state["contexts"][min_history] = _weight_context(
+                matrix, _worker_state["module_predictions"], min_history, _worker_state["weight_decay"])
+        results.append(_evaluate(config, matrix, _worker_state["module_predictions"],
+                                 _worker_state["contexts"][min_history], _worker_state["non_special_counts"]))
+    return results
+
+def run_sweep(matrix: PredictionMatrix, configs: List[Dict[str, Any]], workers: Optional[int] = None,
+              weight_decay: float = 0.9, sort_by: str = "accuracy", min_coverage: float = 0.0) -> pd.DataFrame:
+    """
+    Evaluates every config against the same module predictions and ranks them.
+    Only the decision layer (thresholds, recovery, miss streak) is re-run per config,
+    spread over worker processes. Module weighting is the oracle's default "online" mode.
+
+    Args:
+        matrix (PredictionMatrix): Output of build_prediction_matrix().
+        configs (List[Dict[str, Any]]): Settings to try (see param_grid); missing settings
+            take the oracle's defaults.
+        workers (int): Worker processes (None = one per CPU, 1 = run in this process).
+        weight_decay (float): Decay of the online module weights (as in SicBoOracle).
+        sort_by (str): Result column to rank by (descending).
+        min_coverage (float): Drop configs that predict on fewer than this % of rolls.
+
+    Returns:
+        pd.DataFrame: One row per config with its metrics, best first.
+    """
+    defaults = oracle_settings(SicBoOracle())
+    configs = [{**defaults, **config} for config in configs]
+    for config in configs:
+        if not 1 <= config["min_history_for_prediction"] <= _HISTORY_LIMIT:
+            raise ValueError("min_history_for_prediction must be between 1 and 100")
+    # Configs sharing min_history share their weight replay, so keep them in the same task.
+    configs.sort(key=lambda config: config["min_history_for_prediction"])
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(configs) <= 1:
+        _init_worker(matrix, weight_decay)
+        results = _run_configs(configs)
+    else:
+        chunk_size = max(1, -(-len(configs) // (workers * 4)))
+        chunks = [configs[i:i + chunk_size] for i in range(0, len(configs), chunk_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix, weight_decay)) as executor:
+            for chunk_results in executor.map(_run_configs, chunks):
+                results.extend(chunk_results)
+
+    table = pd.DataFrame(results)
+    if min_coverage > 0 and not table.empty:
+        table = table[table["coverage"] >= min_coverage]
+    return table.sort_values([sort_by, "predictions"], ascending=False, kind="stable").reset_index(drop=True)
+
+# Example usage (for sweeping from the command line)
+if __name__ == "__main__":
+    import argparse
+    from data_generator import simulate_sicbo
+    parser = argparse.ArgumentParser(description="Sweep oracle thresholds over a roll history.")
+    parser.add_argument("--csv", default=None, help="roll history CSV (Die1, Die2, Die3); simulated if omitted")
+    parser.add_argument("--simulate", type=int, default=5000, help="simulated rolls when no CSV is given")
+    parser.add_argument("--matrix", default=None, help=".npz cache of module predictions (built if missing)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.matrix and os.path.exists(args.matrix):
+        prediction_matrix = PredictionMatrix.load(args.matrix)
+    else:
+        rolls = pd.read_csv(args.csv) if args.csv else simulate_sicbo(args.simulate)
+        prediction_matrix = build_prediction_matrix(rolls)
+        if args.matrix:
+            prediction_matrix.save(args.matrix)
+
+    ranked = run_sweep(prediction_matrix, param_grid(**DEFAULT_GRID), workers=args.workers)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(ranked.head(args.top).to_string())
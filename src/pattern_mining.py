@@ -0,0 +1,322 @@
+# src/pattern_mining.py
+import os
+import json
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from prediction_modules.base_predictor import HIGHLOW_OUTCOMES, HIGHLOW_CODES
+
+# Pattern modules match on the 'HighLow' sequence with 'ตอง' removed, so patterns are words over
+# these three symbols (codes 0-2, as in HIGHLOW_CODES) and their keys are the joined strings.
+PATTERN_SYMBOLS = HIGHLOW_OUTCOMES[:3]
+_N_SYMBOLS = len(PATTERN_SYMBOLS)
+_N_OUTCOMES = len(HIGHLOW_OUTCOMES)
+_HIGH, _LOW, _TRIPLET = HIGHLOW_CODES["สูง"], HIGHLOW_CODES["ต่ำ"], HIGHLOW_CODES["ตอง"]
+PATTERN_TABLE_FORMAT_VERSION = 1
+
+def highlow_codes(die1: np.ndarray, die2: np.ndarray, die3: np.ndarray) -> np.ndarray:
+    """Vectorized 'HighLow' (as HIGHLOW_CODES, uint8) of many rolls; same rules as SicBoOracle._high_low."""
+    die1, die2, die3 = (np.asarray(d, dtype=np.int16) for d in (die1, die2, die3))
+    total = die1 + die2 + die3
+    codes = np.where(total <= 10, _LOW, _HIGH).astype(np.uint8)
+    codes[total == 11] = HIGHLOW_CODES["ไฮโล"]
+    codes[(die1 == die2) & (die2 == die3)] = _TRIPLET
+    return codes
+
+class SimulatedRolls:
+    """Fair-dice rolls generated chunk by chunk (reproducible per chunk, so workers need no data)."""
+    def __init__(self, n_rolls: int, seed: int = 0, chunk_size: int = 10_000_000):
+        self.n_rolls = n_rolls
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def n_chunks(self) -> int:
+        return -(-self.n_rolls // self.chunk_size)
+
+    def load(self, index: int) -> np.ndarray:
+        size = min(self.chunk_size, self.n_rolls - index * self.chunk_size)
+        dice = np.random.default_rng([self.seed, index]).integers(1, 7, size=(3, size), dtype=np.int8)
+        return highlow_codes(dice[0], dice[1], dice[2])
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": "simulation", "rolls": self.n_rolls, "seed": self.seed}
+
+class ArchiveRolls:
+    """Rolls of a RollArchive, one chunk per (table, date) partition, in date order."""
+    def __init__(self, root: str = 'data/archive', tables: Optional[List[str]] = None,
+                 start_date: Optional[str] = None, end_date: Optional[str] = None):
+        from archive import RollArchive
+        self.root = root
+        self.partitions = sorted(
+            ((table, date) for table, date in RollArchive(root).partitions()
+             if (tables is None or table in tables)
+             and (start_date is None or date >= start_date) and (end_date is None or date <= end_date)),
+            key=lambda partition: (partition[1], partition[0]))
+
+    def n_chunks(self) -> int:
+        return len(self.partitions)
+
+    def load(self, index: int) -> np.ndarray:
+        from archive import RollArchive
+        table, date = self.partitions[index]
+        rolls = RollArchive(self.root).scan(columns=['RoundId', 'Die1', 'Die2', 'Die3'], tables=[table],
+                                            start_date=date, end_date=date).sort_values('RoundId')
+        return highlow_codes(rolls['Die1'].to_numpy(), rolls['Die2'].to_numpy(), rolls['Die3'].to_numpy())
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": "archive", "root": self.root, "partitions": len(self.partitions)}
+
+def _contexts(codes: np.ndarray, max_length: int) -> Tuple[List[Optional[np.ndarray]], np.ndarray]:
+    """
+    For every roll t that has a next roll: the key (base-3 code, oldest symbol first) of the last k
+    non-ตอง outcomes up to and including roll t, for k = 1..max_length (-1 where fewer exist),
+    and the outcome of roll t+1.
+    """
+    targets = codes[1:].astype(np.int64)
+    symbols = codes[codes != _TRIPLET].astype(np.int64)
+    ends = np.cumsum(codes[:-1] != _TRIPLET) - 1 # Index in `symbols` of the newest symbol up to roll t.
+    keys: List[Optional[np.ndarray]] = [None]
+    rolling = np.zeros(len(symbols), dtype=np.int64)
+    for k in range(1, max_length + 1):
+        # rolling[j] = key of symbols[j-k+1 .. j]
+        shifted = np.zeros(len(symbols), dtype=np.int64)
+        if k <= len(symbols): # Short chunks (small partitions) have no window this long.
+            shifted[k - 1:] = symbols[:len(symbols) - k + 1] * _N_SYMBOLS ** (k - 1)
+        rolling = rolling + shifted if k > 1 else symbols.copy()
+        key = np.full(len(ends), -1, dtype=np.int64)
+        valid = ends >= k - 1
+        key[valid] = rolling[ends[valid]]
+        keys.append(key)
+    return keys, targets
+
+def _count_chunk(task: Tuple[Any, int, int]) -> List[np.ndarray]:
+    """Next-outcome counts per context: counts[k] has shape (3**k, 4) (counts[0]: outcomes of all rolls)."""
+    source, index, max_length = task
+    codes = source.load(index)
+    keys, targets = _contexts(codes, max_length)
+    counts = [np.bincount(codes.astype(np.int64), minlength=_N_OUTCOMES).reshape(1, _N_OUTCOMES)]
+    for k in range(1, max_length + 1):
+        valid = keys[k] >= 0
+        flat = np.bincount(keys[k][valid] * _N_OUTCOMES + targets[valid], minlength=_N_SYMBOLS ** k * _N_OUTCOMES)
+        counts.append(flat.reshape(_N_SYMBOLS ** k, _N_OUTCOMES))
+    return counts
+
+def _evaluate_chunk(task: Tuple[Any, int, int, int, List[Optional[np.ndarray]]]) -> Tuple[int, int, int]:
+    """
+    Replays the pattern modules' longest-match lookup of a rule table over one chunk.
+    Returns (rolls, rolls with a สูง/ต่ำ call that counted, hits).
+    """
+    source, index, max_length, min_length, rules = task
+    keys, targets = _contexts(source.load(index), max_length)
+    prediction = np.full(len(targets), -1, dtype=np.int64)
+    for k in range(max_length, min_length - 1, -1): # Longest match first, as in the modules.
+        unresolved = (prediction < 0) & (keys[k] >= 0)
+        prediction[unresolved] = rules[k][keys[k][unresolved]]
+    counted = (prediction >= 0) & ((targets == _HIGH) | (targets == _LOW))
+    return len(targets), int(counted.sum()), int((prediction[counted] == targets[counted]).sum())
+
+def _base_rate(counts: List[np.ndarray]) -> float:
+    """Share of สูง among all สูง/ต่ำ outcomes (ต่ำ is the more common: 105 vs 78 of 216 dice combinations)."""
+    high, low = counts[0][0, _HIGH], counts[0][0, _LOW]
+    return high / (high + low) if high + low else 0.5
+
+def _select_rules(counts: List[np.ndarray], min_length: int, min_support: int,
+                  min_z: float) -> Tuple[List[Optional[np.ndarray]], List[Optional[np.ndarray]]]:
+    """
+    Rule table per length (prediction code per context, -1 for none) and the z-scores behind it.
+    A context predicts the more frequent of สูง/ต่ำ after it, if it has min_support สูง/ต่ำ
+    continuations and that outcome follows it more often than its overall rate by a binomial
+    z-score of at least min_z, i.e. the pattern beats always betting the more common outcome.
+    """
+    p_high = _base_rate(counts)
+    rules: List[Optional[np.ndarray]] = [None] * len(counts)
+    scores: List[Optional[np.ndarray]] = [None] * len(counts)
+    for k in range(1, len(counts)):
+        high, low = counts[k][:, _HIGH], counts[k][:, _LOW]
+        support = high + low
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_high = np.where(support > 0, (high - support * p_high) / np.sqrt(support * p_high * (1 - p_high)), 0.0)
+        predicts_high = high >= low
+        z = np.where(predicts_high, z_high, -z_high)
+        keep = (k >= min_length) & (support >= min_support) & (z >= min_z)
+        rules[k] = np.where(keep, np.where(predicts_high, _HIGH, _LOW), -1)
+        scores[k] = z
+    return rules, scores
+
+def _decode_key(key: int, length: int) -> List[str]:
+    return [PATTERN_SYMBOLS[(key // _N_SYMBOLS ** (length - 1 - i)) % _N_SYMBOLS] for i in range(length)]
+
+def _map(function, tasks: list, workers: int) -> list:
+    if workers == 1 or len(tasks) <= 1:
+        return [function(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(function, tasks))
+
+def mine_patterns(source, max_length: int = 6, min_length: int = 3, min_support: int = 200,
+                  min_z: float = 3.0, folds: int = 4, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Mines H/L/ไฮโล pattern rules and validates them walk-forward.
+
+    Pass 1 counts, in parallel per chunk, the next outcome after every context of 1..max_length
+    non-ตอง outcomes. Chunks are split into folds+1 consecutive groups; for each fold the rules
+    selected on all earlier groups are scored on the next group, both per pattern (wherever the
+    pattern occurs) and as a whole table with the modules' longest-match lookup (pass 2, also
+    parallel). The emitted rules are selected on all the data. Contexts do not span chunks
+    (partitions/tables, or chunk_size simulated rolls), which loses at most max_length rolls per chunk.
+    The modules read a fixed number of rolls and drop ตอง from them, so right after a ตอง they
+    see one outcome fewer than counted here; with ตอง at 1 roll in 36 this barely moves the stats.
+
+    Args:
+        source: SimulatedRolls, ArchiveRolls, or any object with n_chunks(), load(i) -> HIGHLOW_CODES
+            array, and describe(); must be picklable for workers > 1.
+        max_length (int): Longest pattern (in outcomes).
+        min_length (int): Shortest pattern emitted.
+        min_support (int): Minimum สูง/ต่ำ continuations for a rule.
+        min_z (float): Minimum z-score of the predicted outcome against its overall rate.
+        folds (int): Walk-forward folds (0 to skip validation).
+        workers (int): Worker processes (None = one per CPU, 1 = run in this process).
+
+    Returns:
+        Dict[str, Any]: The pattern table (see save_pattern_table / load_pattern_table).
+    """
+    workers = workers or os.cpu_count() or 1
+    n_chunks = source.n_chunks()
+    chunk_counts = _map(_count_chunk, [(source, i, max_length) for i in range(n_chunks)], workers)
+    empty = [np.zeros((_N_SYMBOLS ** k, _N_OUTCOMES), dtype=np.int64) for k in range(max_length + 1)]
+
+    def total(counts_list):
+        return [sum((counts[k] for counts in counts_list), empty[k]) for k in range(max_length + 1)]
+
+    counts = total(chunk_counts)
+    rules, scores = _select_rules(counts, min_length, min_support, min_z)
+
+    # Walk-forward validation: train on groups < g, test on group g.
+    groups = [list(group) for group in np.array_split(np.arange(n_chunks), folds + 1)] if folds > 0 else []
+    groups = [group for group in groups if group]
+    holdout = {k: np.zeros((_N_SYMBOLS ** k, 2), dtype=np.int64) for k in range(min_length, max_length + 1)}
+    fold_results, eval_tasks = [], []
+    for g in range(1, len(groups)):
+        train = total([chunk_counts[i] for group in groups[:g] for i in group])
+        test = total([chunk_counts[i] for i in groups[g]])
+        fold_rules, _ = _select_rules(train, min_length, min_support, min_z)
+        for k in holdout:
+            selected = fold_rules[k] >= 0
+            predicted = np.where(selected, fold_rules[k], 0)
+            holdout[k][:, 0] += np.where(selected, test[k][:, _HIGH] + test[k][:, _LOW], 0)
+            holdout[k][:, 1] += np.where(selected, np.take_along_axis(test[k], predicted[:, None], axis=1)[:, 0], 0)
+        fold_results.append({"fold": g, "train_chunks": sum(len(group) for group in groups[:g]),
+                             "test_chunks": len(groups[g]),
+                             "rules": int(sum((fold_rules[k] >= 0).sum() for k in holdout)),
+                             # Hit rate of always betting the outcome that was more common in training.
+                             "baseline_hit_rate": (_base_rate(test) if _base_rate(train) >= 0.5
+                                                   else 1 - _base_rate(test)) * 100})
+        eval_tasks.extend((source, i, max_length, min_length, fold_rules) for i in groups[g])
+    evaluations = _map(_evaluate_chunk, eval_tasks, workers)
+    position = 0
+    for fold in fold_results:
+        rolls = counted = hits = 0
+        for _ in range(fold["test_chunks"]):
+            chunk_rolls, chunk_counted, chunk_hits = evaluations[position]
+            position += 1
+            rolls, counted, hits = rolls + chunk_rolls, counted + chunk_counted, hits + chunk_hits
+        fold.update({"rolls": rolls, "predictions": counted, "hits": hits,
+                     "coverage": counted / rolls * 100 if rolls else 0.0,
+                     "hit_rate": hits / counted * 100 if counted else 0.0})
+
+    patterns = []
+    for k in range(min_length, max_length + 1):
+        for key in np.flatnonzero(rules[k] >= 0).tolist():
+            row = counts[k][key]
+            prediction = int(rules[k][key])
+            support = int(row[_HIGH] + row[_LOW])
+            trials, holdout_hits = (int(v) for v in holdout[k][key])
+            symbols = _decode_key(key, k)
+            patterns.append({
+                "pattern": "".join(symbols),
+                "symbols": symbols,
+                "length": k,
+                "prediction": HIGHLOW_OUTCOMES[prediction],
+                "occurrences": int(row.sum()),
+                "support": support,
+                "next_counts": {outcome: int(row[code]) for code, outcome in enumerate(HIGHLOW_OUTCOMES)},
+                "probability": row[prediction] / support,
+                "z": scores[k][key],
+                "holdout_predictions": trials,
+                "holdout_hit_rate": holdout_hits / trials * 100 if trials else None,
+            })
+    patterns.sort(key=lambda pattern: (-pattern["length"], -pattern["z"]))
+    return {
+        "version": PATTERN_TABLE_FORMAT_VERSION,
+        "source": source.describe(),
+        "rolls": int(counts[0].sum()),
+        "settings": {"max_length": max_length, "min_length": min_length, "min_support": min_support, "min_z": min_z},
+        "validation": fold_results,
+        "patterns": [{name: (float(value) if isinstance(value, np.floating) else value) for name, value in pattern.items()}
+                     for pattern in patterns],
+    }
+
+def save_pattern_table(table: Dict[str, Any], file_path: str):
+    """Writes a mined pattern table as UTF-8 JSON."""
+    directory = os.path.dirname(file_path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False, indent=1)
+
+def load_pattern_table(file_path: str, max_length: Optional[int] = None, min_support: int = 0,
+                       min_holdout_hit_rate: Optional[float] = None) -> Dict[str, str]:
+    """
+    Loads a mined table as {pattern: prediction}, the format PatternPredictor, SniperPatternPredictor
+    and SmartPredictor take as `patterns=`.
+
+    Args:
+        file_path (str): File written by save_pattern_table().
+        max_length (int): Drop longer patterns (PatternPredictor/SniperPatternPredictor look at
+            the last 6 rolls, SmartPredictor at the last 8).
+        min_support (int): Drop rules with fewer สูง/ต่ำ continuations.
+        min_holdout_hit_rate (float): Drop rules whose walk-forward hit rate (%) is lower, or unknown.
+    """
+    with open(file_path, encoding="utf-8") as f:
+        table = json.load(f)
+    if table.get("version") != PATTERN_TABLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported pattern table version {table.get('version')}")
+    patterns = {}
+    for pattern in table["patterns"]:
+        if max_length is not None and pattern["length"] > max_length:
+            continue
+        if pattern["support"] < min_support:
+            continue
+        if min_holdout_hit_rate is not None and (pattern["holdout_hit_rate"] is None
+                                                 or pattern["holdout_hit_rate"] < min_holdout_hit_rate):
+            continue
+        patterns[pattern["pattern"]] = pattern["prediction"]
+    return patterns
+
+# Example usage (for mining from the command line)
+if __name__ == "__main__":
+    import time
+    import argparse
+    parser = argparse.ArgumentParser(description="Mine H/L/ไฮโล pattern tables for the pattern modules.")
+    parser.add_argument("--archive", default=None, help="RollArchive root to mine (simulated rolls if omitted)")
+    parser.add_argument("--tables", nargs="+", default=None)
+    parser.add_argument("--simulate", type=int, default=100_000_000, help="simulated rolls when no archive is given")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-length", type=int, default=6)
+    parser.add_argument("--min-length", type=int, default=3)
+    parser.add_argument("--min-support", type=int, default=200)
+    parser.add_argument("--min-z", type=float, default=3.0)
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default=os.path.join("data", "patterns.json"))
+    args = parser.parse_args()
+
+    rolls_source = ArchiveRolls(args.archive, args.tables) if args.archive else SimulatedRolls(args.simulate, args.seed)
+    started = time.perf_counter()
+    mined = mine_patterns(rolls_source, args.max_length, args.min_length, args.min_support, args.min_z,
+                          args.folds, args.workers)
+    save_pattern_table(mined, args.output)
+    print(f"Mined {mined['rolls']:,} rolls in {time.perf_counter() - started:.1f}s: "
+          f"{len(mined['patterns'])} patterns -> {args.output}")
+    print(pd.DataFrame(mined["validation"]).to_string(index=False))
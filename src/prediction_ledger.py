@@ -0,0 +1,270 @@
+# src/prediction_ledger.py
+import os
+import json
+import time
+import struct
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence
+
+from prediction_modules.base_predictor import HIGHLOW_CODES, PREDICTION_OUTCOMES, PREDICTION_CODES
+from roll_tree import PREDICTION_TYPES
+
+# One settled prediction per roll (36 bytes). Codes: prediction = PREDICTION_CODES (-1 none),
+# actual = HIGHLOW_CODES, type = index into PREDICTION_TYPES, hit = 1 hit / 0 miss / -1 did not
+# count (no prediction, or a สูง/ต่ำ call on a ตอง/ไฮโล roll; same rule as the miss streak),
+# confidence = 0-95 (-1 none), source_mask = bit i for module i of the ledger's module_names.
+LEDGER_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("history_version", "<i8"),
+    ("source_mask", "<i8"),
+    ("prediction", "i1"),
+    ("actual", "i1"),
+    ("type", "i1"),
+    ("hit", "i1"),
+    ("confidence", "<i2"),
+    ("miss_streak", "<i2"),
+])
+CONFIDENCE_BINS = (0, 50, 60, 70, 80, 90, 96)
+
+# File layout: magic, format version, header length, JSON header, then raw LEDGER_DTYPE records.
+LEDGER_MAGIC = b"SBLEDGER"
+LEDGER_FORMAT_VERSION = 1
+_LEDGER_PREFIX = struct.Struct("<8sHI")
+_RECOVERY_SUFFIX = "-Recovery"
+
+
+class PredictionLedger:
+    """
+    Append-only record of every settled prediction, kept as a numpy structured array
+    (LEDGER_DTYPE) and optionally appended to a binary file, so it survives restarts and
+    months of predictions can be audited as plain arrays instead of Python objects.
+
+    The oracle appends one row per roll it applies (add_roll, redo_last_roll) and pops it again
+    in remove_last_roll, so the ledger always matches the recorded history.
+    """
+    def __init__(self, module_names: List[str], file_path: Optional[str] = None, flush_every: int = 1):
+        self.module_names = list(module_names)
+        self._module_bits = {name: 1 << i for i, name in enumerate(self.module_names)}
+        self.file_path = file_path
+        self.flush_every = max(1, flush_every)
+        self._header_size = 0
+        self._flushed = 0 # Rows already in the file.
+        self._pending = np.empty(64, dtype=LEDGER_DTYPE) # Rows not written yet.
+        self._n_pending = 0
+        self._new_file_header: Optional[bytes] = None # Written by the first flush of a new file.
+
+        if file_path is not None:
+            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
+                module_names_on_disk, self._header_size = self._read_header(file_path)
+                if module_names_on_disk != self.module_names:
+                    raise ValueError(f"Ledger {file_path} was written for modules {module_names_on_disk}")
+                record_bytes = os.path.getsize(file_path) - self._header_size
+                self._flushed = record_bytes // LEDGER_DTYPE.itemsize
+                if record_bytes % LEDGER_DTYPE.itemsize: # Drop a record torn by a crash mid-write.
+                    os.truncate(file_path, self._header_size + self._flushed * LEDGER_DTYPE.itemsize)
+            else:
+                # The file is only created by the first flush, so a ledger that never records
+                # anything (e.g. a page that was opened and closed) leaves no file behind.
+                header = json.dumps({"module_names": self.module_names, "dtype": LEDGER_DTYPE.descr}).encode("utf-8")
+                self._new_file_header = _LEDGER_PREFIX.pack(LEDGER_MAGIC, LEDGER_FORMAT_VERSION, len(header)) + header
+                self._header_size = len(self._new_file_header)
+
+    @staticmethod
+    def _read_header(file_path: str):
+        with open(file_path, "rb") as f:
+            prefix = f.read(_LEDGER_PREFIX.size)
+            if len(prefix) < _LEDGER_PREFIX.size:
+                raise ValueError(f"{file_path} is not a prediction ledger (too short).")
+            magic, version, header_length = _LEDGER_PREFIX.unpack(prefix)
+            if magic != LEDGER_MAGIC:
+                raise ValueError(f"{file_path} is not a prediction ledger (bad magic).")
+            if version != LEDGER_FORMAT_VERSION:
+                raise ValueError(f"Unsupported ledger version {version} (expected {LEDGER_FORMAT_VERSION}).")
+            header = json.loads(f.read(header_length).decode("utf-8"))
+        return header["module_names"], _LEDGER_PREFIX.size + header_length
+
+    @classmethod
+    def load(cls, file_path: str) -> "PredictionLedger":
+        """Opens an existing ledger file with the module names it was written for."""
+        module_names, _ = cls._read_header(file_path)
+        return cls(module_names, file_path)
+
+    def __len__(self) -> int:
+        return self._flushed + self._n_pending
+
+    def source_mask(self, source: Optional[str]) -> int:
+        """Bitmask of the modules named in a prediction source ("A, B" or "A-Recovery")."""
+        if not source:
+            return 0
+        mask = 0
+        for name in source.split(", "):
+            if name.endswith(_RECOVERY_SUFFIX):
+                name = name[:-len(_RECOVERY_SUFFIX)]
+            mask |= self._module_bits.get(name, 0)
+        return mask
+
+    def modules_in(self, mask: int) -> List[str]:
+        return [name for name, bit in self._module_bits.items() if mask & bit]
+
+    def append(self, prediction: Optional[str], source: Optional[str], prediction_type: str,
+               confidence: Optional[int], miss_streak: int, actual: str, history_version: int,
+               timestamp: Optional[float] = None):
+        """
+        Records the prediction that was pending when a roll came in, together with that roll.
+
+        Args:
+            prediction (Optional[str]): The pending prediction (None if the oracle was waiting).
+            source (Optional[str]): Its source string, as in prediction_log.
+            prediction_type (str): "none", "normal" or "recovery".
+            confidence (Optional[int]): Its confidence (0-95).
+            miss_streak (int): Miss streak when the prediction was made.
+            actual (str): 'HighLow' value of the roll.
+            history_version (int): Oracle history_version after the roll.
+            timestamp (float): Seconds since the epoch (default: now).
+        """
+        if prediction is None:
+            hit = -1
+        elif prediction in ("สูง", "ต่ำ") and actual in ("ตอง", "ไฮโล"):
+            hit = -1
+        else:
+            hit = int(prediction == actual)
+        row = (time.time() if timestamp is None else timestamp, history_version, self.source_mask(source),
+               PREDICTION_CODES[prediction] if prediction is not None else -1, HIGHLOW_CODES[actual],
+               PREDICTION_TYPES.index(prediction_type), hit, -1 if confidence is None else confidence, miss_streak)
+        if self._n_pending == len(self._pending):
+            self._pending = np.resize(self._pending, 2 * len(self._pending))
+        self._pending[self._n_pending] = row
+        self._n_pending += 1
+        if self._n_pending >= self.flush_every:
+            self.flush()
+
+    def pop(self) -> bool:
+        """Removes the newest row (its roll was undone); returns False if the ledger is empty."""
+        if self._n_pending:
+            self._n_pending -= 1
+            return True
+        if self._flushed == 0:
+            return False
+        self._flushed -= 1
+        os.truncate(self.file_path, self._header_size + self._flushed * LEDGER_DTYPE.itemsize)
+        return True
+
+    def flush(self):
+        """Appends the pending rows to the file (no-op for in-memory ledgers)."""
+        if self.file_path is None or self._n_pending == 0:
+            return
+        if self._new_file_header is not None:
+            directory = os.path.dirname(self.file_path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            with open(self.file_path, "wb") as f:
+                f.write(self._new_file_header)
+            self._new_file_header = None
+        with open(self.file_path, "ab") as f:
+            f.write(self._pending[:self._n_pending].tobytes())
+        self._flushed += self._n_pending
+        self._n_pending = 0
+
+    def records(self, start: int = 0, stop: Optional[int] = None,
+                since: Optional[float] = None, until: Optional[float] = None) -> np.ndarray:
+        """
+        Rows [start, stop) as a LEDGER_DTYPE array, optionally limited to timestamps in [since, until).
+        Only the requested range is read from the file.
+        """
+        total = len(self)
+        stop = total if stop is None else min(stop, total)
+        start = max(0, start)
+        if start >= stop:
+            return np.empty(0, dtype=LEDGER_DTYPE)
+        parts = []
+        if start < self._flushed:
+            count = min(stop, self._flushed) - start
+            with open(self.file_path, "rb") as f:
+                f.seek(self._header_size + start * LEDGER_DTYPE.itemsize)
+                parts.append(np.fromfile(f, dtype=LEDGER_DTYPE, count=count))
+        if stop > self._flushed:
+            parts.append(self._pending[max(start - self._flushed, 0):stop - self._flushed].copy())
+        rows = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        if since is not None or until is not None:
+            # Rows are appended in time order, so a time range is a contiguous slice.
+            timestamps = rows["timestamp"]
+            lo = 0 if since is None else np.searchsorted(timestamps, since, side="left")
+            hi = len(rows) if until is None else np.searchsorted(timestamps, until, side="left")
+            rows = rows[lo:hi]
+        return rows
+
+    def hit_rate_by_confidence(self, bins: Sequence[int] = CONFIDENCE_BINS, **row_range) -> pd.DataFrame:
+        """
+        Hit rate of the predictions that counted, per confidence bucket [bins[i], bins[i+1]).
+        Takes the same range arguments as records().
+        """
+        rows = self.records(**row_range)
+        rows = rows[rows["hit"] >= 0]
+        buckets = np.digitize(rows["confidence"], bins) - 1
+        result = []
+        for i in range(len(bins) - 1):
+            in_bucket = rows["hit"][buckets == i]
+            result.append({"confidence": f"{bins[i]}-{bins[i + 1] - 1}", "predictions": len(in_bucket),
+                           "hits": int(in_bucket.sum()),
+                           "hit_rate": in_bucket.mean() * 100 if len(in_bucket) else 0.0})
+        return pd.DataFrame(result)
+
+    def hit_rate_by_module(self, **row_range) -> pd.DataFrame:
+        """
+        Hit rate of the predictions that counted, per module that supported them (a prediction
+        backed by several modules counts for each). Takes the same range arguments as records().
+        """
+        rows = self.records(**row_range)
+        rows = rows[rows["hit"] >= 0]
+        result = []
+        for name, bit in self._module_bits.items():
+            hits = rows["hit"][(rows["source_mask"] & bit) != 0]
+            result.append({"module": name, "predictions": len(hits), "hits": int(hits.sum()),
+                           "hit_rate": hits.mean() * 100 if len(hits) else 0.0})
+        return pd.DataFrame(result)
+
+    def hit_rate_by_type(self, **row_range) -> pd.DataFrame:
+        """Hit rate of the predictions that counted, per prediction type (normal / recovery)."""
+        rows = self.records(**row_range)
+        rows = rows[rows["hit"] >= 0]
+        result = []
+        for code, prediction_type in enumerate(PREDICTION_TYPES):
+            hits = rows["hit"][rows["type"] == code]
+            if len(hits):
+                result.append({"type": prediction_type, "predictions": len(hits), "hits": int(hits.sum()),
+                               "hit_rate": hits.mean() * 100})
+        return pd.DataFrame(result)
+
+    def to_frame(self, **row_range) -> pd.DataFrame:
+        """Decoded rows (outcome strings, module names) for display; use records() for analysis."""
+        rows = self.records(**row_range)
+        return pd.DataFrame({
+            "timestamp": pd.to_datetime(rows["timestamp"], unit="s"),
+            "prediction": [PREDICTION_OUTCOMES[code] if code >= 0 else None for code in rows["prediction"].tolist()],
+            "actual": [PREDICTION_OUTCOMES[code] for code in rows["actual"].tolist()],
+            "type": [PREDICTION_TYPES[code] for code in rows["type"].tolist()],
+            "hit": rows["hit"],
+            "confidence": rows["confidence"],
+            "miss_streak": rows["miss_streak"],
+            "modules": [", ".join(self.modules_in(mask)) for mask in rows["source_mask"].tolist()],
+        })
+
+
+def prune_ledgers(directory: str, max_age_days: float = 30.0) -> List[str]:
+    """
+    Deletes the '.ledger' files in `directory` that have not been written for max_age_days
+    (ledgers of sessions that ended long ago). Returns the paths removed.
+    """
+    if not os.path.isdir(directory):
+        return []
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".ledger") and entry.is_file() and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError: # Pruned by another process at the same time.
+                continue
+            removed.append(entry.path)
+    return removed
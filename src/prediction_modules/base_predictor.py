@@ -1,6 +1,7 @@
 # src/prediction_modules/base_predictor.py
 from abc import ABC, abstractmethod
-from typing import List, Optional, Literal
+import copy
+from typing import Dict, List, Optional, Literal, Tuple
 import pandas as pd
 
 # Define common types for Sic Bo outcomes
@@ -8,9 +9,27 @@ import pandas as pd
 # Or 'Total' for specific total scores (though modules might predict H/L/Odd/Even primarily)
 SicBoOutcome = Literal["สูง", "ต่ำ", "คู่", "คี่", "ตอง", "4", "5", "6", "7", "8", "9", "10", "11", "12", "13", "14", "15", "16", "17"]
 
+# Integer codes for the 'HighLow' column, used by modules that keep compact per-roll state.
+HIGHLOW_OUTCOMES = ("สูง", "ต่ำ", "ไฮโล", "ตอง")
+HIGHLOW_CODES = {outcome: code for code, outcome in enumerate(HIGHLOW_OUTCOMES)}
+# Integer codes for every value a module may predict (HighLow codes first, so they agree).
+PREDICTION_OUTCOMES = HIGHLOW_OUTCOMES + ("คู่", "คี่") + tuple(str(total) for total in range(4, 18))
+PREDICTION_CODES = {outcome: code for code, outcome in enumerate(PREDICTION_OUTCOMES)}
+
 class BasePredictor(ABC):
     """Abstract Base Class for all Sic Bo prediction modules."""
 
+    # Modules that combine the other modules' outputs set this; the oracle then computes them
+    # after every other module and hands them the others' predictions (set_module_predictions).
+    uses_module_predictions = False
+
+    def set_module_predictions(self, module_predictions: Dict[str, Optional[SicBoOutcome]]):
+        """
+        Receives the other modules' predictions for the history that the next predict()/observe()
+        call is about (only called on modules with uses_module_predictions).
+        """
+        pass
+
     @abstractmethod
     def predict(self, history: pd.DataFrame) -> Optional[SicBoOutcome]:
         """
@@ -25,6 +44,48 @@ class BasePredictor(ABC):
         """
         pass
 
+    def confidence_signal(self) -> Optional[Tuple[str, float]]:
+        """
+        How sure the module was of its last predict() call, as (kind, value), e.g.
+        ("probability", 0.62) or ("match_length", 9); None when it has no such signal or made
+        no call.
+        """
+        return None
+
+    def observe(self, history: pd.DataFrame, outcome: str):
+        """
+        Called by the oracle after every roll, for modules that learn incrementally.
+
+        Args:
+            history (pd.DataFrame): The history *before* the new roll.
+            outcome (str): The 'HighLow' value of the new roll ('สูง', 'ต่ำ', 'ไฮโล' or 'ตอง').
+        """
+        pass
+
+    def retract(self):
+        """Undoes the most recent observe() (called when the last roll is removed)."""
+        pass
+
+    def can_retract(self) -> bool:
+        """
+        Whether retract() can still undo the most recent observe() exactly. Modules that only
+        keep a bounded undo log return False once it is used up; the oracle then rebuilds
+        them from the roll tree instead.
+        """
+        return True
+
+    def reset(self):
+        """Forgets everything learned through observe()."""
+        pass
+
+    def fork(self) -> "BasePredictor":
+        """
+        Returns an independent copy for another session. The default shallow copy shares
+        read-only tables such as pattern dictionaries; modules with learned state override
+        this to share that state copy-on-write.
+        """
+        return copy.copy(self)
+
     @property
     @abstractmethod
     def name(self) -> str:
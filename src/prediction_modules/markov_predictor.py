@@ -0,0 +1,167 @@
+# src/prediction_modules/markov_predictor.py
+import pandas as pd
+import numpy as np
+import copy
+from typing import Dict, List, Optional, Tuple
+from prediction_modules.base_predictor import BasePredictor, SicBoOutcome, HIGHLOW_OUTCOMES, HIGHLOW_CODES
+
+class MarkovPredictor(BasePredictor):
+    def __init__(self, max_order: int = 6, table_size: int = 1 << 16, smoothing: float = 1.0,
+                 min_observations: int = 30, undo_depth: int = 1000):
+        """
+        Variable-order Markov (n-gram) model over สูง/ต่ำ/ไฮโล/ตอง.
+        Transition counts for every context of length 1..max_order are updated in O(max_order)
+        per roll. When all contexts fit they get their own row of the count table; otherwise
+        contexts are hashed into the fixed-size table, so memory stays bounded for large orders.
+
+        Args:
+            max_order (int): Longest context length K.
+            table_size (int): Maximum number of rows in the count table (exact layouts only
+                allocate the rows they use).
+            smoothing (float): Weight given to the next-shorter context when blending counts.
+            min_observations (int): Rolls to observe before the module starts predicting.
+            undo_depth (int): How many recent rolls can be retracted.
+        """
+        self.max_order = max_order
+        self.table_size = table_size
+        self.smoothing = smoothing
+        self.min_observations = min_observations
+        self.undo_depth = undo_depth
+
+        # _order_offsets[k] is the first row for contexts of length k in the exact layout.
+        self._order_offsets = [0]
+        for k in range(max_order + 1):
+            self._order_offsets.append(self._order_offsets[-1] + len(HIGHLOW_OUTCOMES) ** k)
+        self._exact = self._order_offsets[-1] <= table_size
+
+        n_rows = self._order_offsets[-1] if self._exact else table_size
+        self.counts = np.zeros((n_rows, len(HIGHLOW_OUTCOMES)), dtype=np.int32)
+        # After fork() the count table is shared read-only and changed rows live here (copy-on-write).
+        self._delta: Optional[Dict[int, np.ndarray]] = None
+        self.unigram = np.zeros(len(HIGHLOW_OUTCOMES), dtype=np.int64)
+        self._recent: List[int] = [] # Encoded outcomes observed so far (bounded by undo_depth).
+        self._trimmed = False # Whether the oldest outcomes were dropped from _recent.
+        self.last_probability: Optional[float] = None
+
+    def _slot(self, order: int, context: int) -> int:
+        """Maps a context (order, code) to its row in the count table."""
+        key = self._order_offsets[order] + context
+        if self._exact:
+            return key
+        return (key * 2654435761) % self.table_size # Knuth multiplicative hash
+
+    def _context_slots(self, recent: List[int]) -> List[int]:
+        """Rows of the contexts of length 1..max_order ending at the end of `recent`."""
+        slots = []
+        context = 0
+        for k in range(1, min(self.max_order, len(recent)) + 1):
+            context += recent[-k] * len(HIGHLOW_OUTCOMES) ** (k - 1)
+            slots.append(self._slot(k, context))
+        return slots
+
+    def _row(self, slot: int) -> np.ndarray:
+        if self._delta is not None and slot in self._delta:
+            return self._delta[slot]
+        return self.counts[slot]
+
+    def _add(self, slot: int, code: int, amount: int):
+        if self._delta is None:
+            self.counts[slot, code] += amount
+            return
+        row = self._delta.get(slot)
+        if row is None:
+            row = self._delta[slot] = self.counts[slot].copy()
+        row[code] += amount
+
+    def observe(self, history: pd.DataFrame, outcome: str):
+        code = HIGHLOW_CODES.get(outcome)
+        if code is None:
+            return
+        for slot in self._context_slots(self._recent):
+            self._add(slot, code, 1)
+        self.unigram[code] += 1
+        self._recent.append(code)
+        if len(self._recent) > 2 * (self.undo_depth + self.max_order):
+            del self._recent[:len(self._recent) - (self.undo_depth + self.max_order)]
+            self._trimmed = True
+
+    def retract(self):
+        if not self._recent:
+            return
+        code = self._recent.pop()
+        for slot in self._context_slots(self._recent):
+            self._add(slot, code, -1)
+        self.unigram[code] -= 1
+
+    def can_retract(self) -> bool:
+        # Retracting needs the max_order outcomes before the last one, unless nothing was dropped.
+        return len(self._recent) > self.max_order or (bool(self._recent) and not self._trimmed)
+
+    def reset(self):
+        if self._delta is not None:
+            # The table may be shared with other forks: start a private one instead of clearing it.
+            self.counts = np.zeros_like(self.counts)
+            self._delta = None
+        self.counts[:] = 0
+        self.unigram[:] = 0
+        self._recent.clear()
+        self._trimmed = False
+        self.last_probability = None
+
+    # Forking copies the changed rows; once there are more than this, they are folded into a new
+    # shared table instead, so fork cost stays bounded however many rolls follow the first fork.
+    FOLD_ROWS = 64
+
+    def fork(self) -> "MarkovPredictor":
+        if self._delta is None:
+            self._delta = {}
+        elif len(self._delta) > self.FOLD_ROWS:
+            counts = self.counts.copy()
+            slots = list(self._delta)
+            counts[slots] = [self._delta[slot] for slot in slots]
+            self.counts, self._delta = counts, {}
+        clone = copy.copy(self)
+        clone._delta = {slot: row.copy() for slot, row in self._delta.items()}
+        clone.unigram = self.unigram.copy()
+        clone._recent = list(self._recent)
+        return clone
+
+    def predict_proba(self, history: pd.DataFrame) -> Dict[str, float]:
+        """
+        Returns the smoothed next-outcome distribution for the current context.
+        Starts from the order-0 frequencies and blends in longer contexts one by one
+        (p_k = (counts_k + smoothing * p_{k-1}) / (n_k + smoothing)), backing off as soon
+        as a context has never been seen.
+        """
+        context = [HIGHLOW_CODES[val] for val in history['HighLow'].tail(self.max_order).tolist() if val in HIGHLOW_CODES]
+        n_outcomes = len(HIGHLOW_OUTCOMES)
+        probs = (self.unigram + self.smoothing / n_outcomes) / (self.unigram.sum() + self.smoothing)
+        for slot in self._context_slots(context):
+            row = self._row(slot)
+            n = row.sum()
+            if n <= 0:
+                break
+            probs = (row + self.smoothing * probs) / (n + self.smoothing)
+        return {outcome: float(p) for outcome, p in zip(HIGHLOW_OUTCOMES, probs)}
+
+    def predict(self, history: pd.DataFrame) -> Optional[SicBoOutcome]:
+        """
+        Predicts the most likely next outcome under the Markov model.
+        The probability of the predicted outcome is kept in `last_probability`.
+        """
+        if self.unigram.sum() < self.min_observations or len(history) == 0:
+            self.last_probability = None
+            return None
+        probs = self.predict_proba(history)
+        best = max(probs, key=probs.get)
+        self.last_probability = probs[best]
+        return best
+
+    def confidence_signal(self) -> Optional[Tuple[str, float]]:
+        if self.last_probability is None:
+            return None
+        return "probability", self.last_probability
+
+    @property
+    def name(self) -> str:
+        return "มาร์คอฟ"
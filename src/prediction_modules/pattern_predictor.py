@@ -1,11 +1,17 @@
 # src/prediction_modules/pattern_predictor.py
 import pandas as pd
-from typing import Optional
+from typing import Dict, Optional
 # *** แก้ไข: เปลี่ยน Relative Import เป็น Absolute Import ***
 from prediction_modules.base_predictor import BasePredictor, SicBoOutcome
 
 class PatternPredictor(BasePredictor):
-    def __init__(self):
+    def __init__(self, patterns: Optional[Dict[str, SicBoOutcome]] = None):
+        """
+        Args:
+            patterns (Optional[Dict[str, SicBoOutcome]]): Pattern table to use instead of the
+                built-in one, e.g. pattern_mining.load_pattern_table(path, max_length=6).
+                Only patterns of at most 6 outcomes can match.
+        """
         # Define known patterns for High/Low string and their predicted outcomes.
         # These patterns are based on common observations in Sic Bo, adapted from Baccarat's PatternAnalyzer.
         self.known_highlow_patterns = {
@@ -19,6 +25,8 @@ class PatternPredictor(BasePredictor):
             "สูงสูงสูงสูง": "สูง",   # HHHH (Predict continuation of trend)
             "ต่ำต่ำต่ำต่ำ": "ต่ำ",   # LLLL (Predict continuation of trend)
         }
+        if patterns is not None:
+            self.known_highlow_patterns = dict(patterns)
 
     def predict(self, history: pd.DataFrame) -> Optional[SicBoOutcome]:
         """
@@ -1,11 +1,17 @@
 # src/prediction_modules/smart_predictor.py
 import pandas as pd
-from typing import List, Optional
+from typing import Dict, List, Optional
 # *** แก้ไข: เปลี่ยน Relative Import เป็น Absolute Import ***
 from prediction_modules.base_predictor import BasePredictor, SicBoOutcome
 
 class SmartPredictor(BasePredictor):
-    def __init__(self):
+    def __init__(self, patterns: Optional[Dict[str, SicBoOutcome]] = None):
+        """
+        Args:
+            patterns (Optional[Dict[str, SicBoOutcome]]): Pattern table to use instead of the
+                built-in one, e.g. pattern_mining.load_pattern_table(path, max_length=8).
+                Only patterns of at most 8 outcomes can match.
+        """
         # A comprehensive set of patterns, similar to Baccarat's SmartPredictor.
         self.patterns = {
             "สูงต่ำสูงต่ำ": "สูง", "ต่ำสูงต่ำสูง": "ต่ำ", # Ping Pong
@@ -15,6 +21,8 @@ class SmartPredictor(BasePredictor):
             "สูงต่ำต่ำสูง": "ต่ำ", "ต่ำสูงสูงต่ำ": "สูง", # Specific break patterns
             "สูงสูงต่ำต่ำสูงสูง": "ต่ำ", "ต่ำต่ำสูงสูงต่ำต่ำ": "สูง", # Extended Two-Two
         }
+        if patterns is not None:
+            self.patterns = dict(patterns)
 
     def predict(self, history: pd.DataFrame) -> Optional[SicBoOutcome]:
         """
@@ -1,11 +1,17 @@
 # src/prediction_modules/sniper_pattern_predictor.py
 import pandas as pd
-from typing import List, Optional
+from typing import Dict, List, Optional
 # *** แก้ไข: เปลี่ยน Relative Import เป็น Absolute Import ***
 from prediction_modules.base_predictor import BasePredictor, SicBoOutcome
 
 class SniperPatternPredictor(BasePredictor):
-    def __init__(self):
+    def __init__(self, patterns: Optional[Dict[str, SicBoOutcome]] = None):
+        """
+        Args:
+            patterns (Optional[Dict[str, SicBoOutcome]]): Pattern table to use instead of the
+                built-in one, e.g. pattern_mining.load_pattern_table(path, max_length=6).
+                Only patterns of at most 6 outcomes can match.
+        """
         # Define a wider range of known patterns for High/Low string.
         # These are adapted from Baccarat's SniperPattern.
         self.known_patterns = {
@@ -18,6 +24,8 @@ class SniperPatternPredictor(BasePredictor):
             "สูงต่ำต่ำสูง": "ต่ำ", # Specific break pattern
             "ต่ำสูงสูงต่ำ": "สูง", # Specific break pattern
         }
+        if patterns is not None:
+            self.known_patterns = dict(patterns)
 
     def predict(self, history: pd.DataFrame) -> Optional[SicBoOutcome]:
         """
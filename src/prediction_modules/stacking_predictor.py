@@ -0,0 +1,148 @@
+# src/prediction_modules/stacking_predictor.py
+import pandas as pd
+import numpy as np
+import copy
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from prediction_modules.base_predictor import BasePredictor, SicBoOutcome, HIGHLOW_CODES
+
+_HIGH, _LOW = HIGHLOW_CODES["สูง"], HIGHLOW_CODES["ต่ำ"]
+
+class StackingPredictor(BasePredictor):
+    uses_module_predictions = True
+
+    def __init__(self, member_names: List[str], learning_rate: float = 0.05, l2: float = 1e-4,
+                 recent_window: int = 10, min_observations: int = 30, min_margin: float = 0.02,
+                 undo_depth: int = 1000):
+        """
+        Stacking ensemble: an online logistic regression that learns how far to trust each
+        module. Its inputs are the other modules' สูง/ต่ำ calls (+1 / -1, 0 for anything else)
+        plus cheap history features (signed current streak, สูง-ต่ำ balance over the last
+        `recent_window` outcomes, last outcome). One SGD step on the log-loss per สูง/ต่ำ roll,
+        so updates cost a few microseconds and the output is a calibrated P(สูง).
+        Its inputs must be the calls the members made for the same history, before the roll
+        is observed, so it can only be scored online: its accuracy is the hit rate recorded
+        for each roll, never a replay with today's weights over past rolls.
+
+        Args:
+            member_names (List[str]): Modules whose predictions are used as inputs.
+            learning_rate (float): SGD step size.
+            l2 (float): L2 penalty that keeps weights of useless modules near zero.
+            recent_window (int): Outcomes counted by the balance feature.
+            min_observations (int): สูง/ต่ำ rolls to train on before the module starts predicting.
+            min_margin (float): Minimum |P(สูง) - 0.5| needed to make a call.
+            undo_depth (int): How many recent rolls can be retracted.
+        """
+        self.member_names = list(member_names)
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.recent_window = recent_window
+        self.min_observations = min_observations
+        self.min_margin = min_margin
+        self.undo_depth = undo_depth
+        self._module_predictions: Dict[str, Optional[SicBoOutcome]] = {}
+        self.last_probability: Optional[float] = None
+        self.reset()
+
+    def reset(self):
+        # Weights: bias, one per member module, then streak, balance and last outcome.
+        self.weights = np.zeros(1 + len(self.member_names) + 3)
+        self.updates = 0
+        self._recent: List[int] = [] # สูง/ต่ำ outcomes (+1 / -1) observed so far, bounded.
+        # One record per observe(): (weights before, appended to _recent) for retract().
+        self._undo_log: Deque[Tuple[Optional[np.ndarray], bool]] = deque(maxlen=self.undo_depth)
+        self.last_probability = None
+
+    def set_module_predictions(self, module_predictions: Dict[str, Optional[SicBoOutcome]]):
+        self._module_predictions = module_predictions
+
+    def _features(self, recent: List[int]) -> np.ndarray:
+        """Input vector for the stored module predictions and the given สูง/ต่ำ sequence (+1 / -1)."""
+        x = np.empty(len(self.weights))
+        x[0] = 1.0
+        for i, name in enumerate(self.member_names):
+            pred = self._module_predictions.get(name)
+            x[1 + i] = 1.0 if pred == "สูง" else (-1.0 if pred == "ต่ำ" else 0.0)
+        streak = 0
+        if recent:
+            last = recent[-1]
+            for value in reversed(recent):
+                if value != last:
+                    break
+                streak += 1
+            streak *= last
+        window = recent[-self.recent_window:]
+        x[-3] = max(-2.0, min(2.0, streak / 5))
+        x[-2] = sum(window) / self.recent_window
+        x[-1] = recent[-1] if recent else 0.0
+        return x
+
+    def _probability(self, x: np.ndarray) -> float:
+        z = float(self.weights @ x)
+        return 1.0 / (1.0 + np.exp(-max(-30.0, min(30.0, z))))
+
+    def observe(self, history: pd.DataFrame, outcome: str):
+        code = HIGHLOW_CODES.get(outcome)
+        if code not in (_HIGH, _LOW):
+            self._undo_log.append((None, False)) # ไฮโล/ตอง: nothing to learn, nothing to undo.
+            return
+        x = self._features(self._recent)
+        y = 1.0 if code == _HIGH else 0.0
+        self._undo_log.append((self.weights.copy(), True))
+        self.weights += self.learning_rate * ((y - self._probability(x)) * x - self.l2 * self.weights)
+        self.updates += 1
+        self._recent.append(1 if code == _HIGH else -1)
+        if len(self._recent) > 2 * self.recent_window + self.undo_depth:
+            del self._recent[:len(self._recent) - (self.recent_window + self.undo_depth)]
+
+    def retract(self):
+        if not self._undo_log:
+            return
+        weights, appended = self._undo_log.pop()
+        if weights is not None:
+            self.weights = weights
+            self.updates -= 1
+        if appended and self._recent:
+            self._recent.pop()
+
+    def can_retract(self) -> bool:
+        return bool(self._undo_log)
+
+    def fork(self) -> "StackingPredictor":
+        clone = copy.copy(self)
+        clone.weights = self.weights.copy()
+        clone._recent = list(self._recent)
+        clone._undo_log = deque(self._undo_log, maxlen=self.undo_depth) # Entries are never mutated.
+        return clone
+
+    def predict_proba(self, history: pd.DataFrame) -> Dict[str, float]:
+        """Returns {'สูง': P(สูง), 'ต่ำ': 1 - P(สูง)} for the next สูง/ต่ำ roll."""
+        recent = [1 if val == "สูง" else -1 for val in history['HighLow'].tail(4 * self.recent_window).tolist()
+                  if val in ("สูง", "ต่ำ")]
+        p_high = self._probability(self._features(recent))
+        return {"สูง": p_high, "ต่ำ": 1.0 - p_high}
+
+    def predict(self, history: pd.DataFrame) -> Optional[SicBoOutcome]:
+        """
+        Predicts สูง or ต่ำ once the model has trained on enough rolls and is confident enough.
+        The probability of the predicted outcome is kept in `last_probability`.
+        """
+        if self.updates < self.min_observations or len(history) == 0:
+            self.last_probability = None
+            return None
+        probs = self.predict_proba(history)
+        if abs(probs["สูง"] - 0.5) < self.min_margin:
+            self.last_probability = None
+            return None
+        best = max(probs, key=probs.get)
+        self.last_probability = probs[best]
+        return best
+
+    def confidence_signal(self) -> Optional[Tuple[str, float]]:
+        if self.last_probability is None:
+            return None
+        return "probability", self.last_probability
+
+    @property
+    def name(self) -> str:
+        return "สแต็กกิ้ง"
@@ -0,0 +1,170 @@
+# src/prediction_modules/suffix_automaton_predictor.py
+import pandas as pd
+import copy
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+from prediction_modules.base_predictor import BasePredictor, SicBoOutcome, HIGHLOW_OUTCOMES, HIGHLOW_CODES
+from cow_array import CowArray
+
+_ALPHABET = len(HIGHLOW_OUTCOMES)
+
+class SuffixAutomatonPredictor(BasePredictor):
+    def __init__(self, min_match_length: int = 4, undo_depth: int = 1000):
+        """
+        Longest-matching-context predictor (Lempel-Ziv/PPM style) over the full outcome history.
+        An online suffix automaton over every observed outcome finds the longest suffix of the
+        given history that also occurred earlier, and the module predicts the outcome that
+        followed that earlier occurrence. Extending the automaton is amortized O(1) per roll.
+        The automaton lives in CowArrays, so fork() shares it copy-on-write.
+
+        Args:
+            min_match_length (int): Shortest matching context that is trusted for a prediction.
+            undo_depth (int): How many recent rolls can be retracted without rebuilding.
+        """
+        self.min_match_length = min_match_length
+        self.undo_depth = undo_depth
+        self.last_match_length: int = 0
+        self.reset()
+
+    def reset(self):
+        self.sequence = CowArray('B') # Encoded outcomes in order.
+        # Automaton states as parallel arrays; state 0 is the root.
+        self._length = CowArray('i', [0])
+        self._link = CowArray('i', [-1])
+        self._firstpos = CowArray('i', [-1])
+        self._next = CowArray('i', [-1] * _ALPHABET)
+        self._last = 0
+        # One record per extension: (previous last, state count before, [(array name, index, old value), ...]).
+        self._undo_log: Deque[Tuple[int, int, List[Tuple[str, int, int]]]] = deque(maxlen=self.undo_depth)
+        self.last_match_length = 0
+
+    def _new_state(self, length: int, link: int, firstpos: int, transitions: List[int]) -> int:
+        self._length.append(length)
+        self._link.append(link)
+        self._firstpos.append(firstpos)
+        self._next.extend(transitions)
+        return len(self._length) - 1
+
+    def _set(self, target: str, index: int, value: int, changes: List[Tuple[str, int, int]]):
+        values = getattr(self, target)
+        changes.append((target, index, values[index]))
+        values[index] = value
+
+    def _extend(self, code: int):
+        """Standard online suffix automaton extension, recording every overwritten entry for undo."""
+        changes: List[Tuple[str, int, int]] = []
+        record = (self._last, len(self._length), changes)
+        pos = len(self.sequence)
+        self.sequence.append(code)
+
+        cur = self._new_state(self._length[self._last] + 1, -1, pos, [-1] * _ALPHABET)
+        p = self._last
+        while p != -1 and self._next[p * _ALPHABET + code] == -1:
+            self._set('_next', p * _ALPHABET + code, cur, changes)
+            p = self._link[p]
+
+        if p == -1:
+            self._link[cur] = 0
+        else:
+            q = self._next[p * _ALPHABET + code]
+            if self._length[p] + 1 == self._length[q]:
+                self._link[cur] = q
+            else:
+                clone = self._new_state(self._length[p] + 1, self._link[q], self._firstpos[q],
+                                        self._next.tolist(q * _ALPHABET, (q + 1) * _ALPHABET))
+                while p != -1 and self._next[p * _ALPHABET + code] == q:
+                    self._set('_next', p * _ALPHABET + code, clone, changes)
+                    p = self._link[p]
+                self._set('_link', q, clone, changes)
+                self._link[cur] = clone
+        self._last = cur
+        self._undo_log.append(record)
+
+    def observe(self, history: pd.DataFrame, outcome: str):
+        code = HIGHLOW_CODES.get(outcome)
+        if code is not None:
+            self._extend(code)
+
+    def retract(self):
+        if not self.sequence:
+            return
+        if not self._undo_log:
+            # Older than the undo log: rebuild from the stored sequence (O(n), rare).
+            sequence = self.sequence.tolist(0, len(self.sequence) - 1)
+            self.reset()
+            for code in sequence:
+                self._extend(code)
+            return
+        previous_last, state_count, changes = self._undo_log.pop()
+        for target, index, old_value in reversed(changes):
+            getattr(self, target)[index] = old_value
+        self._length.truncate(state_count)
+        self._link.truncate(state_count)
+        self._firstpos.truncate(state_count)
+        self._next.truncate(state_count * _ALPHABET)
+        self._last = previous_last
+        self.sequence.pop()
+
+    def fork(self) -> "SuffixAutomatonPredictor":
+        clone = copy.copy(self)
+        for attr in ("sequence", "_length", "_link", "_firstpos", "_next"):
+            setattr(clone, attr, getattr(self, attr).fork())
+        clone._undo_log = deque(self._undo_log, maxlen=self.undo_depth)
+        return clone
+
+    def longest_match(self) -> Tuple[int, Optional[int]]:
+        """
+        Returns (match length, end position of an earlier occurrence) for the longest suffix
+        of the sequence that also occurred before, or (0, None) if there is none.
+        """
+        if len(self.sequence) < 2:
+            return 0, None
+        state = self._link[self._last]
+        if state <= 0:
+            return 0, None
+        # The suffix-link state's first occurrence ends strictly before the current position.
+        return self._length[state], self._firstpos[state]
+
+    def _match(self, codes: List[int]) -> Tuple[int, Optional[int]]:
+        """
+        (match length, end position of an earlier occurrence) for the longest suffix of `codes`
+        that occurs in the sequence with another outcome after it, or (0, None) if there is none.
+        O(len(codes)): the codes are run through the automaton, following suffix links on a mismatch.
+        """
+        state, length = 0, 0
+        for code in codes:
+            while state > 0 and self._next[state * _ALPHABET + code] == -1:
+                state = self._link[state]
+                length = self._length[state]
+            following = self._next[state * _ALPHABET + code]
+            if following != -1:
+                state, length = following, length + 1
+        # Only an occurrence that ends before the last outcome says what came next.
+        while state > 0 and self._firstpos[state] >= len(self.sequence) - 1:
+            state = self._link[state]
+            length = self._length[state]
+        if state <= 0:
+            return 0, None
+        return length, self._firstpos[state]
+
+    def predict(self, history: pd.DataFrame) -> Optional[SicBoOutcome]:
+        """
+        Predicts the outcome that followed the earlier occurrence of the longest suffix of
+        `history` found in the observed sequence. The match length (the confidence signal) is
+        kept in `last_match_length` and reported by confidence_signal().
+        """
+        codes = [HIGHLOW_CODES[val] for val in history['HighLow'].tolist() if val in HIGHLOW_CODES]
+        match_length, end_pos = self._match(codes)
+        self.last_match_length = match_length
+        if end_pos is None or match_length < self.min_match_length:
+            return None
+        return HIGHLOW_OUTCOMES[self.sequence[end_pos + 1]]
+
+    def confidence_signal(self) -> Optional[Tuple[str, float]]:
+        if self.last_match_length < self.min_match_length:
+            return None
+        return "match_length", self.last_match_length
+
+    @property
+    def name(self) -> str:
+        return "ลำดับซ้ำยาวสุด"
@@ -0,0 +1,154 @@
+# src/roll_tree.py
+from typing import Dict, List, Optional, Tuple
+
+from cow_array import CowArray
+from prediction_modules.base_predictor import PREDICTION_OUTCOMES, PREDICTION_CODES
+
+ROOT = 0 # Node id of the empty history.
+PREDICTION_TYPES = ("none", "normal", "recovery")
+_NO_DICE = 255
+
+
+# Per-node CowArray columns.
+_COLUMNS = ('_parent', '_depth', '_last_child', '_dice', '_prediction', '_source', '_type', '_hits',
+            '_confidence', '_miss_streak')
+
+
+class RollTree:
+    """
+    Persistent (append-only) tree of rolls. Every roll ever added is a node pointing at the
+    node it was added to, so a history is just a node id: undo and redo move a pointer, a
+    roll added after an undo starts a new branch, and nothing older is ever copied or lost.
+    Each node also keeps what the oracle logged for it (the pending prediction and every
+    module's hit/miss), so derived state can be rolled back and forward exactly.
+
+    Nodes are stored column-wise in CowArrays, so forks share the tree copy-on-write and a fork
+    costs one reference per 1024 nodes per column.
+    """
+    def __init__(self, module_names: List[str]):
+        self.module_names = list(module_names)
+        self._parent = CowArray('q', [-1])
+        self._depth = CowArray('q', [0])
+        self._last_child = CowArray('q', [-1]) # Child that redo moves to.
+        self._dice = CowArray('B', [_NO_DICE]) # (die1-1)*36 + (die2-1)*6 + (die3-1)
+        self._prediction = CowArray('b', [-1]) # PREDICTION_CODES of the pending prediction, -1 for None.
+        self._source = CowArray('q', [-1]) # Index into _sources, -1 for None.
+        self._type = CowArray('b', [0]) # Index into PREDICTION_TYPES.
+        self._hits = CowArray('q', [0]) # Bit 2i: module i counted, bit 2i+1: module i hit.
+        self._confidence = CowArray('h', [-1]) # Confidence of the pending prediction, -1 for None.
+        self._miss_streak = CowArray('h', [0]) # Miss streak when the pending prediction was made.
+        self._sources: List[str] = []
+        self._source_codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def add(self, parent: int, dice: Tuple[int, int, int],
+            prediction_entry: Tuple[Optional[str], Optional[str], str],
+            module_hits: Dict[str, Optional[bool]], confidence: Optional[int] = None, miss_streak: int = 0) -> int:
+        """
+        Adds a roll below `parent` and returns the new node id.
+
+        Args:
+            parent (int): Node the roll follows.
+            dice (Tuple[int, int, int]): The three dice.
+            prediction_entry (Tuple): (prediction, source, prediction_type) that was pending before the roll.
+            module_hits (Dict[str, Optional[bool]]): Every module's hit/miss for the roll.
+            confidence (Optional[int]): Confidence of the pending prediction.
+            miss_streak (int): Miss streak when the pending prediction was made.
+        """
+        die1, die2, die3 = dice
+        prediction, source, prediction_type = prediction_entry
+        source_code = -1
+        if source is not None:
+            source_code = self._source_codes.get(source, -1)
+            if source_code < 0:
+                source_code = self._source_codes[source] = len(self._sources)
+                self._sources.append(source)
+        mask = 0
+        for i, name in enumerate(self.module_names):
+            hit = module_hits.get(name)
+            if hit is not None:
+                mask |= (1 << (2 * i)) | ((1 << (2 * i + 1)) if hit else 0)
+
+        node = len(self._parent)
+        self._parent.append(parent)
+        self._depth.append(self._depth[parent] + 1)
+        self._last_child.append(-1)
+        self._dice.append((die1 - 1) * 36 + (die2 - 1) * 6 + (die3 - 1))
+        self._prediction.append(PREDICTION_CODES[prediction] if prediction is not None else -1)
+        self._source.append(source_code)
+        self._type.append(PREDICTION_TYPES.index(prediction_type))
+        self._hits.append(mask)
+        self._confidence.append(-1 if confidence is None else confidence)
+        self._miss_streak.append(miss_streak)
+        self._last_child[parent] = node
+        return node
+
+    def parent(self, node: int) -> int:
+        return self._parent[node]
+
+    def depth(self, node: int) -> int:
+        """Number of rolls in the history ending at `node`."""
+        return self._depth[node]
+
+    def last_child(self, node: int) -> int:
+        """The child redo moves to, or -1."""
+        return self._last_child[node]
+
+    def set_last_child(self, node: int, child: int):
+        self._last_child[node] = child
+
+    def children(self, node: int) -> List[int]:
+        """Every branch that continues from `node`, oldest first (O(nodes))."""
+        return [child for child, parent in enumerate(self._parent.tolist()) if parent == node]
+
+    def dice(self, node: int) -> Tuple[int, int, int]:
+        code = self._dice[node]
+        return code // 36 + 1, (code // 6) % 6 + 1, code % 6 + 1
+
+    def prediction_entry(self, node: int) -> Tuple[Optional[str], Optional[str], str]:
+        """The (prediction, source, prediction_type) that was pending when this roll was added."""
+        prediction = self._prediction[node]
+        source = self._source[node]
+        return (PREDICTION_OUTCOMES[prediction] if prediction >= 0 else None,
+                self._sources[source] if source >= 0 else None,
+                PREDICTION_TYPES[self._type[node]])
+
+    def prediction_stats(self, node: int) -> Tuple[Optional[int], int]:
+        """(confidence, miss streak) of the prediction that was pending when this roll was added."""
+        confidence = self._confidence[node]
+        return (confidence if confidence >= 0 else None), self._miss_streak[node]
+
+    def module_hits(self, node: int) -> Dict[str, Optional[bool]]:
+        mask = self._hits[node]
+        if mask == 0:
+            return {}
+        return {name: (bool(mask >> (2 * i + 1) & 1) if mask >> (2 * i) & 1 else None)
+                for i, name in enumerate(self.module_names)}
+
+    def ancestors(self, node: int, limit: int) -> List[int]:
+        """The last `limit` rolls of the history ending at `node` (node ids, oldest first)."""
+        path = []
+        while node != ROOT and len(path) < limit:
+            path.append(node)
+            node = self._parent[node]
+        path.reverse()
+        return path
+
+    def truncate(self, size: int):
+        """
+        Drops every node from id `size` on (only valid for nodes nothing else points at, such as
+        temporary what-if rolls); callers must repair last_child links into the dropped nodes.
+        """
+        for attr in _COLUMNS:
+            getattr(self, attr).truncate(size)
+
+    def fork(self) -> "RollTree":
+        clone = RollTree.__new__(RollTree)
+        clone.module_names = self.module_names
+        for attr in _COLUMNS:
+            setattr(clone, attr, getattr(self, attr).fork())
+        clone._sources = list(self._sources)
+        clone._source_codes = dict(self._source_codes)
+        return clone
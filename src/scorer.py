@@ -1,86 +1,157 @@
 # src/scorer.py
 from typing import Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
-from prediction_modules.base_predictor import SicBoOutcome
+# *** แก้ไข: เปลี่ยน Relative Import เป็น Absolute Import ***
+from prediction_modules.base_predictor import SicBoOutcome, HIGHLOW_OUTCOMES, HIGHLOW_CODES, PREDICTION_CODES
+
+# Betting markets the scorer aggregates: market -> (its outcomes, outcomes it is compared against).
+# 'ไฮโล' and 'ตอง' are single bets that compete with the High/Low call on the same roll, so
+# their confidence is their share of all support on the High/Low board.
+MARKETS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "highlow": (("สูง", "ต่ำ"), ("สูง", "ต่ำ")),
+    "hilo": (("ไฮโล",), ("สูง", "ต่ำ", "ไฮโล")),
+    "triplet": (("ตอง",), ("สูง", "ต่ำ", "ไฮโล", "ตอง")),
+    "oddeven": (("คู่", "คี่"), ("คู่", "คี่")),
+    "total": (tuple(str(total) for total in range(4, 18)), tuple(str(total) for total in range(4, 18))),
+}
+# Which market every predictable outcome belongs to.
+OUTCOME_MARKET: Dict[str, str] = {outcome: market for market, (outcomes, _) in MARKETS.items() for outcome in outcomes}
+
+# Pattern codes returned by _extract_dominant_pattern; score_batch reports them as indices into this tuple.
+PATTERN_NAMES = ("HLHL", "LHLH", "HHL_LL", "LLH_HH", "HHH", "LLL")
+_PATTERN_WINDOW = 6
+_pattern_table: Optional[np.ndarray] = None
+
+def _dominant_pattern_table() -> np.ndarray:
+    """
+    Index into PATTERN_NAMES (-1 for none) for every possible window of the last 6 HighLow codes,
+    keyed by the codes read as a base-4 number (oldest first). Built once from the scalar rules.
+    """
+    global _pattern_table
+    if _pattern_table is None:
+        n_codes = len(HIGHLOW_OUTCOMES)
+        table = np.full(n_codes ** _PATTERN_WINDOW, -1, dtype=np.int8)
+        for key in range(len(table)):
+            window = [HIGHLOW_OUTCOMES[(key // n_codes ** (_PATTERN_WINDOW - 1 - k)) % n_codes] for k in range(_PATTERN_WINDOW)]
+            pattern = ConfidenceScorer._pattern_from_recent(window)
+            if pattern is not None:
+                table[key] = PATTERN_NAMES.index(pattern)
+        _pattern_table = table
+    return _pattern_table
 
 class ConfidenceScorer:
-    def score(self, 
-              predictions: Dict[str, Optional[SicBoOutcome]], 
-              weights: Dict[str, float], 
-              history: pd.DataFrame) -> Tuple[Optional[SicBoOutcome], Optional[str], Optional[int], Optional[str]]:
-        """
-        Aggregates predictions from multiple modules, applies weights, and determines the best prediction.
-        Now includes 'ไฮโล' in the scoring aggregation.
+    def score_batch(self,
+                    predictions: np.ndarray,
+                    weights: np.ndarray,
+                    history_outcomes: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
         """
-        
-        # Initialize scores for main outcomes: High, Low, and HiLo
-        total_score = {"สูง": 0.0, "ต่ำ": 0.0, "ไฮโล": 0.0}
+        Vectorized score() for many rows at once. Row i gives exactly what score() returns for
+        the same predictions and weights (the module scores are accumulated in the same order,
+        so even float ties come out the same).
 
-        for name, pred in predictions.items():
-            if pred is None:
-                continue
-            
-            weight = weights.get(name, 0.5)
-
-            # Aggregate scores based on prediction type
-            if pred in total_score: # Check if prediction is one of our main scoring categories
-                total_score[pred] += weight
-            # Predictions for 'ตอง' from modules (if any) are ignored as we don't aggregate for 'ตอง' bets.
-
-        best_overall_prediction: Optional[SicBoOutcome] = None
-        best_source: Optional[str] = None
-        overall_confidence: Optional[int] = None
-        
-        sum_scores = sum(total_score.values())
-        if sum_scores > 0:
-            best_pred_key = max(total_score, key=total_score.get)
-            conf_val = int((total_score[best_pred_key] / sum_scores) * 100)
-            
-            if conf_val > 0:
-                best_overall_prediction = best_pred_key
-                overall_confidence = min(conf_val, 95)
-                source_modules = [name for name, pred in predictions.items() if pred == best_pred_key]
-                best_source = ", ".join(source_modules)
-
-        # Extract a relevant pattern for display in the UI.
-        # This still focuses on H/L patterns as 'ไฮโล' doesn't form patterns in the same way.
-        identified_pattern = self._extract_dominant_pattern(history)
-
-        return best_overall_prediction, best_source, overall_confidence, identified_pattern
+        Args:
+            predictions (np.ndarray): N x modules PREDICTION_CODES, -1 where a module made no prediction.
+            weights (np.ndarray): N x modules (or 1 x modules) module weights.
+            history_outcomes (np.ndarray): HIGHLOW_CODES of the rolls, oldest first; row i's
+                pattern is taken from the rolls before roll i. Patterns are -1 when omitted.
 
-    def _extract_dominant_pattern(self, history: pd.DataFrame) -> Optional[str]:
+        Returns:
+            Dict[str, np.ndarray]:
+            - "prediction": PREDICTION_CODES of the best outcome, -1 for none
+            - "confidence": confidence 0-95, -1 for none
+            - "source_mask": bit j set when module j predicted the chosen outcome
+            - "pattern": index into PATTERN_NAMES, -1 for none
         """
-        Attempts to extract a visually recognizable pattern from the recent history,
-        returning a short code string that can be mapped to a user-friendly name in app.py.
-        Filters out 'ตอง' and 'ไฮโล' as they don't form H/L patterns.
+        predictions = np.asarray(predictions)
+        n_rows, n_modules = predictions.shape
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), (n_rows, n_modules))
+        high, low = PREDICTION_CODES["สูง"], PREDICTION_CODES["ต่ำ"]
+
+        score_high = np.zeros(n_rows)
+        score_low = np.zeros(n_rows)
+        for j in range(n_modules): # Module order, as in score()
+            score_high += np.where(predictions[:, j] == high, weights[:, j], 0.0)
+            score_low += np.where(predictions[:, j] == low, weights[:, j], 0.0)
+
+        sum_hl = score_high + score_low
+        best_is_low = score_low > score_high # max() keeps 'สูง' on ties
+        best_score = np.where(best_is_low, score_low, score_high)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            conf = np.trunc(np.where(sum_hl > 0, best_score / sum_hl, 0.0) * 100).astype(np.int64)
+        has_prediction = (sum_hl > 0) & (conf > 0)
+
+        best_code = np.where(best_is_low, low, high)
+        prediction = np.where(has_prediction, best_code, -1).astype(np.int8)
+        confidence = np.where(has_prediction, np.minimum(conf, 95), -1).astype(np.int16)
+        source_mask = np.zeros(n_rows, dtype=np.int64)
+        for j in range(n_modules):
+            source_mask |= (predictions[:, j] == best_code).astype(np.int64) << j
+        source_mask[~has_prediction] = 0
+
+        pattern = np.full(n_rows, -1, dtype=np.int8)
+        if history_outcomes is not None:
+            outcomes = np.asarray(history_outcomes, dtype=np.int64)
+            rows = np.arange(_PATTERN_WINDOW, min(n_rows, len(outcomes) + 1))
+            if len(rows):
+                key = np.zeros(len(rows), dtype=np.int64)
+                for k in range(_PATTERN_WINDOW):
+                    key = key * len(HIGHLOW_OUTCOMES) + outcomes[rows - _PATTERN_WINDOW + k]
+                pattern[rows] = _dominant_pattern_table()[key]
+
+        return {"prediction": prediction, "confidence": confidence, "source_mask": source_mask, "pattern": pattern}
+
+    def score_markets(self,
+                      predictions: Dict[str, Optional[SicBoOutcome]],
+                      weights: Dict[str, float],
+                      market_weights: Optional[Dict[str, Dict[str, float]]] = None,
+                      ) -> Dict[str, Tuple[Optional[SicBoOutcome], Optional[str], Optional[int]]]:
         """
-        if len(history) < 6:
-            return None
-        
-        # Filter history to only include 'สูง' or 'ต่ำ' for pattern detection. Exclude 'ตอง' and 'ไฮโล'.
-        recent_highlow_filtered = [val for val in history['HighLow'].tail(6).tolist() if val in ['สูง', 'ต่ำ']]
-        
-        if len(recent_highlow_filtered) < 4:
-            return None
+        Aggregates the module predictions for every market in one pass.
 
-        pattern_str = "".join(recent_highlow_filtered)
+        Args:
+            predictions (Dict[str, Optional[SicBoOutcome]]): Dictionary of module_name: prediction_outcome.
+            weights (Dict[str, float]): Dictionary of module_name: weight, used for every market
+                without its own weights.
+            market_weights (Dict[str, Dict[str, float]]): Optional per-market module weights,
+                e.g. {"oddeven": {"กฎพื้นฐาน": 0.8}}.
 
-        if "สูงต่ำสูงต่ำ" in pattern_str: return "HLHL"
-        if "ต่ำสูงต่ำสูง" in pattern_str: return "LHLH"
-        if "สูงสูงต่ำต่ำ" in pattern_str: return "HHL_LL"
-        if "ต่ำต่ำสูงสูง" in pattern_str: return "LLH_HH"
-        
-        if pattern_str.endswith("สูงสูงสูง"): return "HHH"
-        if pattern_str.endswith("ต่ำต่ำต่ำ"): return "LLL"
-        
-        return None
-        # src/scorer.py
-from typing import Dict, List, Optional, Tuple
-import pandas as pd
-# *** แก้ไข: เปลี่ยน Relative Import เป็น Absolute Import ***
-from prediction_modules.base_predictor import SicBoOutcome
+        Returns:
+            Dict[str, Tuple]: market: (best outcome, supporting modules, confidence 0-95), with
+            (None, None, None) for markets no module predicted. Markets are listed in MARKETS.
+        """
+        market_weights = market_weights or {}
+        outcome_scores: Dict[str, float] = {}
+        outcome_sources: Dict[str, List[str]] = {}
+
+        # Single pass over the module outputs: every prediction lands in its market's bucket.
+        for name, pred in predictions.items():
+            if pred is None:
+                continue
+            market = OUTCOME_MARKET.get(pred)
+            if market is None:
+                continue
+            weight = market_weights.get(market, weights).get(name, 0.5)
+            outcome_scores[pred] = outcome_scores.get(pred, 0.0) + weight
+            outcome_sources.setdefault(pred, []).append(name)
+
+        results = {}
+        for market, (outcomes, rivals) in MARKETS.items():
+            best_outcome, best_score = None, 0.0
+            for outcome in outcomes:
+                if outcome in outcome_scores and (best_outcome is None or outcome_scores[outcome] > best_score):
+                    best_outcome, best_score = outcome, outcome_scores[outcome]
+            results[market] = (None, None, None)
+            if best_outcome is None:
+                continue
+            sum_scores = sum(outcome_scores.get(outcome, 0.0) for outcome in rivals)
+            if sum_scores > 0:
+                conf = int((best_score / sum_scores) * 100)
+                if conf > 0: # Even 0 confidence can be a prediction if it's the only one
+                    # Cap confidence at 95% for realism.
+                    results[market] = (best_outcome, ", ".join(outcome_sources[best_outcome]), min(conf, 95))
+        return results
 
-class ConfidenceScorer:
     def score(self, 
               predictions: Dict[str, Optional[SicBoOutcome]], 
               weights: Dict[str, float], 
@@ -102,38 +173,8 @@ class ConfidenceScorer:
             - Identified pattern (e.g., "HLHL", "HHH")
         """
         
-        # Initialize scores for main outcomes (High/Low).
-        # This scorer primarily focuses on High/Low predictions for aggregation.
-        total_score_high_low = {"สูง": 0.0, "ต่ำ": 0.0}
-
-        # Collect all valid predictions and apply their respective weights.
-        for name, pred in predictions.items():
-            if pred is None: # Skip if a module didn't make a prediction.
-                continue
-            
-            weight = weights.get(name, 0.5) # Get the weight for the current module, default to 0.5.
-
-            # Aggregate scores based on prediction type.
-            if pred in ["สูง", "ต่ำ"]:
-                total_score_high_low[pred] += weight
-            # You can extend this to include 'คู่'/'คี่' or 'แต้มรวม' if desired.
-
-        best_overall_prediction: Optional[SicBoOutcome] = None
-        best_source: Optional[str] = None
-        overall_confidence: Optional[int] = None
-        
-        # Determine the best High/Low prediction based on aggregated scores.
-        sum_hl = sum(total_score_high_low.values())
-        if sum_hl > 0: # Only proceed if there are High/Low predictions.
-            best_hl = max(total_score_high_low, key=total_score_high_low.get)
-            conf_hl = int((total_score_high_low[best_hl] / sum_hl) * 100)
-            
-            if conf_hl > 0: # Even 0 confidence can be a prediction if it's the only one
-                best_overall_prediction = best_hl
-                overall_confidence = min(conf_hl, 95) # Cap confidence at 95% for realism.
-                # Identify the source module(s) that contributed to this best prediction.
-                source_modules = [name for name, pred in predictions.items() if pred == best_hl]
-                best_source = ", ".join(source_modules)
+        # The High/Low market of score_markets() is exactly the former High/Low-only aggregation.
+        best_overall_prediction, best_source, overall_confidence = self.score_markets(predictions, weights)["highlow"]
 
         # Extract a relevant pattern for display in the UI.
         identified_pattern = self._extract_dominant_pattern(history)
@@ -148,9 +189,13 @@ class ConfidenceScorer:
         """
         if len(history) < 6: # Needs enough history to detect patterns.
             return None
-        
+        return self._pattern_from_recent(history['HighLow'].tail(6).tolist())
+
+    @staticmethod
+    def _pattern_from_recent(recent_highlow: List[str]) -> Optional[str]:
+        """Pattern code of the last 6 'HighLow' values (shared by score and score_batch)."""
         # Filter history to only include 'สูง' or 'ต่ำ' for pattern detection.
-        recent_highlow_filtered = [val for val in history['HighLow'].tail(6).tolist() if val in ['สูง', 'ต่ำ']]
+        recent_highlow_filtered = [val for val in recent_highlow if val in ['สูง', 'ต่ำ']]
         
         if len(recent_highlow_filtered) < 4: # Need at least 4 non-triplet results for common patterns.
             return None
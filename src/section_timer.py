@@ -0,0 +1,52 @@
+# src/section_timer.py
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Timing is off unless this environment variable is "1" (app_benchmark.py turns it on).
+ENV_VAR = "SICBO_SECTION_TIMINGS"
+
+_records: List[Tuple[str, float]] = []
+_lap_start: Optional[float] = None
+
+def enabled() -> bool:
+    return os.environ.get(ENV_VAR) == "1"
+
+@contextmanager
+def timed_section(name: str):
+    """
+    Records how long the body takes under `name` when timing is enabled; otherwise costs one
+    environment lookup. Used to break a Streamlit rerun of app.py down by UI section.
+    """
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _records.append((name, time.perf_counter() - start))
+
+def start_laps():
+    """Starts a run of consecutive sections timed with lap() (e.g. at the top of a script rerun)."""
+    global _lap_start
+    _lap_start = time.perf_counter() if enabled() else None
+
+def lap(name: str):
+    """Records the time since the previous lap()/start_laps() under `name`."""
+    global _lap_start
+    if _lap_start is None:
+        return
+    now = time.perf_counter()
+    _records.append((name, now - _lap_start))
+    _lap_start = now
+
+def drain() -> Dict[str, float]:
+    """Returns the seconds spent per section since the last drain() and clears them."""
+    records = list(_records)
+    del _records[:len(records)]
+    totals: Dict[str, float] = {}
+    for name, seconds in records:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return totals
@@ -1,8 +1,13 @@
 # src/sicbo_oracle.py
 import pandas as pd
+import numpy as np
 from typing import List, Optional, Tuple, Dict, Literal
 import sys
 import os
+import copy
+import pickle
+import struct
+import zlib
 
 # Define common types for Sic Bo outcomes
 SicBoOutcome = Literal["สูง", "ต่ำ", "คู่", "คี่", "ตอง", "ไฮโล", "4", "5", "6", "7", "8", "9", "10", "11", "12", "13", "14", "15", "16", "17"]
@@ -16,9 +21,141 @@ from prediction_modules.two_two_pattern_predictor import TwoTwoPatternPredictor
 from prediction_modules.sniper_pattern_predictor import SniperPatternPredictor 
 from prediction_modules.smart_predictor import SmartPredictor             
 from prediction_modules.hilo_predictor import HiLoPredictor 
+from prediction_modules.markov_predictor import MarkovPredictor
+from prediction_modules.suffix_automaton_predictor import SuffixAutomatonPredictor
+from prediction_modules.stacking_predictor import StackingPredictor
+
+# Snapshot file layout: magic, format version, flags, then the pickled oracle state.
+SNAPSHOT_MAGIC = b"SBORACLE"
+SNAPSHOT_FORMAT_VERSION = 4
+_SNAPSHOT_HEADER = struct.Struct("<8sHH")
+_SNAPSHOT_FLAG_ZLIB = 1
 
 # Import the ConfidenceScorer
 from scorer import ConfidenceScorer 
+from module_weights import OnlineModuleWeights
+from module_scoreboard import ModuleScoreboard
+from roll_tree import RollTree, ROOT
+from prediction_ledger import PredictionLedger
+
+def classify_rolls(die1, die2, die3) -> pd.DataFrame:
+    """
+    Vectorized version of the classification in SicBoOracle.add_roll, for bulk data.
+    Takes array-likes of dice and returns the history columns
+    ('Die1', 'Die2', 'Die3', 'Total', 'HighLow', 'OddEven', 'Triplet').
+    """
+    die1 = np.asarray(die1, dtype=np.int64)
+    die2 = np.asarray(die2, dtype=np.int64)
+    die3 = np.asarray(die3, dtype=np.int64)
+    total = die1 + die2 + die3
+    triplet = (die1 == die2) & (die2 == die3)
+    high_low = np.select([triplet, total == 11, total <= 10], ['ตอง', 'ไฮโล', 'ต่ำ'], default='สูง')
+    odd_even = np.select([triplet, total % 2 == 0], ['ตอง', 'คู่'], default='คี่')
+    return pd.DataFrame({
+        'Die1': die1, 'Die2': die2, 'Die3': die3,
+        'Total': total, 'HighLow': high_low, 'OddEven': odd_even,
+        'Triplet': triplet,
+    })
+
+def _dice_classes() -> Dict[str, List[Tuple[int, int, int]]]:
+    """Groups the 216 dice outcomes by what the prediction modules see of a roll (HighLow and OddEven)."""
+    classes: Dict[str, List[Tuple[int, int, int]]] = {}
+    for die1 in range(1, 7):
+        for die2 in range(1, 7):
+            for die3 in range(1, 7):
+                total = die1 + die2 + die3
+                if die1 == die2 == die3:
+                    label = 'ตอง'
+                else:
+                    high_low = 'ไฮโล' if total == 11 else ('ต่ำ' if total <= 10 else 'สูง')
+                    label = f"{high_low}/{'คู่' if total % 2 == 0 else 'คี่'}"
+                classes.setdefault(label, []).append((die1, die2, die3))
+    return classes
+
+# Outcome classes used by SicBoOracle.lookahead: label -> every dice outcome in it.
+LOOKAHEAD_CLASSES = _dice_classes()
+# Class label of each of the 216 dice outcomes.
+DICE_CLASSES = {dice: label for label, outcomes in LOOKAHEAD_CLASSES.items() for dice in outcomes}
+
+# Fallback order of modules tried during recovery (the best recent module is tried first).
+RECOVERY_MODULES_ORDER = ["Smart", "สไนเปอร์", "ทำนายไฮโล", "เทรนด์ H/L", "รูปแบบ H/L", "รูปแบบ 2-2", "กฎพื้นฐาน"]
+
+def decide_prediction(module_predictions: Dict[str, Optional[SicBoOutcome]],
+                      weights: Dict[str, float],
+                      scorer_result: Tuple[Optional[SicBoOutcome], Optional[str], Optional[int], Optional[str]],
+                      current_miss_streak: int,
+                      best_recent_module: Optional[str],
+                      hilo_weight_threshold: float = 0.7,
+                      recovery_miss_streaks: Tuple[int, ...] = (3, 4, 5),
+                      recovery_confidence_multiplier: float = 1.2,
+                      ) -> Tuple[Optional[SicBoOutcome], Optional[str], Optional[int], Optional[str], Literal["normal", "recovery"]]:
+    """
+    The decision layer of SicBoOracle.predict_next_outcome, once the oracle is ready to predict.
+    It only combines module outputs with the thresholds, so the parameter sweep can re-run it
+    for many settings over the same module predictions.
+
+    Args:
+        module_predictions (Dict[str, Optional[SicBoOutcome]]): module_name: prediction.
+        weights (Dict[str, float]): Normalized module weights.
+        scorer_result (Tuple): What ConfidenceScorer.score returned for these predictions and weights.
+        current_miss_streak (int): Current miss streak.
+        best_recent_module (Optional[str]): Module tried first during recovery.
+        hilo_weight_threshold (float): 'ทำนายไฮโล' weight above which its 'ไฮโล' call wins outright.
+        recovery_miss_streaks (Tuple[int, ...]): Miss streaks at which recovery mode is used.
+        recovery_confidence_multiplier (float): Confidence boost for recovery predictions.
+
+    Returns:
+        Tuple: (prediction, source, confidence, pattern, prediction_type)
+    """
+    final_pred: Optional[SicBoOutcome] = None
+    source: Optional[str] = None
+    confidence: Optional[int] = None
+    pattern: Optional[str] = None # pattern is initialized here
+
+    prediction_type: Literal["normal", "recovery"] = "normal" # Default to normal
+
+    # Check for a strong 'ไฮโล' prediction first
+    hilo_pred = module_predictions.get("ทำนายไฮโล")
+    if hilo_pred == "ไฮโล" and weights.get("ทำนายไฮโล", 0) > hilo_weight_threshold:
+        final_pred = "ไฮโล"
+        source = "ทำนายไฮโล"
+        confidence = min(int(weights.get("ทำนายไฮโล", 0.5) * 100), 95)
+        pattern = None # Pattern is explicitly set to None here if HiLo is predicted
+    else:
+        # Otherwise, use the scorer for High/Low prediction
+        final_pred, source, confidence, pattern = scorer_result
+        # Here, 'pattern' is assigned the result from scorer._extract_dominant_pattern
+
+    # Baccarat-inspired "recovery" logic: if on a miss streak, try to use the best recent module
+    # This recovery logic will now also consider 'ทำนายไฮโล' if it's the best recent module.
+    if current_miss_streak in recovery_miss_streaks:
+        prediction_type = "recovery" # Set type to recovery if in this state
+        recovery_modules_order = RECOVERY_MODULES_ORDER
+        # Try the module with the best recent record first, then fall back to the fixed order.
+        if best_recent_module is not None:
+            recovery_modules_order = [best_recent_module] + [m for m in recovery_modules_order if m != best_recent_module]
+
+        for mod_name in recovery_modules_order:
+            if mod_name in module_predictions and module_predictions[mod_name] is not None:
+                if module_predictions[mod_name] == "ไฮโล":
+                    final_pred = "ไฮโล"
+                    source = f"{mod_name}-Recovery"
+                    confidence = min(int(weights.get(mod_name, 0.5) * 100 * recovery_confidence_multiplier), 95)
+                    pattern = None # Pattern is explicitly set to None here
+                    break
+                elif module_predictions[mod_name] in ["สูง", "ต่ำ"]:
+                    final_pred = module_predictions[mod_name]
+                    source = f"{mod_name}-Recovery"
+                    confidence = min(int(weights.get(mod_name, 0.5) * 100 * recovery_confidence_multiplier), 95)
+                    # Pattern is *not* explicitly set to None here.
+                    # This means if the 'else' branch (scorer.score) set 'pattern' to "LHLH",
+                    # and then recovery takes over with a H/L prediction, the 'pattern' variable
+                    # from the scorer.score call might persist.
+                    # However, 'final_pred' is correctly assigned the outcome.
+
+                    break
+
+    return final_pred, source, confidence, pattern, prediction_type
 
 class SicBoOracle:
     """
@@ -27,31 +164,25 @@ class SicBoOracle:
     This version incorporates more sophisticated prediction logic inspired by Baccarat Oracle v3.7.
     Updated to handle 'ไฮโล' (total 11) as a special outcome and to predict it.
     Also, improved miss streak calculation logic.
+
+    Module weights come either from an online, exponentially decayed hit rate that is
+    updated on every add_roll ("online", the default), or from the plain hit rates over
+    the current history ("accuracy", see get_module_accuracies).
     """
-    def __init__(self):
-        # Initialize history as an empty DataFrame with predefined columns.
-        self.history: pd.DataFrame = pd.DataFrame(columns=['Die1', 'Die2', 'Die3', 'Total', 'HighLow', 'OddEven', 'Triplet'])
-        
+    def __init__(self, weighting_mode: Literal["online", "accuracy"] = "online", weight_decay: float = 0.9,
+                 modules: Optional[Dict[str, BasePredictor]] = None):
         # Store the last prediction made by the oracle.
         self.last_prediction_outcome: Optional[SicBoOutcome] = None
         self.last_prediction_source: Optional[str] = None 
         self.last_prediction_type: Literal["normal", "recovery", "none"] = "none" # NEW: Track prediction type
+        self.last_prediction_confidence: Optional[int] = None
+        self.last_prediction_miss_streak = 0 # Miss streak when the pending prediction was made.
 
-        # Logs to track predictions and actual results for accuracy calculation.
-        # prediction_log now stores (predicted_outcome, source_module_name, prediction_type)
-        self.prediction_log: List[Tuple[Optional[SicBoOutcome], Optional[str], Literal["normal", "recovery", "none"]]] = [] 
-        self.result_log: List[SicBoOutcome] = [] 
-
-        # Initialize all prediction modules.
-        self.modules: Dict[str, BasePredictor] = {
-            "กฎพื้นฐาน": RuleBasedPredictor(),
-            "รูปแบบ H/L": PatternPredictor(),
-            "เทรนด์ H/L": TrendPredictor(),             
-            "รูปแบบ 2-2": TwoTwoPatternPredictor(),     
-            "สไนเปอร์": SniperPatternPredictor(),       
-            "Smart": SmartPredictor(),                 
-            "ทำนายไฮโล": HiLoPredictor(), 
-        }
+        # Initialize all prediction modules (or use the given set, e.g. batch_engine.batch_modules()).
+        if modules is not None:
+            self.modules: Dict[str, BasePredictor] = dict(modules)
+        else:
+            self.modules = self._default_modules()
         # Initialize the ConfidenceScorer.
         self.scorer = ConfidenceScorer()
         
@@ -59,13 +190,120 @@ class SicBoOracle:
         self.min_history_for_prediction = 5 
         # Minimum non-'ตอง' and non-'ไฮโล' High/Low outcomes needed before making primary H/L predictions.
         self.min_non_special_outcome_history_for_prediction = 10 
+        # Miss streaks that switch to recovery mode, and the streak at which predictions stop.
+        self.recovery_miss_streaks: Tuple[int, ...] = (3, 4, 5)
+        self.stop_miss_streak = 6
+        # 'ทำนายไฮโล' overrides the scorer when it calls 'ไฮโล' with a weight above this.
+        self.hilo_weight_threshold = 0.7
+        # Confidence boost given to recovery predictions.
+        self.recovery_confidence_multiplier = 1.2
+
+        # Module weighting: "online" reads the decayed hit rates below, "accuracy" the plain hit rates
+        # over the current history.
+        self.weighting_mode = weighting_mode
+        self.online_weights = OnlineModuleWeights(list(self.modules.keys()), decay=weight_decay)
+        # Real per-roll hit/miss of every module over the last 100 rolls, for recovery module selection.
+        self.scoreboard = ModuleScoreboard(list(self.modules.keys()), window=100)
+
+        # Every roll ever added lives in a persistent tree; the current history is a node of it.
+        # history, prediction_log, result_log and module_hit_log are views of its last 100 rolls.
+        self.tree = RollTree(list(self.modules.keys()))
+        self.current_node = ROOT
+        # Online weight counts saved every WEIGHT_CHECKPOINT_INTERVAL rolls along each branch, so undo
+        # restores them exactly (re-applying at most that many updates) instead of dividing them back.
+        self._weight_checkpoints: Dict[int, tuple] = {}
+
+        # Incremented on every history change; used to cache module predictions per history state.
+        self.history_version = 0
+        # (history_version, module predictions, module confidence signals)
+        self._module_predictions_cache: Optional[Tuple[int, Dict[str, Optional[SicBoOutcome]], Dict[str, Tuple[str, float]]]] = None
+        self._views_cache: Optional[Tuple[int, dict]] = None
+        # Optional persistent record of every settled prediction (see open_ledger).
+        self.ledger: Optional[PredictionLedger] = None
+
+    @staticmethod
+    def _default_modules() -> Dict[str, BasePredictor]:
+        modules: Dict[str, BasePredictor] = {
+            "กฎพื้นฐาน": RuleBasedPredictor(),
+            "รูปแบบ H/L": PatternPredictor(),
+            "เทรนด์ H/L": TrendPredictor(),
+            "รูปแบบ 2-2": TwoTwoPatternPredictor(),
+            "สไนเปอร์": SniperPatternPredictor(),
+            "Smart": SmartPredictor(),
+            "ทำนายไฮโล": HiLoPredictor(),
+            "มาร์คอฟ": MarkovPredictor(),
+            "ลำดับซ้ำยาวสุด": SuffixAutomatonPredictor(),
+        }
+        # The stacking ensemble learns from every module above, so it comes last.
+        modules["สแต็กกิ้ง"] = StackingPredictor(list(modules.keys()))
+        return modules
+
+    # The oracle only ever looks at (and logs against) the last HISTORY_LIMIT rolls.
+    HISTORY_LIMIT = 100
+    WEIGHT_CHECKPOINT_INTERVAL = 32
+
+    def _checkpoint_weights(self):
+        if self.tree.depth(self.current_node) % self.WEIGHT_CHECKPOINT_INTERVAL == 0:
+            self._weight_checkpoints.setdefault(self.current_node, self.online_weights.get_state())
+
+    def _restore_weights(self):
+        """Rebuilds the online weights of the current node from the nearest checkpointed ancestor."""
+        replay = []
+        node = self.current_node
+        while node != ROOT and node not in self._weight_checkpoints:
+            replay.append(node)
+            node = self.tree.parent(node)
+        if node == ROOT:
+            self.online_weights.reset()
+        else:
+            self.online_weights.set_state(self._weight_checkpoints[node])
+        for node in reversed(replay):
+            self.online_weights.update(self.tree.module_hits(node))
 
-    def add_roll(self, die1: int, die2: int, die3: int):
+    def _view(self, name: str):
         """
-        Adds a new Sic Bo roll outcome to the history.
-        Calculates High/Low, Odd/Even, and Triplet status for the new roll, including 'ไฮโล'.
-        Logs the prediction made *before* this roll and the actual result.
+        Returns one view of the last 100 rolls (history DataFrame or a log), built on first
+        use and cached until the history changes.
         """
+        if self._views_cache is None or self._views_cache[0] != self.history_version:
+            self._views_cache = (self.history_version, {"path": self.tree.ancestors(self.current_node, self.HISTORY_LIMIT)})
+        views = self._views_cache[1]
+        if name not in views:
+            path = views["path"]
+            if name == "history":
+                dice = [self.tree.dice(node) for node in path]
+                views[name] = classify_rolls([d[0] for d in dice], [d[1] for d in dice], [d[2] for d in dice])
+            elif name == "result_log":
+                views[name] = self._view("history")['HighLow'].tolist()
+            elif name == "prediction_log":
+                views[name] = [self.tree.prediction_entry(node) for node in path]
+            elif name == "module_hit_log":
+                views[name] = [self.tree.module_hits(node) for node in path]
+        return views[name]
+
+    @property
+    def history(self) -> pd.DataFrame:
+        """The last 100 rolls (read-only; change it through add_roll/remove_last_roll/redo_last_roll)."""
+        return self._view("history")
+
+    @property
+    def prediction_log(self) -> List[Tuple[Optional[SicBoOutcome], Optional[str], Literal["normal", "recovery", "none"]]]:
+        """(predicted_outcome, source_module_name, prediction_type) logged before each roll in history."""
+        return self._view("prediction_log")
+
+    @property
+    def result_log(self) -> List[SicBoOutcome]:
+        """HighLow outcome of each roll in history."""
+        return self._view("result_log")
+
+    @property
+    def module_hit_log(self) -> List[Dict[str, Optional[bool]]]:
+        """Per-roll hit/miss of every module against the actual outcome (None = did not count)."""
+        return self._view("module_hit_log")
+
+    @staticmethod
+    def _high_low(die1: int, die2: int, die3: int) -> SicBoOutcome:
+        """The 'HighLow' value of a roll: 'ตอง' for triplets, 'ไฮโล' for 11, else 'ต่ำ' (4-10) or 'สูง' (12-17)."""
         total = die1 + die2 + die3
         high_low = ''
         
@@ -76,83 +314,340 @@ class SicBoOracle:
         elif 12 <= total <= 17:
             high_low = 'สูง'
         
-        odd_even = 'คู่' if total % 2 == 0 else 'คี่'
-        triplet = (die1 == die2 == die3)
-        
-        if triplet: 
+        if die1 == die2 == die3: 
             high_low = 'ตอง'
-            odd_even = 'ตอง'
+        return high_low
 
-        new_roll = pd.DataFrame([{
-            'Die1': die1, 'Die2': die2, 'Die3': die3,
-            'Total': total, 'HighLow': high_low, 'OddEven': odd_even,
-            'Triplet': triplet
-        }])
-        
-        self.history = pd.concat([self.history, new_roll], ignore_index=True)
-        
-        if len(self.history) > 100: 
-            self.history = self.history.tail(100).reset_index(drop=True)
-            if self.prediction_log: self.prediction_log.pop(0)
-            if self.result_log: self.result_log.pop(0)
+    def add_roll(self, die1: int, die2: int, die3: int):
+        """
+        Adds a new Sic Bo roll outcome to the history.
+        Calculates High/Low, Odd/Even, and Triplet status for the new roll, including 'ไฮโล'.
+        Logs the prediction made *before* this roll and the actual result.
+        """
+        high_low = self._high_low(die1, die2, die3)
 
-        self.result_log.append(high_low) 
-        # Log the prediction made *before* this roll occurred, along with its type
-        self.prediction_log.append((self.last_prediction_outcome, self.last_prediction_source, self.last_prediction_type)) 
+        # Score every module's prediction for this roll (made from the history *before* it).
+        module_hits = self._score_module_predictions(high_low)
+        self.online_weights.update(module_hits)
+        self.scoreboard.record(module_hits)
+        # Let incrementally learning modules see the new outcome.
+        self._observe(high_low)
+
+        # Record the roll together with the prediction made *before* it occurred, along with its type
+        self.current_node = self.tree.add(self.current_node, (die1, die2, die3),
+                                          (self.last_prediction_outcome, self.last_prediction_source, self.last_prediction_type),
+                                          module_hits, self.last_prediction_confidence, self.last_prediction_miss_streak)
+        self._checkpoint_weights()
 
         # Reset last_prediction_outcome and source/type for the next prediction cycle.
         self.last_prediction_outcome = None 
         self.last_prediction_source = None
         self.last_prediction_type = "none" # Reset to 'none' by default for the next cycle
+        self.last_prediction_confidence = None
+        self.last_prediction_miss_streak = 0
+        self.history_version += 1
+        self._record_in_ledger(self.current_node)
 
     def remove_last_roll(self):
-        """Removes the last roll from history and corresponding log entries."""
-        if not self.history.empty:
-            self.history = self.history.iloc[:-1]
-            if self.prediction_log: self.prediction_log.pop()
-            if self.result_log: self.result_log.pop()
+        """
+        Undoes the last roll in O(1): the current history moves back to its parent node and
+        every derived structure (weights, scoreboard, module state, pending prediction) is
+        rolled back. The roll stays in the tree, so redo_last_roll() can bring it back, and
+        rolls that had scrolled out of the 100-roll window come back into view. Modules only
+        keep undo_depth (1000) rolls of undo log; undoing past that rebuilds them from the
+        tree (_rebuild_modules), so their state always matches the current node.
+        """
+        node = self.current_node
+        if node == ROOT:
+            return
+        self.scoreboard.pop()
+        rebuild = not all(module.can_retract() for module in self.modules.values())
+        if not rebuild:
+            for module in self.modules.values():
+                module.retract()
+        parent = self.tree.parent(node)
+        self.tree.set_last_child(parent, node)
+        self.current_node = parent
+        if rebuild:
+            self._rebuild_modules()
+        self._restore_weights()
+        self.last_prediction_outcome, self.last_prediction_source, self.last_prediction_type = self.tree.prediction_entry(node)
+        self.last_prediction_confidence, self.last_prediction_miss_streak = self.tree.prediction_stats(node)
+        self.history_version += 1
+        if self.ledger is not None:
+            self.ledger.pop()
+        self._refill_scoreboard()
+
+    def _rebuild_modules(self):
+        """
+        Resets every module and shows it the current history again from the roll tree, for when
+        an undo goes deeper than some module's undo log. O(history) once, after which every
+        module can again retract its full undo_depth.
+        """
+        path = self.tree.ancestors(self.current_node, self.tree.depth(self.current_node))
+        dice = [self.tree.dice(node) for node in path]
+        history = classify_rolls([d[0] for d in dice], [d[1] for d in dice], [d[2] for d in dice])
+        for module in self.modules.values():
+            module.reset()
+        stacking = [module for module in self.modules.values() if module.uses_module_predictions]
+        for i, outcome in enumerate(history['HighLow'].tolist()):
+            before = history.iloc[max(0, i - self.HISTORY_LIMIT):i]
+            if stacking:
+                module_predictions = {name: module.predict(before) for name, module in self.modules.items()
+                                      if not module.uses_module_predictions}
+                for module in stacking:
+                    module.set_module_predictions(module_predictions)
+            for module in self.modules.values():
+                module.observe(before, outcome)
+
+    def redo_last_roll(self) -> bool:
+        """
+        Re-applies the roll that was last undone from the current history (or the branch that
+        was last followed from it). Returns False when there is nothing to redo.
+        """
+        child = self.tree.last_child(self.current_node)
+        if child < 0:
+            return False
+        module_hits = self.tree.module_hits(child)
+        high_low = self._high_low(*self.tree.dice(child))
+        self.online_weights.update(module_hits)
+        self.scoreboard.record(module_hits)
+        self._observe(high_low)
+        self.current_node = child
+        self._checkpoint_weights()
+        self.last_prediction_outcome = None
+        self.last_prediction_source = None
+        self.last_prediction_type = "none"
+        self.last_prediction_confidence = None
+        self.last_prediction_miss_streak = 0
+        self.history_version += 1
+        self._record_in_ledger(child)
+        return True
+
+    def checkout_node(self, node: int):
+        """
+        Switches to any node of the roll tree (e.g. another what-if branch) by undoing back to
+        the common ancestor and redoing down the other branch.
+        """
+        if not 0 <= node < len(self.tree):
+            raise ValueError(f"Unknown node {node}")
+        path_down = []
+        target = node
+        while self.tree.depth(target) > self.tree.depth(self.current_node):
+            path_down.append(target)
+            target = self.tree.parent(target)
+        while self.tree.depth(self.current_node) > self.tree.depth(target):
+            self.remove_last_roll()
+        while self.current_node != target:
+            self.remove_last_roll()
+            path_down.append(target)
+            target = self.tree.parent(target)
+        for child in reversed(path_down):
+            self.tree.set_last_child(self.current_node, child)
+            self.redo_last_roll()
+
+    def _refill_scoreboard(self):
+        """
+        The scoreboard only remembers the rolls it recorded; after enough undos, re-record the
+        window from the tree (amortized O(1) per undo: it happens every window/2 undos at most).
+        """
+        wanted = min(self.scoreboard.window, self.tree.depth(self.current_node))
+        if self.scoreboard.available >= min(wanted, self.scoreboard.window // 2):
+            return
+        self.scoreboard.reset()
+        for node in self.tree.ancestors(self.current_node, wanted):
+            self.scoreboard.record(self.tree.module_hits(node))
+
+    def open_ledger(self, file_path: Optional[str] = None, flush_every: int = 1) -> PredictionLedger:
+        """
+        Starts recording every settled prediction in a PredictionLedger (appended to file_path,
+        if given, so it survives restarts). Rolls already in the history are not back-filled.
+        """
+        self.ledger = PredictionLedger(list(self.modules.keys()), file_path, flush_every=flush_every)
+        return self.ledger
+
+    def _record_in_ledger(self, node: int):
+        if self.ledger is None:
+            return
+        prediction, source, prediction_type = self.tree.prediction_entry(node)
+        confidence, miss_streak = self.tree.prediction_stats(node)
+        self.ledger.append(prediction, source, prediction_type, confidence, miss_streak,
+                           self._high_low(*self.tree.dice(node)), self.history_version)
 
     def reset_history(self):
         """Clears all history and resets the oracle's state."""
-        self.history = pd.DataFrame(columns=['Die1', 'Die2', 'Die3', 'Total', 'HighLow', 'OddEven', 'Triplet'])
+        self.tree = RollTree(list(self.modules.keys()))
+        self.current_node = ROOT
+        self._weight_checkpoints = {}
         self.last_prediction_outcome = None
         self.last_prediction_source = None
         self.last_prediction_type = "none"
-        self.prediction_log.clear()
-        self.result_log.clear()
+        self.last_prediction_confidence = None
+        self.last_prediction_miss_streak = 0
+        self.online_weights.reset()
+        self.scoreboard.reset()
+        for module in self.modules.values():
+            module.reset()
+        self.history_version += 1
+
+    def fork(self) -> "SicBoOracle":
+        """
+        Returns an independent oracle that starts from this one's state, sharing what it can.
+        The roll tree, module tables and learned module state are shared copy-on-write, so a
+        fork only pays memory for its own rolls.
+        """
+        clone = copy.copy(self)
+        clone.tree = self.tree.fork()
+        clone._weight_checkpoints = dict(self._weight_checkpoints)
+        clone.modules = {name: module.fork() for name, module in self.modules.items()}
+        clone.online_weights = copy.deepcopy(self.online_weights)
+        clone.scoreboard = copy.deepcopy(self.scoreboard)
+        clone._module_predictions_cache = None
+        clone.ledger = None # A fork's rolls are not the table's; it can open its own ledger.
+        return clone
+
+    def to_snapshot(self, compress: bool = True) -> bytes:
+        """
+        Serializes the complete oracle state (history, logs, pending prediction, module,
+        weight and scoreboard state) into a versioned binary snapshot.
+        Restoring it with from_snapshot() is a single deserialization, not a replay of add_roll.
+
+        Args:
+            compress (bool): zlib-compress the payload (mostly-empty count tables shrink a lot).
+        """
+        state = dict(self.__dict__)
+        state["_module_predictions_cache"] = None
+        state["_views_cache"] = None
+        state["ledger"] = None # The ledger lives in its own file.
+        payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        flags = 0
+        if compress:
+            payload = zlib.compress(payload, 1)
+            flags |= _SNAPSHOT_FLAG_ZLIB
+        return _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, flags) + payload
+
+    @classmethod
+    def from_snapshot(cls, data: bytes) -> "SicBoOracle":
+        """
+        Rebuilds an oracle from bytes produced by to_snapshot().
+        Snapshots are pickles: only load files this application wrote itself.
+        """
+        if len(data) < _SNAPSHOT_HEADER.size:
+            raise ValueError("Not a SicBoOracle snapshot (too short).")
+        magic, version, flags = _SNAPSHOT_HEADER.unpack_from(data)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError("Not a SicBoOracle snapshot (bad magic).")
+        if version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} (expected {SNAPSHOT_FORMAT_VERSION}).")
+        payload = memoryview(data)[_SNAPSHOT_HEADER.size:]
+        if flags & _SNAPSHOT_FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        oracle = cls.__new__(cls)
+        oracle.__dict__.update(pickle.loads(payload))
+        return oracle
+
+    def save_snapshot(self, file_path: str, compress: bool = True):
+        """Writes a snapshot to file_path atomically (a crash never leaves a half-written checkpoint)."""
+        directory = os.path.dirname(file_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_snapshot(compress=compress))
+        os.replace(tmp_path, file_path)
+
+    @classmethod
+    def load_snapshot(cls, file_path: str) -> "SicBoOracle":
+        """Loads an oracle from a file written by save_snapshot()."""
+        with open(file_path, "rb") as f:
+            return cls.from_snapshot(f.read())
+
+    @staticmethod
+    def _module_hit(name: str, pred: Optional[SicBoOutcome], actual_outcome: SicBoOutcome) -> Optional[bool]:
+        """
+        Decides whether a module's prediction counts for a roll and whether it was a hit.
+        'ทำนายไฮโล' is only rewarded for a correct 'ไฮโล'; the other modules are judged on
+        High/Low and skip rolls that came out 'ตอง' or 'ไฮโล'.
+        """
+        if pred is None:
+            return None
+        if name == "ทำนายไฮโล":
+            return pred == actual_outcome == 'ไฮโล'
+        if actual_outcome in ['ตอง', 'ไฮโล']:
+            return None
+        return pred == actual_outcome
+
+    def _current_module_predictions(self) -> Dict[str, Optional[SicBoOutcome]]:
+        """Returns every module's prediction for the current history, cached per history version."""
+        if self._module_predictions_cache is not None and self._module_predictions_cache[0] == self.history_version:
+            return self._module_predictions_cache[1]
+        history = self.history
+        module_predictions = {name: module.predict(history) for name, module in self.modules.items()
+                              if not module.uses_module_predictions}
+        base_predictions = dict(module_predictions)
+        for name, module in self.modules.items():
+            if module.uses_module_predictions:
+                module.set_module_predictions(base_predictions)
+                module_predictions[name] = module.predict(history)
+        # Read right after the predict() calls they describe.
+        module_signals = {name: module.confidence_signal() for name, module in self.modules.items()}
+        self._module_predictions_cache = (self.history_version, module_predictions,
+                                          {name: signal for name, signal in module_signals.items() if signal is not None})
+        return module_predictions
+
+    def get_module_signals(self) -> Dict[str, Tuple[str, float]]:
+        """
+        Each module's own confidence in its prediction for the current history
+        (BasePredictor.confidence_signal), for the modules that report one.
+        """
+        self._current_module_predictions()
+        return self._module_predictions_cache[2]
+
+    def _observe(self, outcome: SicBoOutcome):
+        """Shows a new roll to every module (self.history is still the history *before* it)."""
+        stacking = [module for module in self.modules.values() if module.uses_module_predictions]
+        if stacking:
+            module_predictions = self._current_module_predictions()
+            for module in stacking:
+                module.set_module_predictions(module_predictions)
+        for module in self.modules.values():
+            module.observe(self.history, outcome)
+
+    def _score_module_predictions(self, actual_outcome: SicBoOutcome) -> Dict[str, Optional[bool]]:
+        """Scores the modules' predictions for the current history against the roll that just happened."""
+        if len(self.history) < self.min_history_for_prediction:
+            return {}
+        module_predictions = self._current_module_predictions()
+        return {name: self._module_hit(name, pred, actual_outcome) for name, pred in module_predictions.items()}
 
     def get_module_accuracies(self) -> Dict[str, float]:
         """
         Calculates the accuracy (win rate) for each individual prediction module
-        based on the historical data.
+        over the current history, from the hit/miss recorded for every roll when it
+        was added (module_hit_log). These are the predictions the modules really made,
+        so modules that learn through observe() are never scored on rolls they have
+        already seen.
         """
-        accuracies = {}
-        for name, module in self.modules.items():
-            wins = 0
-            total_predictions = 0
-            for i in range(self.min_history_for_prediction, len(self.history)):
-                pred = module.predict(self.history.iloc[:i]) 
-                actual_outcome = self.history.iloc[i]['HighLow']
-
-                if name == "ทำนายไฮโล":
-                    if pred is not None:
-                        total_predictions += 1
-                        if pred == actual_outcome == 'ไฮโล':
-                            wins += 1
-                else: 
-                    if pred is not None and actual_outcome not in ['ตอง', 'ไฮโล']: 
-                        total_predictions += 1
-                        if pred == actual_outcome:
-                            wins += 1
-            
-            accuracies[name] = (wins / total_predictions * 100) if total_predictions else 0
-        return accuracies
+        wins = dict.fromkeys(self.modules, 0)
+        total_predictions = dict.fromkeys(self.modules, 0)
+        for module_hits in self.module_hit_log:
+            for name, hit in module_hits.items():
+                if hit is not None:
+                    total_predictions[name] += 1
+                    if hit:
+                        wins[name] += 1
+        return {name: (wins[name] / total_predictions[name] * 100) if total_predictions[name] else 0
+                for name in self.modules}
 
     def get_normalized_module_weights(self) -> Dict[str, float]:
         """
         Normalizes module accuracies to be used as weights in the ConfidenceScorer.
+        In "online" mode the decayed hit rates are used, in "accuracy" mode get_module_accuracies().
         """
-        accuracies = self.get_module_accuracies()
+        if self.weighting_mode == "online":
+            accuracies = self.online_weights.hit_rates()
+        else:
+            accuracies = self.get_module_accuracies()
         if not accuracies:
             return {name: 1.0 for name in self.modules.keys()} 
         
@@ -164,45 +659,90 @@ class SicBoOracle:
     
     def get_best_recent_module(self, lookback: int = 10) -> Optional[str]:
         """
-        Identifies the best performing module based on recent history.
-        Filters history for non-'ตอง' and non-'ไฮโล' High/Low outcomes for H/L modules.
-        Evaluates HiLoPredictor separately.
+        Identifies the best performing module over the last `lookback` rolls.
+        Reads the scoreboard of real per-roll hits/misses (same rules as get_module_accuracies),
+        so no module is re-run over past history.
         """
-        modules = self.modules
-        scores = {}
-        
-        filtered_highlow_history = self.history[self.history['HighLow'].isin(['สูง', 'ต่ำ'])].copy()
-        
         if len(self.history) < lookback + self.min_history_for_prediction: 
             return None
+        return self.scoreboard.best_module(lookback)
 
-        for name, module in modules.items():
-            wins, total = 0, 0
-            
-            if name == "ทำนายไฮโล":
-                for i in range(len(self.history) - lookback, len(self.history)):
-                    if i < self.min_history_for_prediction: continue
-                    pred = module.predict(self.history.iloc[:i])
-                    actual = self.history.iloc[i]['HighLow']
-                    if pred is not None:
-                        total += 1
-                        if pred == actual == 'ไฮโล':
-                            wins += 1
-            else:
-                for i in range(len(filtered_highlow_history) - lookback, len(filtered_highlow_history)):
-                    if i < self.min_history_for_prediction: continue 
-                    pred = module.predict(filtered_highlow_history.iloc[:i]) 
-                    actual = filtered_highlow_history.iloc[i]['HighLow']
-
-                    if pred is not None:
-                        total += 1
-                        if pred == actual:
-                            wins += 1
-            
-            if total > 0:
-                scores[name] = wins / total
-        
-        return max(scores, key=scores.get) if scores else None
+    def predict_markets(self, market_weights: Optional[Dict[str, Dict[str, float]]] = None
+                        ) -> Dict[str, Tuple[Optional[SicBoOutcome], Optional[str], Optional[int]]]:
+        """
+        Returns the aggregated module prediction for every market (สูง/ต่ำ, ไฮโล, ตอง, คู่/คี่, แต้มรวม)
+        from one pass over the cached module predictions; see ConfidenceScorer.score_markets.
+        Unlike predict_next_outcome this has no side effects and does not apply recovery rules.
+        """
+        if len(self.history) < self.min_history_for_prediction:
+            return {}
+        return self.scorer.score_markets(self._current_module_predictions(), self.get_normalized_module_weights(),
+                                         market_weights)
+
+    def lookahead(self, depth: int = 1) -> dict:
+        """
+        What-if tree: what the oracle would predict after each possible next roll, to `depth` rolls.
+        The built-in modules only read the HighLow and OddEven columns, so the 216 dice outcomes
+        fall into 6 classes (see LOOKAHEAD_CLASSES / DICE_CLASSES) that lead to identical
+        predictions; each class is evaluated once, with its probability over the 216 outcomes.
+        Branches are explored in place on the roll tree (add a roll, predict, undo), so the
+        common prefix is never copied, and every node's module predictions and views are
+        cached so they are not recomputed when the walk comes back to it. The oracle is left
+        exactly as it was, scoreboard window included (it is saved and put back, since undo
+        cannot restore the rolls the what-if rolls pushed out of it).
+
+        Args:
+            depth (int): Number of future rolls to explore (6**depth branches).
+
+        Returns:
+            dict: {"prediction", "source", "confidence", "pattern", "miss_streak", "type",
+            "probability" (of reaching this node), "children": {class label: node}} for the current
+            state; leaf nodes have no "children".
+        """
+        saved_prediction = (self.last_prediction_outcome, self.last_prediction_source, self.last_prediction_type,
+                            self.last_prediction_confidence, self.last_prediction_miss_streak)
+        start_node = self.current_node
+        redo_child = self.tree.last_child(start_node)
+        tree_size = len(self.tree)
+        # Each what-if roll pushes the oldest roll out of a full scoreboard, and undo cannot bring it back.
+        scoreboard = copy.deepcopy(self.scoreboard)
+        ledger, self.ledger = self.ledger, None # What-if rolls are never recorded.
+        try:
+            return self._lookahead_node(depth, 1.0, {})
+        finally:
+            # Drop the what-if rolls and everything derived from them.
+            while self.current_node != start_node:
+                self.remove_last_roll()
+            self.tree.truncate(tree_size)
+            self.tree.set_last_child(start_node, redo_child)
+            for node in [node for node in self._weight_checkpoints if node >= tree_size]:
+                del self._weight_checkpoints[node]
+            self.scoreboard = scoreboard
+            (self.last_prediction_outcome, self.last_prediction_source, self.last_prediction_type,
+             self.last_prediction_confidence, self.last_prediction_miss_streak) = saved_prediction
+            self.ledger = ledger
+
+    def _lookahead_node(self, depth: int, probability: float, node_cache: Dict[int, tuple]) -> dict:
+        prediction, source, confidence, pattern, miss_streak = self.predict_next_outcome()
+        result = {"prediction": prediction, "source": source, "confidence": confidence, "pattern": pattern,
+                  "miss_streak": miss_streak, "type": self.last_prediction_type, "probability": probability}
+        if depth <= 0:
+            return result
+        node = self.current_node
+        node_cache[node] = (self._module_predictions_cache[1:] if self._module_predictions_cache else None,
+                            self._views_cache[1] if self._views_cache else None)
+        result["children"] = {}
+        for label, outcomes in LOOKAHEAD_CLASSES.items():
+            self.add_roll(*outcomes[0])
+            result["children"][label] = self._lookahead_node(depth - 1, probability * len(outcomes) / 216, node_cache)
+            self.remove_last_roll()
+            # Back at `node`: its module predictions and views are still valid.
+            predictions_and_signals, views = node_cache[node]
+            if predictions_and_signals is not None:
+                self._module_predictions_cache = (self.history_version, *predictions_and_signals)
+            if views is not None:
+                self._views_cache = (self.history_version, views)
+        return result
 
     def predict_next_outcome(self) -> Tuple[Optional[SicBoOutcome], Optional[str], Optional[int], Optional[str], int]:
         """
@@ -217,6 +757,8 @@ class SicBoOracle:
             self.last_prediction_outcome = None
             self.last_prediction_source = None
             self.last_prediction_type = "none" 
+            self.last_prediction_confidence = None
+            self.last_prediction_miss_streak = current_miss_streak
             return None, None, None, f"⚠️ รอข้อมูลครบ {self.min_history_for_prediction} ตา ก่อนเริ่มทำนาย", 0
 
         # Filter history for non-'ตอง' and non-'ไฮโล' High/Low outcomes for prediction readiness count
@@ -225,69 +767,35 @@ class SicBoOracle:
         low_count = filtered_highlow_history_for_count.count("ต่ำ")
 
         # "wait" condition: if not enough non-special outcome history or long miss streak
-        if (high_count + low_count) < self.min_non_special_outcome_history_for_prediction or current_miss_streak >= 6:
+        if (high_count + low_count) < self.min_non_special_outcome_history_for_prediction or current_miss_streak >= self.stop_miss_streak:
             self.last_prediction_outcome = None
             self.last_prediction_source = None
             self.last_prediction_type = "none" 
+            self.last_prediction_confidence = None
+            self.last_prediction_miss_streak = current_miss_streak
             return None, None, None, f"⏳ กำลังวิเคราะห์ข้อมูล หรือยังไม่พบรูปแบบที่ชัดเจน (ต้องการ สูง/ต่ำ ที่ไม่ใช่ตอง/ไฮโล อย่างน้อย {self.min_non_special_outcome_history_for_prediction} ตา)", current_miss_streak
 
-        module_predictions = {}
-        for name, module in self.modules.items():
-            module_predictions[name] = module.predict(self.history)
+        module_predictions = self._current_module_predictions()
 
         weights = self.get_normalized_module_weights()
 
-        final_pred: Optional[SicBoOutcome] = None
-        source: Optional[str] = None
-        confidence: Optional[int] = None
-        pattern: Optional[str] = None # pattern is initialized here
-
-        prediction_type: Literal["normal", "recovery"] = "normal" # Default to normal
-
-        # Check for a strong 'ไฮโล' prediction first
-        hilo_pred = module_predictions.get("ทำนายไฮโล")
-        if hilo_pred == "ไฮโล" and weights.get("ทำนายไฮโล", 0) > 0.7: 
-            final_pred = "ไฮโล"
-            source = "ทำนายไฮโล"
-            confidence = min(int(weights.get("ทำนายไฮโล", 0.5) * 100), 95)
-            pattern = None # Pattern is explicitly set to None here if HiLo is predicted
-        else:
-            # Otherwise, use the scorer for High/Low prediction
-            final_pred, source, confidence, pattern = self.scorer.score(module_predictions, weights, self.history)
-            # Here, 'pattern' is assigned the result from scorer._extract_dominant_pattern
-
-        # Baccarat-inspired "recovery" logic: if on a miss streak, try to use the best recent module
-        # This recovery logic will now also consider 'ทำนายไฮโล' if it's the best recent module.
-        if current_miss_streak in [3, 4, 5]:
-            prediction_type = "recovery" # Set type to recovery if in this state
-            recovery_modules_order = ["Smart", "สไนเปอร์", "ทำนายไฮโล", "เทรนด์ H/L", "รูปแบบ H/L", "รูปแบบ 2-2", "กฎพื้นฐาน"]
-            
-            for mod_name in recovery_modules_order:
-                if mod_name in module_predictions and module_predictions[mod_name] is not None:
-                    if module_predictions[mod_name] == "ไฮโล":
-                        final_pred = "ไฮโล"
-                        source = f"{mod_name}-Recovery"
-                        confidence = min(int(weights.get(mod_name, 0.5) * 100 * 1.2), 95)
-                        pattern = None # Pattern is explicitly set to None here
-                        break
-                    elif module_predictions[mod_name] in ["สูง", "ต่ำ"]:
-                        final_pred = module_predictions[mod_name]
-                        source = f"{mod_name}-Recovery"
-                        confidence = min(int(weights.get(mod_name, 0.5) * 100 * 1.2), 95) 
-                        # Pattern is *not* explicitly set to None here.
-                        # This means if the 'else' branch (scorer.score) set 'pattern' to "LHLH",
-                        # and then recovery takes over with a H/L prediction, the 'pattern' variable
-                        # from the scorer.score call might persist.
-                        # However, 'final_pred' is correctly assigned the outcome.
-
-                        break 
+        final_pred, source, confidence, pattern, prediction_type = decide_prediction(
+            module_predictions, weights,
+            self.scorer.score(module_predictions, weights, self.history),
+            current_miss_streak,
+            self.get_best_recent_module() if current_miss_streak in self.recovery_miss_streaks else None,
+            hilo_weight_threshold=self.hilo_weight_threshold,
+            recovery_miss_streaks=self.recovery_miss_streaks,
+            recovery_confidence_multiplier=self.recovery_confidence_multiplier,
+        )
 
         # Store the final prediction made by the oracle for the next add_roll cycle
         self.last_prediction_outcome = final_pred
         self.last_prediction_source = source
         self.last_prediction_type = prediction_type # Store the determined prediction type
+        self.last_prediction_confidence = confidence
+        self.last_prediction_miss_streak = current_miss_streak
         
-        print(f"DEBUG: predict_next_outcome - final_pred: {final_pred}, source: {source}, confidence: {confidence}, pattern: {pattern}")
         return final_pred, source, confidence, pattern, current_miss_streak
 
     def _calculate_miss_streak(self) -> int:
@@ -297,15 +805,12 @@ class SicBoOracle:
         - 'normal' predictions: hit resets streak, miss increments.
         - 'recovery' predictions: hit does NOT reset streak, miss increments.
         """
-        print(f"DEBUG: _calculate_miss_streak called. Current prediction_log length: {len(self.prediction_log)}")
         streak = 0
         # Iterate backwards through prediction_log and result_log simultaneously.
-        for i, (log_entry, actual_outcome) in enumerate(zip(reversed(self.prediction_log), reversed(self.result_log))):
+        for log_entry, actual_outcome in zip(reversed(self.prediction_log), reversed(self.result_log)):
             pred_outcome, _, prediction_type = log_entry # Unpack prediction_type
-            print(f"DEBUG: Processing round {len(self.prediction_log) - 1 - i}: Pred={pred_outcome}, Actual={actual_outcome}, Type={prediction_type}")
 
             if prediction_type == "none":
-                print("DEBUG:   Skipping 'none' prediction type.")
                 continue # Skip rounds where no prediction was made
 
             # If a prediction was made (normal or recovery)
@@ -313,22 +818,15 @@ class SicBoOracle:
                 # Special outcomes ('ตอง') are always skipped if actual.
                 # If the prediction was H/L, and actual was 'ตอง' or 'ไฮโล', it's a special case, not a miss or win for H/L streak.
                 if pred_outcome in ["สูง", "ต่ำ"] and actual_outcome in ["ตอง", "ไฮโล"]:
-                    print("DEBUG:   Skipping H/L prediction vs Triplet/HiLo actual (special case).")
                     continue 
                 
                 if pred_outcome != actual_outcome:
                     streak += 1 # Miss: increment streak
-                    print(f"DEBUG:   Miss! Streak incremented to {streak}.")
                 else: # Hit: Check prediction type to decide if streak resets
-                    print(f"DEBUG:   Hit! Prediction Type: {prediction_type}")
                     if prediction_type == "normal":
-                        print("DEBUG:   Normal hit. Resetting streak and breaking.")
                         break # Reset streak on normal win
                     else: # prediction_type == "recovery" and it was a win
-                        print("DEBUG:   Recovery hit. Not resetting streak, continuing to look back.")
                         continue # Do not reset streak, but also do not increment. Just pass through.
             else: # This case should ideally not be reached if pred_outcome is always one of the SicBoOutcome types
-                print(f"DEBUG:   Unexpected prediction outcome: {pred_outcome}. Skipping.")
                 continue
-        print(f"DEBUG: _calculate_miss_streak returning {streak}")
         return streak
@@ -0,0 +1,315 @@
+# src/window_index.py
+import os
+import json
+import shutil
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from archive import RollArchive
+from pattern_mining import highlow_codes
+from prediction_modules.base_predictor import HIGHLOW_OUTCOMES, HIGHLOW_CODES
+
+# Windows are runs of k consecutive 'HighLow' outcomes (ตอง included), keyed in base 4 with the
+# oldest outcome as the most significant digit, so a length-12 key still fits in uint32.
+WINDOW_INDEX_FORMAT_VERSION = 1
+DEFAULT_MAX_LENGTH = 12
+_N_OUTCOMES = len(HIGHLOW_OUTCOMES)
+_MANIFEST = "manifest.json"
+_LOAD_ATTEMPTS = 3 # Manifest reads when its generation was removed by concurrent updates.
+
+class WindowStats(NamedTuple):
+    """What came next after one window of outcomes, over every indexed table."""
+    window: Tuple[str, ...]   # The k outcomes, oldest first.
+    counts: Dict[str, int]    # Next outcome -> how many times it followed the window.
+    total: int
+
+    def probabilities(self) -> Dict[str, float]:
+        """Share of each next outcome (all 0.0 if the window never occurred)."""
+        return {outcome: count / self.total if self.total else 0.0 for outcome, count in self.counts.items()}
+
+def _encode(codes: Sequence[int]) -> int:
+    key = 0
+    for code in codes:
+        key = key * _N_OUTCOMES + int(code)
+    return key
+
+def _window_counts(codes: np.ndarray, n_new: int, max_length: int) -> List[Optional[np.ndarray]]:
+    """
+    Flat (window key * 4 + next outcome) values of the windows followed by the last n_new rolls of
+    `codes`, for k = 1..max_length; the earlier rolls are only context. Index 0 is unused.
+    """
+    codes = codes.astype(np.int64)
+    targets = np.arange(len(codes) - n_new, len(codes))
+    keys = np.zeros(len(targets), dtype=np.int64)
+    flats: List[Optional[np.ndarray]] = [None]
+    for k in range(1, max_length + 1):
+        valid = targets >= k
+        # Prepending the next-older outcome adds it as the new most significant digit.
+        keys[valid] += codes[targets[valid] - k] * _N_OUTCOMES ** (k - 1)
+        flats.append(keys[valid] * _N_OUTCOMES + codes[targets[valid]])
+    return flats
+
+def _merge(keys: np.ndarray, counts: np.ndarray, flat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Adds flat window/next-outcome observations to a sorted (keys, counts[n, 4]) table."""
+    values, value_counts = np.unique(flat, return_counts=True)
+    new_keys, rows = np.unique(values // _N_OUTCOMES, return_inverse=True)
+    new_counts = np.zeros((len(new_keys), _N_OUTCOMES), dtype=np.int64)
+    new_counts[rows, values % _N_OUTCOMES] = value_counts
+    merged, inverse = np.unique(np.concatenate([keys.astype(np.int64), new_keys]), return_inverse=True)
+    merged_counts = np.zeros((len(merged), _N_OUTCOMES), dtype=np.int64)
+    merged_counts[inverse[:len(keys)]] += counts # Both sides hold each key once, so no index repeats.
+    merged_counts[inverse[len(keys):]] += new_counts
+    return merged.astype(np.uint32), merged_counts
+
+class WindowIndex:
+    """
+    Inverted index from every length-k window of outcomes (k = 1..max_length) seen in the roll
+    archive to how often each outcome came next, summed over all tables.
+
+    Each table's partitions are read as one continuous stream in date order, so windows run across
+    day boundaries. For each k the index stores the sorted window keys and their next-outcome
+    counts as .npy files that are memory-mapped on load: a query is one binary search
+    (np.searchsorted) in the keys of its length, whatever the size of the archive, and only the
+    pages it touches are read from disk.
+
+    update() indexes only what was added to the archive since the last update (new dates, and new
+    rows of each table's latest indexed date) and publishes the result as a new generation
+    directory behind an atomically replaced manifest, so readers keep answering from the old
+    files until they call refresh().
+    """
+    def __init__(self, root: str = 'data/window_index', max_length: Optional[int] = None):
+        """
+        Args:
+            root (str): Index directory. It does not have to exist yet: the index is empty until
+                the first update().
+            max_length (int): Longest window to index when creating a new index
+                (default DEFAULT_MAX_LENGTH). An existing index keeps the length it was built
+                with; asking for a different one raises ValueError.
+        """
+        self.root = root
+        self.max_length = max_length if max_length is not None else DEFAULT_MAX_LENGTH
+        self.manifest: Dict = {}
+        self._manifest_mtime: Optional[int] = None
+        # Per length k: (sorted window keys, next-outcome counts). Replaced as a whole by _load(),
+        # so a query racing a refresh() sees one generation or the other, never a mix.
+        self._windows: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._load()
+        if max_length is not None and max_length != self.max_length:
+            raise ValueError(f"{root} indexes windows up to {self.max_length}, not {max_length}; rebuild it in a new directory")
+
+    @property
+    def rolls(self) -> int:
+        """Rolls indexed so far."""
+        return self.manifest.get("rolls", 0)
+
+    def _empty_manifest(self) -> Dict:
+        return {"version": WINDOW_INDEX_FORMAT_VERSION, "max_length": self.max_length, "generation": 0,
+                "rolls": 0, "tables": {}}
+
+    def _load(self):
+        manifest_path = os.path.join(self.root, _MANIFEST)
+        if not os.path.exists(manifest_path):
+            self.manifest = self._empty_manifest()
+            self._windows = [(np.zeros(0, dtype=np.uint32), np.zeros((0, _N_OUTCOMES), dtype=np.int64))
+                             for _ in range(self.max_length + 1)]
+            return
+        for attempt in range(_LOAD_ATTEMPTS):
+            mtime = os.stat(manifest_path).st_mtime_ns
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != WINDOW_INDEX_FORMAT_VERSION:
+                raise ValueError(f"Unsupported window index version {manifest.get('version')}")
+            directory = os.path.join(self.root, f"gen-{manifest['generation']}")
+            try:
+                # Plain ndarray views of the memmaps: same pages, without np.memmap's per-call overhead.
+                windows = [(np.zeros(0, dtype=np.uint32), np.zeros((0, _N_OUTCOMES), dtype=np.int64))]
+                for k in range(1, manifest["max_length"] + 1):
+                    windows.append(tuple(np.load(os.path.join(directory, f"k{k:02d}_{part}.npy"), mmap_mode='r').view(np.ndarray)
+                                         for part in ("keys", "counts")))
+            except FileNotFoundError:
+                # Two updates landed between reading the manifest and opening its generation, so
+                # it was already removed: read the newer manifest and try again.
+                if attempt == _LOAD_ATTEMPTS - 1:
+                    raise
+                continue
+            self.manifest, self.max_length, self._manifest_mtime = manifest, manifest["max_length"], mtime
+            self._windows = windows
+            return
+
+    def refresh(self) -> bool:
+        """Switches to the newest published generation if another process updated the index. Returns True if it did."""
+        manifest_path = os.path.join(self.root, _MANIFEST)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._manifest_mtime:
+            return False
+        self._load()
+        return True
+
+    def query(self, window: Sequence[str]) -> WindowStats:
+        """
+        How often each outcome followed `window` (1 to max_length 'HighLow' outcomes, oldest first).
+        A window that never occurred returns zero counts.
+        """
+        k = len(window)
+        if not 1 <= k <= self.max_length:
+            raise ValueError(f"Window length must be 1-{self.max_length}, got {k}")
+        try:
+            key = _encode(HIGHLOW_CODES[outcome] for outcome in window)
+        except KeyError as e:
+            raise ValueError(f"Unknown outcome {e.args[0]!r}; expected one of {HIGHLOW_OUTCOMES}") from None
+        keys, counts = self._windows[k]
+        position = int(np.searchsorted(keys, np.uint32(key))) # Same dtype as the keys, or numpy would cast them all.
+        if position < len(keys) and keys[position] == key:
+            row = counts[position].tolist()
+        else:
+            row = [0] * _N_OUTCOMES
+        return WindowStats(tuple(window), dict(zip(HIGHLOW_OUTCOMES, row)), sum(row))
+
+    def next_outcomes(self, recent: Sequence[str], max_length: Optional[int] = None) -> List[WindowStats]:
+        """
+        Stats for the windows ending at the newest roll of `recent`, shortest first.
+
+        Args:
+            recent (Sequence[str]): Recent 'HighLow' outcomes, oldest first, e.g.
+                snapshot.history['HighLow'] of a SharedOracle snapshot.
+            max_length (int): Longest window to look up (default: the index's max_length).
+        """
+        longest = min(len(recent), self.max_length if max_length is None else max_length)
+        recent = list(recent)[len(recent) - longest:]
+        return [self.query(recent[longest - k:]) for k in range(1, longest + 1)]
+
+    def longest_match(self, recent: Sequence[str], min_total: int = 30) -> Optional[WindowStats]:
+        """The longest window ending at the newest roll of `recent` that was followed at least min_total times."""
+        for stats in reversed(self.next_outcomes(recent)):
+            if stats.total >= min_total:
+                return stats
+        return None
+
+    def update(self, archive_root: str = 'data/archive', tables: Optional[List[str]] = None,
+               flush_rolls: int = 2_000_000) -> int:
+        """
+        Indexes the rolls added to a RollArchive since the last update.
+
+        Rows are taken in RoundId order within each (table, date) partition. A table's dates
+        before its latest indexed date are assumed complete; rows backfilled into them are not
+        picked up (build a new index for that).
+
+        Args:
+            archive_root (str): RollArchive root directory.
+            tables (List[str]): Only these tables (default: all).
+            flush_rolls (int): Rolls buffered before they are folded into the tables; bounds
+                memory (about 100 bytes per buffered roll at max_length 12).
+
+        Returns:
+            int: Number of rolls added.
+        """
+        manifest = json.loads(json.dumps(self.manifest)) # Copy: readers keep the published one.
+        archive = RollArchive(archive_root)
+        keys = [window_keys for window_keys, _ in self._windows]
+        counts = [window_counts for _, window_counts in self._windows]
+        pending: List[List[np.ndarray]] = [[] for _ in range(self.max_length + 1)]
+        pending_rolls = added = 0
+
+        def flush():
+            for k in range(1, self.max_length + 1):
+                if pending[k]:
+                    keys[k], counts[k] = _merge(keys[k], counts[k], np.concatenate(pending[k]))
+                    pending[k] = []
+
+        for table, date in sorted(archive.partitions(), key=lambda partition: (partition[0], partition[1])):
+            if tables is not None and table not in tables:
+                continue
+            state = manifest["tables"].setdefault(table, {"date": None, "rows": 0, "tail": []})
+            if state["date"] is not None and date < state["date"]:
+                continue
+            rolls = archive.scan(columns=['RoundId', 'Die1', 'Die2', 'Die3'], tables=[table],
+                                 start_date=date, end_date=date).sort_values('RoundId')
+            skip = state["rows"] if date == state["date"] else 0
+            new = highlow_codes(rolls['Die1'].to_numpy(), rolls['Die2'].to_numpy(), rolls['Die3'].to_numpy())[skip:]
+            state["date"], state["rows"] = date, len(rolls)
+            if not len(new):
+                continue
+            codes = np.concatenate([np.asarray(state["tail"], dtype=np.uint8), new])
+            for k, flat in enumerate(_window_counts(codes, len(new), self.max_length)):
+                if flat is not None and len(flat):
+                    pending[k].append(flat)
+            state["tail"] = codes[-self.max_length:].tolist()
+            added += len(new)
+            pending_rolls += len(new)
+            if pending_rolls >= flush_rolls:
+                flush()
+                pending_rolls = 0
+        flush()
+        if not added and os.path.exists(os.path.join(self.root, _MANIFEST)):
+            return 0
+
+        manifest["rolls"] += added
+        manifest["generation"] += 1
+        directory = os.path.join(self.root, f"gen-{manifest['generation']}")
+        os.makedirs(directory, exist_ok=True)
+        for k in range(1, self.max_length + 1):
+            np.save(os.path.join(directory, f"k{k:02d}_keys.npy"), keys[k])
+            np.save(os.path.join(directory, f"k{k:02d}_counts.npy"), counts[k])
+        temporary = os.path.join(self.root, _MANIFEST + ".tmp")
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+        os.replace(temporary, os.path.join(self.root, _MANIFEST))
+        # The previous generation stays for one more update, so a reader that read the old manifest
+        # can still open its files; older ones go. Readers that still map a removed generation
+        # keep their pages after the files are unlinked.
+        keep = {f"gen-{manifest['generation']}", f"gen-{manifest['generation'] - 1}"}
+        for name in os.listdir(self.root):
+            if name.startswith("gen-") and name not in keep:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+        self._load()
+        return added
+
+# Example usage (for building and querying from the command line)
+if __name__ == "__main__":
+    import time
+    import random
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description="Build or update the archive's window index and query it.")
+    parser.add_argument("--archive", default=None, help="RollArchive root (a simulated archive if omitted)")
+    parser.add_argument("--index", default=None, help="index directory (a temporary one with the simulated archive)")
+    parser.add_argument("--tables", nargs="+", default=None)
+    parser.add_argument("--max-length", type=int, default=None)
+    parser.add_argument("--simulate", type=int, default=1_000_000, help="rolls per simulated table and day")
+    parser.add_argument("--query", nargs="+", default=None, help="recent outcomes, oldest first, e.g. สูง ต่ำ ต่ำ")
+    args = parser.parse_args()
+
+    workdir = None
+    if args.archive is None:
+        from sicbo_oracle import classify_rolls
+        workdir = tempfile.mkdtemp(prefix="sicbo-window-index-")
+        args.archive, args.index = os.path.join(workdir, "archive"), os.path.join(workdir, "index")
+        simulated = RollArchive(args.archive)
+        for table in ("A", "B"):
+            for date in ("2026-01-01", "2026-01-02"):
+                dice = np.random.default_rng(random.randrange(2 ** 32)).integers(1, 7, size=(3, args.simulate), dtype=np.uint8)
+                rolls = classify_rolls(dice[0], dice[1], dice[2])
+                rolls['RoundId'] = np.arange(args.simulate)
+                simulated.append(rolls, table, date)
+    index = WindowIndex(args.index or os.path.join("data", "window_index"), args.max_length)
+
+    started = time.perf_counter()
+    added = index.update(args.archive, args.tables)
+    print(f"Indexed {added:,} new rolls in {time.perf_counter() - started:.1f}s ({index.rolls:,} in total)")
+    for k in range(1, index.max_length + 1):
+        print(f"  k={k:2d}: {len(index._windows[k][0]):,} distinct windows")
+
+    recent = args.query or [random.choice(HIGHLOW_OUTCOMES[:2]) for _ in range(index.max_length)]
+    queries = 10_000
+    started = time.perf_counter()
+    for _ in range(queries):
+        index.query(recent[-index.max_length:])
+    print(f"query: {(time.perf_counter() - started) / queries * 1e6:.1f} µs per window")
+    for stats in index.next_outcomes(recent):
+        shares = " | ".join(f"{outcome} {share * 100:.1f}%" for outcome, share in stats.probabilities().items())
+        print(f"{'-'.join(stats.window)}: {shares} ({stats.total:,})")
+    if workdir:
+        shutil.rmtree(workdir)